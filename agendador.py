@@ -0,0 +1,191 @@
+"""Agenda em memória das doses pendentes do dia.
+
+O AgendadorDoses carrega uma vez as doses ainda não tomadas do dia e as
+mantém em heaps ordenados pelo horário previsto. A aba Hoje pergunta quais
+estão atrasadas e quais vencem nos próximos minutos sem consultar o banco:
+as mudanças de status feitas pela interface são aplicadas direto na agenda
+(marcar) e uma thread em segundo plano acompanha o relógio, recarregando a
+agenda na virada do dia, quando alguém pede (recarregar) ou quando outra
+conexão gravou no banco (importações, outros processos do app).
+"""
+import heapq
+import itertools
+import sqlite3
+import threading
+from datetime import datetime, time, timedelta
+
+import banco
+
+JANELA_PROXIMAS_MIN = 30      # doses que vencem até esta quantidade de minutos
+INTERVALO_VERIFICACAO_S = 60  # a thread confere o relógio pelo menos a cada intervalo
+MINUTOS_DIA = 24 * 60
+
+def _chave(dose):
+    """Identifica uma dose do dia, esteja ela gravada ou só prevista"""
+    if dose.prescricao_id is not None:
+        return ("prescricao", dose.prescricao_id, dose.horario)
+    return ("dose", dose.id)
+
+class AgendadorDoses:
+    """Doses pendentes do dia separadas em futuras, próximas e atrasadas.
+
+    Cada dose entra no heap das futuras pelo minuto previsto e passa para o
+    das próximas e depois para as atrasadas conforme o relógio avança; cada
+    inclusão, remoção ou passagem custa O(log n). Uma dose tomada sai do
+    dicionário de pendentes e sua entrada no heap é descartada quando chega
+    ao topo.
+    """
+
+    def __init__(self, caminho=banco.CAMINHO_BANCO, janela_min=JANELA_PROXIMAS_MIN,
+                 relogio=datetime.now):
+        self.caminho = caminho
+        self.janela_min = janela_min
+        self.relogio = relogio
+        self.dia = None          # data (AAAA-MM-DD) carregada
+        self.carregado_em = None
+        self.erro = None         # última falha ao carregar (a agenda anterior continua)
+        self._pendentes = {}     # chave -> dose não tomada
+        self._entradas = {}      # chave -> ordem da entrada válida nos heaps
+        self._futuras = []       # heap (minuto, ordem, chave)
+        self._proximas = []      # heap (minuto, ordem, chave)
+        self._atrasadas = {}     # chave -> dose
+        self._ordem = itertools.count()
+        self._trava = threading.Lock()
+        self._acordar = threading.Event()
+        self._pronto = threading.Event()
+        self._pedido_recarga = False
+        self._versao_dados = None  # PRAGMA data_version da última carga
+        self._encerrar = False
+        self._thread = None
+
+    # --- CARGA E ALTERAÇÕES ---
+    def carregar(self, conn):
+        """Lê as doses do dia atual e refaz a agenda"""
+        dia = self.relogio().date().isoformat()
+        doses = banco.listar_doses_por_periodo(conn, dia, dia)
+        with self._trava:
+            self.dia = dia
+            self._pendentes.clear()
+            self._entradas.clear()
+            self._futuras.clear()
+            self._proximas.clear()
+            self._atrasadas.clear()
+            for dose in doses:
+                if not dose.tomou:
+                    self._incluir(dose)
+            self._avancar(self.relogio())
+            self.carregado_em = datetime.now()
+            self.erro = None
+
+    def marcar(self, dose, status):
+        """Aplica a mudança de status de uma dose sem reler o banco"""
+        with self._trava:
+            if dose.data != self.dia:
+                return
+            chave = _chave(dose)
+            if status:
+                self._remover(chave)
+            elif chave not in self._pendentes:
+                self._incluir(dose)
+            self._avancar(self.relogio())
+
+    def recarregar(self):
+        """Pede à thread que releia o dia (doses incluídas ou removidas)"""
+        self._pedido_recarga = True
+        self._acordar.set()
+
+    def _incluir(self, dose):
+        chave = _chave(dose)
+        ordem = next(self._ordem)
+        self._pendentes[chave] = dose
+        self._entradas[chave] = ordem
+        heapq.heappush(self._futuras, (banco.minuto_do_horario(dose.horario), ordem, chave))
+
+    def _remover(self, chave):
+        self._pendentes.pop(chave, None)
+        self._entradas.pop(chave, None)
+        self._atrasadas.pop(chave, None)
+
+    def _valida(self, ordem, chave):
+        return self._entradas.get(chave) == ordem
+
+    def _avancar(self, agora):
+        """Move as doses entre os grupos até o minuto de `agora`"""
+        if agora.date().isoformat() == self.dia:
+            minuto = agora.hour * 60 + agora.minute
+        else:
+            minuto = MINUTOS_DIA  # o dia carregado já passou: tudo que sobrou atrasou
+        while self._futuras and self._futuras[0][0] <= minuto + self.janela_min:
+            entrada = heapq.heappop(self._futuras)
+            if self._valida(entrada[1], entrada[2]):
+                heapq.heappush(self._proximas, entrada)
+        while self._proximas and self._proximas[0][0] < minuto:
+            _, ordem, chave = heapq.heappop(self._proximas)
+            if self._valida(ordem, chave):
+                self._atrasadas[chave] = self._pendentes[chave]
+
+    # --- CONSULTAS ---
+    def atrasadas(self):
+        """Doses cujo horário já passou, em ordem de horário"""
+        with self._trava:
+            self._avancar(self.relogio())
+            return sorted(self._atrasadas.values(), key=lambda d: (d.horario, d.nome_paciente))
+
+    def proximas(self):
+        """Doses que vencem dentro da janela, em ordem de horário"""
+        with self._trava:
+            self._avancar(self.relogio())
+            return [self._pendentes[chave] for _, ordem, chave in sorted(self._proximas)
+                    if self._valida(ordem, chave)]
+
+    def pendentes(self):
+        """Quantidade de doses do dia ainda não tomadas"""
+        with self._trava:
+            return len(self._pendentes)
+
+    # --- THREAD ---
+    def iniciar(self):
+        """Inicia a thread que acompanha o relógio e espera a primeira carga"""
+        self._thread = threading.Thread(target=self._acompanhar, name="agendador-doses",
+                                        daemon=True)
+        self._thread.start()
+        self._pronto.wait()
+        return self
+
+    def parar(self):
+        self._encerrar = True
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _acompanhar(self):
+        conn = None
+        try:
+            while not self._encerrar:
+                agora = self.relogio()
+                try:
+                    if conn is None:
+                        conn = banco.abrir_conexao(self.caminho)
+                    # data_version muda quando outra conexão faz commit no banco
+                    versao = conn.execute("PRAGMA data_version").fetchone()[0]
+                    if (self._pedido_recarga or versao != self._versao_dados
+                            or agora.date().isoformat() != self.dia):
+                        self._pedido_recarga = False
+                        self._versao_dados = versao
+                        self.carregar(conn)
+                    else:
+                        with self._trava:
+                            self._avancar(agora)
+                except (banco.ErroBanco, sqlite3.Error) as e:
+                    self.erro = e  # tenta de novo na próxima verificação
+                self._pronto.set()
+
+                # Acorda no intervalo, na virada do dia ou quando chamado
+                meia_noite = datetime.combine(agora.date() + timedelta(days=1), time())
+                espera = min(INTERVALO_VERIFICACAO_S, (meia_noite - agora).total_seconds() + 1)
+                self._acordar.wait(espera)
+                self._acordar.clear()
+        finally:
+            self._pronto.set()
+            if conn is not None:
+                conn.close()
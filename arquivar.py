@@ -0,0 +1,49 @@
+"""Move as doses antigas para arquivos anuais ao lado do banco.
+
+Uso:
+    python arquivar.py                      # mantém os últimos 180 dias
+    python arquivar.py --manter-dias 365
+    python arquivar.py --antes-de 2024-01-01 --banco data/pacientes.db
+    python arquivar.py --listar
+
+As doses arquivadas continuam aparecendo no calendário, nos relatórios e
+na exportação; só deixam de pesar nas consultas do dia a dia.
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+import arquivo_doses
+import banco
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--banco", default=str(banco.CAMINHO_BANCO))
+    parser.add_argument("--manter-dias", type=int, default=arquivo_doses.DIAS_MANTIDOS,
+                        help="quantos dias de histórico ficam no banco principal")
+    parser.add_argument("--antes-de", help="arquiva as doses anteriores a esta data (AAAA-MM-DD)")
+    parser.add_argument("--pasta", default="arquivo", help="pasta dos arquivos, relativa à do banco")
+    parser.add_argument("--listar", action="store_true", help="só lista os arquivos existentes")
+    args = parser.parse_args()
+
+    try:
+        conn = banco.conectar(args.banco)
+    except banco.ErroBanco as e:
+        parser.exit(1, f"{e}\n")
+    try:
+        if not args.listar:
+            antes_de = args.antes_de or (date.today() - timedelta(days=args.manter_dias)).isoformat()
+            movidas = arquivo_doses.arquivar_doses(conn, antes_de, args.pasta)
+            for ano, quantidade in movidas.items():
+                print(f"{ano}: {quantidade} doses arquivadas", file=sys.stderr)
+            if not movidas:
+                print(f"Nenhuma dose anterior a {antes_de}", file=sys.stderr)
+        for ano, caminho, inicio, fim, doses in arquivo_doses.listar_arquivos(conn):
+            print(f"{ano}\t{caminho}\t{inicio} a {fim}\t{doses} doses")
+    except banco.ErroBanco as e:
+        parser.exit(1, f"{e}\n")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Arquivo das doses antigas.
+
+arquivar_doses move as doses anteriores a uma data de corte para um
+arquivo SQLite por ano (pacientes_2024.db, ...), registrado na tabela
+arquivos_doses do banco principal. As consultas de banco.py continuam
+lendo essas doses: anexam os arquivos que o período pedido alcança (ver
+DOSES ARQUIVADAS em banco.py).
+"""
+import sqlite3
+from datetime import date
+
+import banco
+
+DIAS_MANTIDOS = 180   # doses mais recentes que isso ficam no banco principal
+
+_ESQUEMA_ARQUIVO = '''CREATE TABLE IF NOT EXISTS {esquema}.doses (
+    id INTEGER PRIMARY KEY,
+    paciente_id INTEGER NOT NULL,
+    medicamento TEXT NOT NULL,
+    dia INTEGER NOT NULL,
+    minuto INTEGER NOT NULL,
+    tomou INTEGER DEFAULT 0,
+    observacoes TEXT,
+    prescricao_id INTEGER
+)'''
+
+@banco._altera_dados
+def arquivar_doses(conn, antes_de=None, pasta="arquivo"):
+    """Move as doses anteriores a `antes_de` para arquivos anuais e retorna {ano: doses}.
+
+    `antes_de` é uma data 'YYYY-MM-DD' (por padrão, hoje menos DIAS_MANTIDOS)
+    e `pasta` é relativa à pasta do banco. Cada ano é copiado e confirmado
+    no arquivo antes de ser apagado do banco principal; se o processo for
+    interrompido entre as duas etapas, rodar de novo completa o trabalho
+    sem duplicar doses no arquivo.
+    """
+    if antes_de is None:
+        antes_de = date.fromordinal(date.today().toordinal() - DIAS_MANTIDOS).isoformat()
+    corte = banco.dia_da_data(antes_de)
+    movidas = {}
+
+    try:
+        principal = banco._caminho_principal(conn)
+        (principal.parent / pasta).mkdir(parents=True, exist_ok=True)
+        primeiro = conn.execute("SELECT MIN(dia) FROM doses").fetchone()[0]
+        if primeiro is None or primeiro >= corte:
+            return movidas
+
+        for ano in range(date.fromisoformat(banco.data_do_dia(primeiro)).year,
+                         date.fromisoformat(banco.data_do_dia(corte - 1)).year + 1):
+            inicio = max(banco.dia_da_data(f"{ano}-01-01"), primeiro)
+            fim = min(banco.dia_da_data(f"{ano}-12-31"), corte - 1)
+            if not conn.execute("SELECT EXISTS(SELECT 1 FROM doses WHERE dia BETWEEN ? AND ?)",
+                                (inicio, fim)).fetchone()[0]:
+                continue
+            caminho = f"{pasta}/{principal.stem}_{ano}.db"
+            esquema = f"arquivo_{ano}"
+            if esquema not in banco._anexados(conn):
+                conn.execute(f"ATTACH DATABASE ? AS {esquema}", (str(principal.parent / caminho),))
+
+            # 1) Copia para o arquivo (OR IGNORE torna a cópia repetível)
+            conn.execute(_ESQUEMA_ARQUIVO.format(esquema=esquema))
+            conn.execute(f"""CREATE INDEX IF NOT EXISTS {esquema}.idx_doses_dia_minuto
+                             ON doses(dia, minuto)""")
+            conn.execute(f"""CREATE INDEX IF NOT EXISTS {esquema}.idx_doses_paciente_dia
+                             ON doses(paciente_id, dia)""")
+            conn.execute(f"""INSERT OR IGNORE INTO {esquema}.doses
+                             SELECT id, paciente_id, medicamento, dia, minuto, tomou,
+                                    observacoes, prescricao_id
+                             FROM main.doses WHERE dia BETWEEN ? AND ?""", (inicio, fim))
+            conn.commit()
+
+            # 2) Apaga do principal preservando resumo e catálogo, que os
+            #    triggers de remoção descontariam
+            c = conn.cursor()
+            c.execute("""CREATE TEMP TABLE IF NOT EXISTS resumo_arquivado
+                         AS SELECT * FROM resumo_diario WHERE 0""")
+            c.execute("DELETE FROM temp.resumo_arquivado")
+            c.execute("""INSERT INTO temp.resumo_arquivado
+                         SELECT * FROM resumo_diario WHERE dia BETWEEN ? AND ?""", (inicio, fim))
+            c.execute("DELETE FROM main.doses WHERE dia BETWEEN ? AND ?", (inicio, fim))
+            movidas[ano] = c.rowcount
+            c.execute("INSERT OR REPLACE INTO resumo_diario SELECT * FROM temp.resumo_arquivado")
+            c.execute(f"""INSERT INTO catalogo_medicamentos (paciente_id, medicamento, observacoes, usos)
+                          SELECT paciente_id, medicamento, COALESCE(observacoes, ''), COUNT(*)
+                          FROM {esquema}.doses WHERE dia BETWEEN ? AND ?
+                          GROUP BY 1, 2, 3
+                          ON CONFLICT(paciente_id, medicamento, observacoes)
+                          DO UPDATE SET usos = usos + excluded.usos""", (inicio, fim))
+            c.execute(f"""INSERT INTO arquivos_doses (ano, caminho, dia_inicio, dia_fim, doses)
+                          SELECT ?, ?, MIN(dia), MAX(dia), COUNT(*) FROM {esquema}.doses
+                          WHERE true
+                          ON CONFLICT(ano) DO UPDATE SET
+                              dia_inicio = excluded.dia_inicio,
+                              dia_fim = excluded.dia_fim,
+                              doses = excluded.doses,
+                              arquivado_em = CURRENT_TIMESTAMP""", (ano, caminho))
+            conn.commit()
+            conn.execute(f"DETACH DATABASE {esquema}")
+        return movidas
+    except sqlite3.Error as e:
+        conn.rollback()
+        raise banco.ErroBanco(f"Erro ao arquivar doses: {e}") from e
+
+def listar_arquivos(conn):
+    """Retorna [(ano, caminho, primeira data, última data, doses)] dos arquivos de doses"""
+    return [(ano, caminho, banco.data_do_dia(inicio), banco.data_do_dia(fim), doses)
+            for ano, caminho, inicio, fim, doses in conn.execute(
+                "SELECT ano, caminho, dia_inicio, dia_fim, doses FROM arquivos_doses ORDER BY ano")]
@@ -0,0 +1,2004 @@
+"""Camada de dados da agenda de medicamentos.
+
+Este módulo não depende do Streamlit: pode ser usado pela aplicação, por
+scripts de carga, benchmarks e testes. Os erros são sinalizados com as
+exceções de ErroBanco e as consultas devolvem linhas tipadas (dataclasses
+com __slots__) em vez de tuplas lidas por posição.
+"""
+import contextlib
+import csv
+import functools
+import heapq
+import itertools
+import json
+import math
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+import calendar
+from pathlib import Path
+
+from instrumentacao import ConexaoInstrumentada
+
+# --- EXCEÇÕES ---
+class ErroBanco(Exception):
+    """Erro ao acessar ou alterar o banco de dados"""
+
+class ErroConexao(ErroBanco):
+    """Não foi possível abrir ou configurar o banco de dados"""
+
+class ErroValidacao(ErroBanco):
+    """Os dados informados não passaram na validação"""
+
+class ErroConflito(ErroValidacao):
+    """A dose fica perto demais de outra do mesmo medicamento para o paciente"""
+
+    def __init__(self, mensagem, conflitos):
+        super().__init__(mensagem)
+        self.conflitos = conflitos  # [Conflito]
+
+# --- TIPOS DE LINHA ---
+class Linha:
+    """Base das linhas devolvidas pelas consultas.
+
+    As subclasses são dataclasses com slots=True (sem __dict__ por
+    instância), com os campos na mesma ordem das colunas do SELECT. As
+    linhas também podem ser desempacotadas como tuplas.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def fabrica(cls, cursor, linha):
+        """row_factory do sqlite3 que cria a linha a partir da tupla"""
+        return cls(*linha)
+
+    def __iter__(self):
+        return (getattr(self, campo) for campo in self.__slots__)
+
+# frozen=True deixaria a criação de cada linha várias vezes mais lenta; as
+# linhas não são alteradas depois de lidas, então o hash usa os campos
+_linha = dataclass(slots=True, unsafe_hash=True)
+
+@_linha
+class Paciente(Linha):
+    id: int
+    nome: str
+    idade: int
+    condicao: str
+    data_cadastro: str
+
+@_linha
+class Dose(Linha):
+    """Dose de um dia: avulsa, de prescrição já registrada ou apenas prevista.
+
+    O id é None enquanto uma dose prevista não tiver status registrado.
+    """
+    id: int | None
+    nome_paciente: str
+    medicamento: str
+    horario: str
+    tomou: int
+    observacoes: str
+    prescricao_id: int | None
+    data: str
+
+@_linha
+class Prescricao(Linha):
+    id: int
+    nome_paciente: str
+    medicamento: str
+    horarios: str
+    data_inicio: str
+    data_fim: str | None
+    intervalo_dias: int
+    dias_semana: str | None
+    observacoes: str
+    paciente_id: int
+
+@_linha
+class ResumoDia(Linha):
+    data: str
+    total: int
+    tomados: int
+    nao_tomados: int
+
+@_linha
+class AdesaoPaciente(Linha):
+    paciente_id: int
+    nome: str
+    total: int
+    tomados: int
+
+@_linha
+class MedicamentoEncontrado(Linha):
+    paciente_id: int
+    nome_paciente: str
+    medicamento: str
+    observacoes: str
+    usos: int
+
+@_linha
+class AdesaoUnidade(Linha):
+    unidade: str
+    pacientes: int
+    total: int
+    tomados: int
+
+@_linha
+class Conflito(Linha):
+    """Dose que conflita com uma nova; id é None se for só prevista"""
+    id: int | None
+    medicamento: str
+    data: str
+    horario: str
+    prescricao_id: int | None
+
+# --- CONEXÃO ---
+CAMINHO_BANCO = Path('data/pacientes.db')
+TEMPO_ESPERA_BLOQUEIO_MS = 5000  # PRAGMA busy_timeout
+TAMANHO_CACHE_INSTRUCOES = 256   # instruções preparadas mantidas por conexão
+
+def abrir_conexao(caminho=CAMINHO_BANCO, factory=ConexaoInstrumentada):
+    """Abre e configura uma conexão com o banco (sem aplicar migrações)"""
+    caminho = Path(caminho)
+    try:
+        # Garante que o diretório existe
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(
+            str(caminho),
+            timeout=TEMPO_ESPERA_BLOQUEIO_MS / 1000,
+            check_same_thread=False,
+            cached_statements=TAMANHO_CACHE_INSTRUCOES,
+            # Permite medir as instruções (ver instrumentacao.py)
+            factory=factory,
+        )
+
+        # WAL permite leituras simultâneas enquanto outra sessão escreve
+        conn.execute("PRAGMA journal_mode = WAL")
+        # Com WAL, NORMAL é seguro contra corrupção e evita um fsync por commit
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(TEMPO_ESPERA_BLOQUEIO_MS)}")
+        # Configura para garantir que as chaves estrangeiras são respeitadas
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.cache_consultas = CacheConsultas()
+        return conn
+    except (sqlite3.Error, OSError) as e:
+        raise ErroConexao(f"Erro ao conectar ao banco de dados: {e}") from e
+
+def conectar(caminho=CAMINHO_BANCO):
+    """Abre uma conexão avulsa com o esquema já atualizado (scripts e testes)"""
+    conn = abrir_conexao(caminho)
+    inicializar_tabelas(conn)
+    return conn
+
+class GerenciadorConexoes:
+    """Mantém uma conexão SQLite por thread, reaproveitada entre execuções.
+
+    O Streamlit executa cada rerun em uma thread de sessão. Quando a thread
+    dona de uma conexão termina, a conexão volta a ficar disponível e é
+    entregue à próxima thread que pedir uma, evitando reabrir o arquivo e
+    refazer a configuração a cada clique.
+    """
+
+    def __init__(self, caminho=CAMINHO_BANCO, abrir=abrir_conexao):
+        self.caminho = Path(caminho)
+        self._abrir = abrir  # abrir(caminho) -> conexão nova
+        self._conexoes = {}  # thread -> conexão
+        self._trava = threading.Lock()
+
+    def conexao(self):
+        """Retorna a conexão da thread atual, abrindo ou reaproveitando uma"""
+        atual = threading.current_thread()
+        with self._trava:
+            conn = self._conexoes.get(atual)
+            if conn is not None:
+                return conn
+
+            # Reaproveita a conexão de uma thread que já terminou
+            for thread in list(self._conexoes):
+                if not thread.is_alive():
+                    conn = self._conexoes.pop(thread)
+                    if conn.in_transaction:
+                        conn.rollback()
+                    break
+            else:
+                conn = self._abrir(self.caminho)
+
+            self._conexoes[atual] = conn
+            return conn
+
+    def liberar(self):
+        """Fecha a conexão da thread atual e as de threads que já terminaram
+        e retorna quantas continuam abertas"""
+        atual = threading.current_thread()
+        with self._trava:
+            for thread in list(self._conexoes):
+                if thread is atual or not thread.is_alive():
+                    self._conexoes.pop(thread).close()
+            return len(self._conexoes)
+
+    def fechar_todas(self):
+        """Fecha todas as conexões abertas pelo gerenciador"""
+        with self._trava:
+            for conn in self._conexoes.values():
+                conn.close()
+            self._conexoes.clear()
+
+# --- CACHE DE CONSULTAS ---
+# As funções de leitura marcadas com @_em_cache guardam o resultado na
+# conexão, com chave (função, parâmetros). O cache é descartado quando
+# PRAGMA data_version indica um commit de outra conexão (outra sessão ou
+# outro processo) e quando uma função marcada com @_altera_dados grava por
+# esta conexão, já que os próprios commits não mudam data_version.
+# O mesmo resultado é devolvido a várias chamadas: não deve ser alterado.
+TAMANHO_CACHE_CONSULTAS = 128  # resultados guardados por conexão; 0 desliga
+
+class CacheConsultas:
+    """Resultados recentes das consultas de uma conexão, descartados por LRU"""
+
+    def __init__(self, tamanho=TAMANHO_CACHE_CONSULTAS):
+        self.tamanho = tamanho
+        self.resultados = OrderedDict()
+        self.versao = None  # PRAGMA data_version quando os resultados foram lidos
+        self.acertos = 0
+        self.falhas = 0
+
+    def validar(self, conn):
+        """Descarta os resultados se outra conexão gravou desde a última leitura"""
+        versao = conn.execute("PRAGMA data_version").fetchone()[0]
+        if versao != self.versao:
+            self.resultados.clear()
+            self.versao = versao
+
+    def limpar(self):
+        self.resultados.clear()
+
+def _em_cache(funcao):
+    """Guarda o resultado de uma função de leitura no cache da conexão"""
+    @functools.wraps(funcao)
+    def consultar(conn, *args, **kwargs):
+        cache = getattr(conn, "cache_consultas", None)
+        if cache is None or cache.tamanho <= 0:
+            return funcao(conn, *args, **kwargs)
+
+        try:
+            cache.validar(conn)
+        except sqlite3.Error as e:
+            raise ErroBanco(f"Erro ao verificar alterações no banco: {e}") from e
+
+        chave = (funcao.__name__, args, tuple(sorted(kwargs.items())))
+        resultados = cache.resultados
+        if chave in resultados:
+            cache.acertos += 1
+            resultados.move_to_end(chave)
+            return resultados[chave]
+
+        cache.falhas += 1
+        resultado = funcao(conn, *args, **kwargs)
+        resultados[chave] = resultado
+        if len(resultados) > cache.tamanho:
+            resultados.popitem(last=False)
+        return resultado
+    return consultar
+
+def _altera_dados(funcao):
+    """Descarta o cache da conexão depois de uma gravação (mesmo se ela falhar)"""
+    @functools.wraps(funcao)
+    def alterar(conn, *args, **kwargs):
+        try:
+            return funcao(conn, *args, **kwargs)
+        finally:
+            cache = getattr(conn, "cache_consultas", None)
+            if cache is not None:
+                cache.limpar()
+    return alterar
+
+# --- DATAS E HORÁRIOS ---
+# As doses guardam a data como número de dias desde 1970-01-01 (dia) e o
+# horário como minutos desde a meia-noite (minuto). As funções de consulta
+# continuam recebendo e devolvendo 'YYYY-MM-DD' e 'HH:MM'; a conversão fica
+# aqui e nas expressões SQL equivalentes usadas pela view medicamentos.
+EPOCA = date(1970, 1, 1).toordinal()
+_HORARIOS = [f"{minuto // 60:02d}:{minuto % 60:02d}" for minuto in range(24 * 60)]
+
+def dia_da_data(data):
+    """'YYYY-MM-DD' -> dias desde 1970-01-01"""
+    return date.fromisoformat(data).toordinal() - EPOCA
+
+@functools.lru_cache(maxsize=4096)
+def data_do_dia(dia):
+    """Dias desde 1970-01-01 -> 'YYYY-MM-DD'"""
+    return date.fromordinal(dia + EPOCA).isoformat()
+
+def minuto_do_horario(horario):
+    """'HH:MM' -> minutos desde a meia-noite"""
+    horas, minutos = horario.split(":")
+    return int(horas) * 60 + int(minutos)
+
+def horario_do_minuto(minuto):
+    """Minutos desde a meia-noite -> 'HH:MM'"""
+    return _HORARIOS[minuto]
+
+def _sql_dia(expressao):
+    return f"CAST(julianday({expressao}) - 2440587.5 AS INTEGER)"
+
+def _sql_minuto(expressao):
+    return (f"CAST(substr({expressao}, 1, instr({expressao}, ':') - 1) AS INTEGER) * 60"
+            f" + CAST(substr({expressao}, instr({expressao}, ':') + 1) AS INTEGER)")
+
+# --- MIGRAÇÕES DO ESQUEMA ---
+# Cada migração recebe um cursor e roda dentro de uma transação. A posição na
+# lista MIGRACOES é o número da versão gravado em PRAGMA user_version, então
+# novas migrações devem sempre ser adicionadas ao final da lista.
+
+def _migracao_tabelas_iniciais(c):
+    """Versão 1: tabelas de pacientes, medicamentos e calendário"""
+    # Bancos criados antes do controle de versão já possuem as tabelas
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pacientes'")
+    banco_novo = c.fetchone() is None
+
+    # Tabela de pacientes
+    c.execute('''CREATE TABLE IF NOT EXISTS pacientes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL,
+        idade INTEGER,
+        condicao TEXT,
+        data_cadastro TEXT DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+    # Tabela de medicamentos
+    c.execute('''CREATE TABLE IF NOT EXISTS medicamentos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER NOT NULL,
+        medicamento TEXT NOT NULL,
+        horario TEXT NOT NULL,
+        data TEXT NOT NULL,
+        tomou INTEGER DEFAULT 0,
+        observacoes TEXT,
+        FOREIGN KEY(paciente_id) REFERENCES pacientes(id) ON DELETE CASCADE
+    )''')
+
+    # Tabela de calendário
+    c.execute('''CREATE TABLE IF NOT EXISTS calendario_medicamentos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        medicamento_id INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        status TEXT CHECK(status IN ("pendente", "tomado", "nao_tomado", "adiado")),
+        observacoes TEXT,
+        FOREIGN KEY(medicamento_id) REFERENCES medicamentos(id) ON DELETE CASCADE
+    )''')
+
+    if not banco_novo:
+        return
+
+    # Adiciona alguns dados de exemplo
+    c.execute("INSERT INTO pacientes (nome, idade, condicao) VALUES (?, ?, ?)",
+             ("Maria da Silva", 78, "Hipertensão, Diabetes"))
+    c.execute("INSERT INTO pacientes (nome, idade, condicao) VALUES (?, ?, ?)",
+             ("João Oliveira", 82, "Demência moderada"))
+
+    # Medicamentos de exemplo
+    hoje = date.today().strftime("%Y-%m-%d")
+
+    c.execute("""INSERT INTO medicamentos
+                (paciente_id, medicamento, horario, data, observacoes)
+                VALUES (?, ?, ?, ?, ?)""",
+             (1, "Captopril 25mg", "08:00", hoje, "Tomar antes do café"))
+    c.execute("""INSERT INTO medicamentos
+                (paciente_id, medicamento, horario, data, observacoes)
+                VALUES (?, ?, ?, ?, ?)""",
+             (1, "Metformina 850mg", "12:00", hoje, "Tomar após almoço"))
+    c.execute("""INSERT INTO medicamentos
+                (paciente_id, medicamento, horario, data, observacoes)
+                VALUES (?, ?, ?, ?, ?)""",
+             (2, "Donepezila 10mg", "09:00", hoje, "Com leite"))
+
+def _migracao_indices_consultas(c):
+    """Versão 2: índices para as consultas por data e por paciente"""
+    # Consultas do dia/mês (WHERE data = ? / BETWEEN ... ORDER BY horario)
+    c.execute("""CREATE INDEX IF NOT EXISTS idx_medicamentos_data_horario
+                 ON medicamentos(data, horario)""")
+    # Histórico de um paciente e remoção em cascata
+    c.execute("""CREATE INDEX IF NOT EXISTS idx_medicamentos_paciente_data
+                 ON medicamentos(paciente_id, data)""")
+    # Remoção em cascata a partir de medicamentos
+    c.execute("""CREATE INDEX IF NOT EXISTS idx_calendario_medicamento_data
+                 ON calendario_medicamentos(medicamento_id, data)""")
+
+def _migracao_prescricoes(c):
+    """Versão 3: prescrições recorrentes expandidas em doses sob demanda"""
+    # Regra de recorrência: a cada `intervalo_dias` dias a partir de
+    # data_inicio, opcionalmente restrita aos `dias_semana` (0 = segunda),
+    # em cada um dos `horarios` ('HH:MM' separados por vírgula).
+    c.execute('''CREATE TABLE IF NOT EXISTS prescricoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER NOT NULL,
+        medicamento TEXT NOT NULL,
+        horarios TEXT NOT NULL,
+        data_inicio TEXT NOT NULL,
+        data_fim TEXT,
+        intervalo_dias INTEGER NOT NULL DEFAULT 1 CHECK(intervalo_dias >= 1),
+        dias_semana TEXT,
+        observacoes TEXT,
+        FOREIGN KEY(paciente_id) REFERENCES pacientes(id) ON DELETE CASCADE
+    )''')
+    c.execute("""CREATE INDEX IF NOT EXISTS idx_prescricoes_paciente
+                 ON prescricoes(paciente_id)""")
+
+    # Uma dose de prescrição só vira linha em medicamentos quando o status é
+    # registrado; o índice único impede registrar a mesma dose duas vezes.
+    # Doses avulsas têm prescricao_id NULL e nunca entram em conflito.
+    c.execute("""ALTER TABLE medicamentos ADD COLUMN prescricao_id INTEGER
+                 REFERENCES prescricoes(id) ON DELETE SET NULL""")
+    c.execute("""CREATE UNIQUE INDEX IF NOT EXISTS ux_medicamentos_prescricao_dose
+                 ON medicamentos(prescricao_id, data, horario)""")
+
+def _criar_triggers_resumo(c, tabela, chave):
+    """Triggers que mantêm resumo_diario a partir das doses de `tabela`, por dia em `chave`"""
+    somar_novo = f"""INSERT INTO resumo_diario ({chave}, total, tomados, de_prescricao)
+                     VALUES (NEW.{chave}, 1, NEW.tomou = 1, NEW.prescricao_id IS NOT NULL)
+                     ON CONFLICT({chave}) DO UPDATE SET
+                         total = total + 1,
+                         tomados = tomados + excluded.tomados,
+                         de_prescricao = de_prescricao + excluded.de_prescricao;"""
+    subtrair_antigo = f"""UPDATE resumo_diario SET
+                              total = total - 1,
+                              tomados = tomados - (OLD.tomou = 1),
+                              de_prescricao = de_prescricao - (OLD.prescricao_id IS NOT NULL)
+                          WHERE {chave} = OLD.{chave};"""
+
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_resumo_inserir
+                  AFTER INSERT ON {tabela}
+                  BEGIN {somar_novo} END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_resumo_remover
+                  AFTER DELETE ON {tabela}
+                  BEGIN {subtrair_antigo} END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_resumo_atualizar
+                  AFTER UPDATE OF {chave}, tomou, prescricao_id ON {tabela}
+                  BEGIN {subtrair_antigo} {somar_novo} END""")
+
+def _migracao_resumo_diario(c):
+    """Versão 4: resumo diário de doses mantido por triggers"""
+    # Uma linha por dia com as doses gravadas em medicamentos. de_prescricao
+    # conta as doses de prescrição já registradas, para que os relatórios
+    # possam somar as doses previstas sem contá-las duas vezes.
+    c.execute('''CREATE TABLE IF NOT EXISTS resumo_diario (
+        data TEXT PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0,
+        tomados INTEGER NOT NULL DEFAULT 0,
+        de_prescricao INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID''')
+
+    _criar_triggers_resumo(c, "medicamentos", "data")
+
+    # Preenche o resumo com o histórico já existente
+    c.execute("DELETE FROM resumo_diario")
+    c.execute("""INSERT INTO resumo_diario (data, total, tomados, de_prescricao)
+                 SELECT data, COUNT(*), SUM(tomou = 1), SUM(prescricao_id IS NOT NULL)
+                 FROM medicamentos GROUP BY data""")
+
+def _migracao_indice_pacientes_nome(c):
+    """Versão 5: índice para a paginação da lista de pacientes por (nome, id)"""
+    # O índice já inclui o rowid (id) depois do nome, cobrindo a chave da página
+    c.execute("""CREATE INDEX IF NOT EXISTS idx_pacientes_nome
+                 ON pacientes(nome)""")
+
+def _criar_triggers_catalogo(c, tabela):
+    """Triggers que mantêm catalogo_medicamentos a partir das linhas de `tabela`"""
+    somar = """INSERT INTO catalogo_medicamentos (paciente_id, medicamento, observacoes, usos)
+               VALUES (NEW.paciente_id, NEW.medicamento, COALESCE(NEW.observacoes, ''), 1)
+               ON CONFLICT(paciente_id, medicamento, observacoes)
+               DO UPDATE SET usos = usos + 1;"""
+    subtrair = """UPDATE catalogo_medicamentos SET usos = usos - 1
+                  WHERE paciente_id = OLD.paciente_id AND medicamento = OLD.medicamento
+                    AND observacoes = COALESCE(OLD.observacoes, '');
+                  DELETE FROM catalogo_medicamentos
+                  WHERE paciente_id = OLD.paciente_id AND medicamento = OLD.medicamento
+                    AND observacoes = COALESCE(OLD.observacoes, '') AND usos <= 0;"""
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{tabela}_catalogo_inserir
+                  AFTER INSERT ON {tabela} BEGIN {somar} END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{tabela}_catalogo_remover
+                  AFTER DELETE ON {tabela} BEGIN {subtrair} END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{tabela}_catalogo_atualizar
+                  AFTER UPDATE OF paciente_id, medicamento, observacoes ON {tabela}
+                  BEGIN {subtrair} {somar} END""")
+
+def _migracao_busca_textual(c):
+    """Versão 6: índices FTS5 para a busca de pacientes e medicamentos"""
+    # Pacientes: índice de conteúdo externo sobre a própria tabela
+    c.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS pacientes_fts USING fts5(
+                     nome, condicao,
+                     content='pacientes', content_rowid='id',
+                     tokenize='unicode61 remove_diacritics 2')""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_pacientes_fts_inserir
+                 AFTER INSERT ON pacientes BEGIN
+                     INSERT INTO pacientes_fts (rowid, nome, condicao)
+                     VALUES (NEW.id, NEW.nome, NEW.condicao);
+                 END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_pacientes_fts_remover
+                 AFTER DELETE ON pacientes BEGIN
+                     INSERT INTO pacientes_fts (pacientes_fts, rowid, nome, condicao)
+                     VALUES ('delete', OLD.id, OLD.nome, OLD.condicao);
+                 END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_pacientes_fts_atualizar
+                 AFTER UPDATE OF nome, condicao ON pacientes BEGIN
+                     INSERT INTO pacientes_fts (pacientes_fts, rowid, nome, condicao)
+                     VALUES ('delete', OLD.id, OLD.nome, OLD.condicao);
+                     INSERT INTO pacientes_fts (rowid, nome, condicao)
+                     VALUES (NEW.id, NEW.nome, NEW.condicao);
+                 END""")
+    c.execute("INSERT INTO pacientes_fts (pacientes_fts) VALUES ('rebuild')")
+
+    # Medicamentos: o histórico repete o mesmo remédio em milhares de doses,
+    # então o índice textual fica sobre um catálogo com uma linha por
+    # (paciente, medicamento, observações) e a quantidade de registros que a usam.
+    c.execute('''CREATE TABLE IF NOT EXISTS catalogo_medicamentos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER NOT NULL,
+        medicamento TEXT NOT NULL,
+        observacoes TEXT NOT NULL DEFAULT '',
+        usos INTEGER NOT NULL DEFAULT 0,
+        UNIQUE(paciente_id, medicamento, observacoes)
+    )''')
+    c.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS catalogo_fts USING fts5(
+                     medicamento, observacoes,
+                     content='catalogo_medicamentos', content_rowid='id',
+                     tokenize='unicode61 remove_diacritics 2')""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_catalogo_fts_inserir
+                 AFTER INSERT ON catalogo_medicamentos BEGIN
+                     INSERT INTO catalogo_fts (rowid, medicamento, observacoes)
+                     VALUES (NEW.id, NEW.medicamento, NEW.observacoes);
+                 END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_catalogo_fts_remover
+                 AFTER DELETE ON catalogo_medicamentos BEGIN
+                     INSERT INTO catalogo_fts (catalogo_fts, rowid, medicamento, observacoes)
+                     VALUES ('delete', OLD.id, OLD.medicamento, OLD.observacoes);
+                 END""")
+
+    # Tanto doses quanto prescrições alimentam o catálogo
+    for tabela in ("medicamentos", "prescricoes"):
+        _criar_triggers_catalogo(c, tabela)
+
+    # Preenche o catálogo com o histórico existente (os triggers cuidam do FTS)
+    c.execute("""INSERT INTO catalogo_medicamentos (paciente_id, medicamento, observacoes, usos)
+                 SELECT paciente_id, medicamento, observacoes, COUNT(*) FROM (
+                     SELECT paciente_id, medicamento, COALESCE(observacoes, '') AS observacoes
+                     FROM medicamentos
+                     UNION ALL
+                     SELECT paciente_id, medicamento, COALESCE(observacoes, '')
+                     FROM prescricoes
+                 ) GROUP BY paciente_id, medicamento, observacoes""")
+
+def _migracao_datas_inteiras(c):
+    """Versão 7: doses com data e horário inteiros, atrás da view medicamentos"""
+    # O histórico passa para a tabela doses, com dia e minuto inteiros: as
+    # chaves dos índices ficam menores e os filtros por período viram
+    # comparações de inteiros.
+    c.execute('''CREATE TABLE doses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER NOT NULL,
+        medicamento TEXT NOT NULL,
+        dia INTEGER NOT NULL,
+        minuto INTEGER NOT NULL CHECK(minuto BETWEEN 0 AND 1439),
+        tomou INTEGER DEFAULT 0,
+        observacoes TEXT,
+        prescricao_id INTEGER REFERENCES prescricoes(id) ON DELETE SET NULL,
+        FOREIGN KEY(paciente_id) REFERENCES pacientes(id) ON DELETE CASCADE
+    )''')
+    c.execute(f"""INSERT INTO doses
+                      (id, paciente_id, medicamento, dia, minuto, tomou, observacoes, prescricao_id)
+                  SELECT id, paciente_id, medicamento, {_sql_dia("data")}, {_sql_minuto("horario")},
+                         tomou, observacoes, prescricao_id
+                  FROM medicamentos""")
+    # Mantém a sequência do AUTOINCREMENT para não reaproveitar ids removidos
+    c.execute("DELETE FROM sqlite_sequence WHERE name = 'doses'")
+    c.execute("""INSERT INTO sqlite_sequence (name, seq)
+                 SELECT 'doses', seq FROM sqlite_sequence WHERE name = 'medicamentos'""")
+
+    # Consultas do dia/mês (WHERE dia BETWEEN ... ORDER BY dia, minuto)
+    c.execute("CREATE INDEX idx_doses_dia_minuto ON doses(dia, minuto)")
+    # Histórico de um paciente e remoção em cascata
+    c.execute("CREATE INDEX idx_doses_paciente_dia ON doses(paciente_id, dia)")
+    c.execute("""CREATE UNIQUE INDEX ux_doses_prescricao_dose
+                 ON doses(prescricao_id, dia, minuto)""")
+
+    # calendario_medicamentos referencia medicamentos(id); é refeita
+    # apontando para doses antes da tabela antiga ser removida
+    c.execute('''CREATE TABLE calendario_medicamentos_nova (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        medicamento_id INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        status TEXT CHECK(status IN ("pendente", "tomado", "nao_tomado", "adiado")),
+        observacoes TEXT,
+        FOREIGN KEY(medicamento_id) REFERENCES doses(id) ON DELETE CASCADE
+    )''')
+    c.execute("INSERT INTO calendario_medicamentos_nova SELECT * FROM calendario_medicamentos")
+    c.execute("DROP TABLE calendario_medicamentos")
+    c.execute("ALTER TABLE calendario_medicamentos_nova RENAME TO calendario_medicamentos")
+    c.execute("""CREATE INDEX idx_calendario_medicamento_data
+                 ON calendario_medicamentos(medicamento_id, data)""")
+
+    # Os triggers da tabela antiga saem antes dela, para o DROP não mexer
+    # no resumo nem no catálogo
+    for trigger in ("trg_resumo_inserir", "trg_resumo_remover", "trg_resumo_atualizar",
+                    "trg_medicamentos_catalogo_inserir", "trg_medicamentos_catalogo_remover",
+                    "trg_medicamentos_catalogo_atualizar"):
+        c.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    c.execute("DROP TABLE medicamentos")
+    _criar_triggers_catalogo(c, "doses")
+
+    # resumo_diario passa a ser indexado pelo dia inteiro
+    c.execute("DROP TABLE resumo_diario")
+    c.execute('''CREATE TABLE resumo_diario (
+        dia INTEGER PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0,
+        tomados INTEGER NOT NULL DEFAULT 0,
+        de_prescricao INTEGER NOT NULL DEFAULT 0
+    )''')
+    c.execute("""INSERT INTO resumo_diario (dia, total, tomados, de_prescricao)
+                 SELECT dia, COUNT(*), SUM(tomou = 1), SUM(prescricao_id IS NOT NULL)
+                 FROM doses GROUP BY dia""")
+    _criar_triggers_resumo(c, "doses", "dia")
+
+    # View com as colunas de texto antigas, para scripts e consultas que
+    # ainda leem ou gravam em medicamentos
+    c.execute("""CREATE VIEW medicamentos AS
+                 SELECT id, paciente_id, medicamento,
+                        printf('%02d:%02d', minuto / 60, minuto % 60) AS horario,
+                        date(dia * 86400, 'unixepoch') AS data,
+                        tomou, observacoes, prescricao_id
+                 FROM doses""")
+    c.execute(f"""CREATE TRIGGER trg_medicamentos_inserir
+                  INSTEAD OF INSERT ON medicamentos BEGIN
+                      INSERT INTO doses (id, paciente_id, medicamento, dia, minuto, tomou,
+                                         observacoes, prescricao_id)
+                      VALUES (NEW.id, NEW.paciente_id, NEW.medicamento, {_sql_dia("NEW.data")},
+                              {_sql_minuto("NEW.horario")}, COALESCE(NEW.tomou, 0),
+                              NEW.observacoes, NEW.prescricao_id);
+                  END""")
+    c.execute(f"""CREATE TRIGGER trg_medicamentos_atualizar
+                  INSTEAD OF UPDATE ON medicamentos BEGIN
+                      UPDATE doses SET paciente_id = NEW.paciente_id,
+                                       medicamento = NEW.medicamento,
+                                       dia = {_sql_dia("NEW.data")},
+                                       minuto = {_sql_minuto("NEW.horario")},
+                                       tomou = NEW.tomou,
+                                       observacoes = NEW.observacoes,
+                                       prescricao_id = NEW.prescricao_id
+                      WHERE id = OLD.id;
+                  END""")
+    c.execute("""CREATE TRIGGER trg_medicamentos_remover
+                 INSTEAD OF DELETE ON medicamentos BEGIN
+                     DELETE FROM doses WHERE id = OLD.id;
+                 END""")
+
+def _migracao_arquivos_doses(c):
+    """Versão 8: registro dos arquivos anuais com doses antigas"""
+    # Um arquivo por ano; `caminho` é relativo à pasta do banco principal
+    c.execute('''CREATE TABLE IF NOT EXISTS arquivos_doses (
+        ano INTEGER PRIMARY KEY,
+        caminho TEXT NOT NULL,
+        dia_inicio INTEGER NOT NULL,
+        dia_fim INTEGER NOT NULL,
+        doses INTEGER NOT NULL,
+        arquivado_em TEXT DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+def _migracao_indice_conflitos(c):
+    """Versão 9: índice para procurar doses do mesmo medicamento perto de um horário"""
+    c.execute("""CREATE INDEX IF NOT EXISTS idx_doses_paciente_medicamento
+                 ON doses(paciente_id, medicamento COLLATE NOCASE, dia, minuto)""")
+
+MIGRACOES = [
+    _migracao_tabelas_iniciais,
+    _migracao_indices_consultas,
+    _migracao_prescricoes,
+    _migracao_resumo_diario,
+    _migracao_indice_pacientes_nome,
+    _migracao_busca_textual,
+    _migracao_datas_inteiras,
+    _migracao_arquivos_doses,
+    _migracao_indice_conflitos,
+]
+
+def versao_do_banco(conn):
+    """Retorna a versão do esquema gravada em PRAGMA user_version"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+@_altera_dados
+def aplicar_migracoes(conn):
+    """Aplica, em ordem, as migrações que ainda não rodaram neste banco"""
+    if versao_do_banco(conn) >= len(MIGRACOES):
+        return
+
+    while True:
+        c = conn.cursor()
+        try:
+            # A trava de escrita vem antes da leitura da versão: se outro
+            # processo abriu o banco ao mesmo tempo, esperamos ele terminar
+            # e relemos a versão em vez de aplicar a mesma migração de novo
+            c.execute("BEGIN IMMEDIATE")
+            versao = versao_do_banco(conn) + 1
+            if versao > len(MIGRACOES):
+                conn.commit()
+                return
+            MIGRACOES[versao - 1](c)
+            # PRAGMA não aceita parâmetros; a versão é sempre um inteiro nosso
+            c.execute(f"PRAGMA user_version = {int(versao)}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+def inicializar_tabelas(conn):
+    """Cria as tabelas necessárias e atualiza o esquema para a última versão"""
+    try:
+        aplicar_migracoes(conn)
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao criar tabelas: {e}") from e
+
+# --- FUNÇÕES PARA PACIENTES ---
+def _validar_paciente(nome, idade, condicao):
+    """Valida os dados de um paciente e retorna (nome, idade, condicao) normalizados"""
+    if not nome.strip():
+        raise ErroValidacao("O nome não pode estar vazio")
+    if idade <= 0:
+        raise ErroValidacao("Idade inválida")
+    return nome.strip(), int(idade), condicao.strip()
+
+@_altera_dados
+def adicionar_paciente(conn, nome, idade, condicao):
+    """Adiciona um novo paciente ao banco de dados e retorna seu id"""
+    valores = _validar_paciente(nome, idade, condicao)
+
+    try:
+        c = conn.cursor()
+        c.execute("INSERT INTO pacientes (nome, idade, condicao) VALUES (?, ?, ?)", valores)
+        conn.commit()
+        return c.lastrowid
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao adicionar paciente: {e}") from e
+
+def iterar_pacientes(conn):
+    """Percorre todos os pacientes em ordem de nome, sem carregá-los de uma vez"""
+    try:
+        c = conn.cursor()
+        c.row_factory = Paciente.fabrica
+        c.execute("SELECT * FROM pacientes ORDER BY nome, id")
+        yield from c
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao listar pacientes: {e}") from e
+
+@_em_cache
+def listar_pacientes(conn):
+    """Retorna todos os pacientes cadastrados"""
+    return list(iterar_pacientes(conn))
+
+@_em_cache
+def listar_pacientes_pagina(conn, tamanho, apos=None):
+    """Retorna até `tamanho` pacientes ordenados por (nome, id).
+
+    `apos` é a chave (nome, id) do último paciente da página anterior; a
+    consulta continua a partir dela pelo índice, sem OFFSET.
+    """
+    try:
+        c = conn.cursor()
+        c.row_factory = Paciente.fabrica
+        if apos is None:
+            c.execute("SELECT * FROM pacientes ORDER BY nome, id LIMIT ?", (tamanho,))
+        else:
+            c.execute("""SELECT * FROM pacientes
+                         WHERE (nome, id) > (?, ?)
+                         ORDER BY nome, id LIMIT ?""", (apos[0], apos[1], tamanho))
+        return c.fetchall()
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao listar pacientes: {e}") from e
+
+@_altera_dados
+def atualizar_paciente(conn, id_paciente, nome, idade, condicao):
+    """Atualiza os dados de um paciente existente"""
+    try:
+        c = conn.cursor()
+        c.execute("UPDATE pacientes SET nome=?, idade=?, condicao=? WHERE id=?",
+                  (nome.strip(), int(idade), condicao.strip(), id_paciente))
+        conn.commit()
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao atualizar paciente: {e}") from e
+
+@_altera_dados
+def remover_paciente(conn, id_paciente):
+    """Remove um paciente do banco de dados"""
+    try:
+        c = conn.cursor()
+        c.execute("DELETE FROM pacientes WHERE id=?", (id_paciente,))
+        conn.commit()
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao remover paciente: {e}") from e
+
+# --- FUNÇÕES PARA MEDICAMENTOS ---
+def _validar_medicamento(paciente_id, medicamento, horario, data, observacoes):
+    """Valida uma dose avulsa e retorna os valores (com dia e minuto) para _INSERIR_DOSE"""
+    if not medicamento.strip():
+        raise ErroValidacao("O nome do medicamento não pode estar vazio")
+    try:
+        momento = datetime.strptime(horario.strip(), "%H:%M")
+    except ValueError:
+        raise ErroValidacao(f"Horário inválido: {horario!r} (use HH:MM)") from None
+    try:
+        dia = dia_da_data(data.strip())
+    except ValueError:
+        raise ErroValidacao(f"Data inválida: {data!r} (use AAAA-MM-DD)") from None
+    return (paciente_id, medicamento.strip(), dia, momento.hour * 60 + momento.minute,
+            observacoes.strip())
+
+JANELA_CONFLITO_MIN = 60  # ver CONFLITOS DE HORÁRIO
+
+_INSERIR_DOSE = """INSERT INTO doses (paciente_id, medicamento, dia, minuto, observacoes)
+    VALUES (?, ?, ?, ?, ?)"""
+
+@_altera_dados
+def adicionar_medicamento(conn, paciente_id, medicamento, horario, data, observacoes,
+                          janela_min=JANELA_CONFLITO_MIN, permitir_conflito=False):
+    """Adiciona um novo medicamento para um paciente e retorna seu id.
+
+    Levanta ErroConflito se o paciente já tiver o mesmo medicamento a menos
+    de `janela_min` minutos, a não ser com permitir_conflito=True.
+    """
+    valores = _validar_medicamento(paciente_id, medicamento, horario, data, observacoes)
+
+    try:
+        if not permitir_conflito:
+            conflitos = _conflitos(conn, paciente_id, valores[1], valores[2], valores[3], janela_min)
+            if conflitos:
+                raise _erro_conflito(valores[1], conflitos)
+        c = conn.cursor()
+        c.execute(_INSERIR_DOSE, valores)
+        conn.commit()
+        return c.lastrowid
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao adicionar medicamento: {e}") from e
+
+def listar_medicamentos_hoje(conn):
+    """Retorna os medicamentos para o dia atual"""
+    return listar_medicamentos_por_data(conn, date.today().strftime("%Y-%m-%d"))
+
+def listar_medicamentos_por_data(conn, data):
+    """Retorna os medicamentos para uma data específica"""
+    return listar_doses_por_periodo(conn, data, data)
+
+@_altera_dados
+def atualizar_status_medicamento(conn, id_medicamento, status):
+    """Atualiza o status de um medicamento (1 = tomou, 0 = não tomou)"""
+    try:
+        c = conn.cursor()
+        c.execute("UPDATE doses SET tomou=? WHERE id=?", (status, id_medicamento))
+        conn.commit()
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao atualizar status do medicamento: {e}") from e
+
+def contar_medicamentos_por_data(conn, data):
+    """Conta quantos medicamentos existem para uma data específica"""
+    return contar_doses_por_dia(conn, data, data).get(data, 0)
+
+def intervalo_do_mes(ano, mes):
+    """Retorna o primeiro e o último dia do mês no formato YYYY-MM-DD"""
+    ultimo_dia = calendar.monthrange(ano, mes)[1]
+    return f"{ano}-{mes:02d}-01", f"{ano}-{mes:02d}-{ultimo_dia:02d}"
+
+@_em_cache
+def listar_medicamentos_por_mes(conn, ano, mes):
+    """Retorna os medicamentos do mês agrupados por data"""
+    inicio, fim = intervalo_do_mes(ano, mes)
+
+    # As doses já vêm ordenadas por data e horário
+    por_dia = {}
+    for dose in iterar_doses_por_periodo(conn, inicio, fim):
+        por_dia.setdefault(dose.data, []).append(dose)
+    return por_dia
+
+# --- FUNÇÕES PARA PRESCRIÇÕES RECORRENTES ---
+# As doses de uma prescrição não ficam gravadas: são geradas a partir da regra
+# para o período pedido e só viram linha em doses quando o status é
+# registrado.
+
+def _ler_horarios(texto):
+    """Converte 'HH:MM, HH:MM' em uma lista ordenada de horários 'HH:MM'"""
+    horarios = set()
+    for parte in texto.split(","):
+        parte = parte.strip()
+        if parte:
+            horarios.add(datetime.strptime(parte, "%H:%M").strftime("%H:%M"))
+    return sorted(horarios)
+
+def _validar_prescricao(paciente_id, medicamento, horarios, data_inicio, data_fim=None,
+                        intervalo_dias=1, dias_semana=None, observacoes=""):
+    """Valida uma prescrição e retorna os valores normalizados para o INSERT"""
+    if not medicamento.strip():
+        raise ErroValidacao("O nome do medicamento não pode estar vazio")
+    try:
+        horarios = _ler_horarios(horarios)
+    except ValueError:
+        raise ErroValidacao("Horários inválidos. Use o formato HH:MM separado por vírgulas") from None
+    if not horarios:
+        raise ErroValidacao("Informe pelo menos um horário")
+    data_inicio = _ler_data(data_inicio)
+    data_fim = _ler_data(data_fim) if data_fim else None
+    if data_fim is not None and data_fim < data_inicio:
+        raise ErroValidacao("A data final não pode ser anterior à data inicial")
+    if int(intervalo_dias) < 1:
+        raise ErroValidacao("O intervalo deve ser de pelo menos 1 dia")
+
+    if dias_semana and not set(dias_semana) <= set(range(7)):
+        raise ErroValidacao("Dias da semana inválidos (0 = segunda ... 6 = domingo)")
+
+    dias = ",".join(str(d) for d in sorted(set(dias_semana))) if dias_semana else None
+    return (paciente_id, medicamento.strip(), ",".join(horarios), data_inicio, data_fim,
+            int(intervalo_dias), dias, observacoes.strip())
+
+_INSERIR_PRESCRICAO = """INSERT INTO prescricoes
+    (paciente_id, medicamento, horarios, data_inicio, data_fim,
+     intervalo_dias, dias_semana, observacoes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+
+@_altera_dados
+def adicionar_prescricao(conn, paciente_id, medicamento, horarios, data_inicio, data_fim=None,
+                         intervalo_dias=1, dias_semana=None, observacoes="",
+                         janela_min=JANELA_CONFLITO_MIN, permitir_conflito=False):
+    """Adiciona uma prescrição recorrente para um paciente e retorna seu id.
+
+    Levanta ErroConflito se alguma dose prevista ficar a menos de
+    `janela_min` minutos de outra do mesmo medicamento para o paciente, a
+    não ser com permitir_conflito=True.
+    """
+    valores = _validar_prescricao(paciente_id, medicamento, horarios, data_inicio, data_fim,
+                                  intervalo_dias, dias_semana, observacoes)
+    try:
+        if not permitir_conflito:
+            conflitos = _conflitos_da_prescricao(conn, _prescricao_dos_valores(valores),
+                                                 janela_min)
+            if conflitos:
+                raise _erro_conflito(valores[1], conflitos)
+        c = conn.cursor()
+        c.execute(_INSERIR_PRESCRICAO, valores)
+        conn.commit()
+        return c.lastrowid
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao adicionar prescrição: {e}") from e
+
+@_em_cache
+def listar_prescricoes(conn, paciente_id, vigentes_em=None):
+    """Prescrições do paciente; com `vigentes_em`, só as que não terminaram antes dessa data"""
+    try:
+        c = conn.cursor()
+        c.row_factory = Prescricao.fabrica
+        c.execute("""SELECT pr.id, p.nome, pr.medicamento, pr.horarios, pr.data_inicio,
+                            pr.data_fim, pr.intervalo_dias, pr.dias_semana, pr.observacoes,
+                            pr.paciente_id
+                     FROM prescricoes pr
+                     JOIN pacientes p ON pr.paciente_id = p.id
+                     WHERE pr.paciente_id = ? AND (? IS NULL OR pr.data_fim IS NULL
+                                                   OR pr.data_fim >= ?)
+                     ORDER BY pr.data_inicio, pr.id""", (paciente_id, vigentes_em, vigentes_em))
+        return c.fetchall()
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao listar prescrições: {e}") from e
+
+@_em_cache
+def ultima_dose_registrada(conn, id_prescricao):
+    """Data ('YYYY-MM-DD') da última dose registrada da prescrição, ou None"""
+    try:
+        dia = conn.execute("SELECT MAX(dia) FROM doses WHERE prescricao_id = ?",
+                           (id_prescricao,)).fetchone()[0]
+        if dia is None:
+            # Os arquivos só têm doses anteriores às do banco principal
+            linha = conn.execute("SELECT data_inicio FROM prescricoes WHERE id = ?",
+                                 (id_prescricao,)).fetchone()
+            if linha is not None:
+                arquivos = _esquemas_de_doses(conn, dia_da_data(linha[0]),
+                                              dia_da_data(date.max.isoformat()))[1:]
+                if arquivos:
+                    dia = conn.execute(f"""SELECT MAX(dia) FROM {_tabela_doses(arquivos)}
+                                           WHERE prescricao_id = ?""",
+                                       (id_prescricao,)).fetchone()[0]
+        return None if dia is None else data_do_dia(dia)
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao consultar doses da prescrição: {e}") from e
+
+@_altera_dados
+def encerrar_prescricao(conn, id_prescricao, data_fim):
+    """Encerra a prescrição em data_fim: nenhuma dose é prevista depois dela.
+
+    As doses já registradas continuam no histórico. Para trocar horários
+    ou intervalo, encerre a prescrição e cadastre uma nova a partir do dia
+    seguinte.
+    """
+    data_fim = _ler_data(data_fim)
+    try:
+        linha = conn.execute("SELECT data_inicio FROM prescricoes WHERE id = ?",
+                             (id_prescricao,)).fetchone()
+        if linha is None:
+            raise ErroValidacao(f"Prescrição {id_prescricao} não existe")
+        if data_fim < linha[0]:
+            raise ErroValidacao("A prescrição não pode terminar antes de começar; "
+                                "remova-a se foi cadastrada por engano")
+        # Uma dose registrada depois do fim deixaria de ser prevista e os
+        # relatórios contariam uma tomada sem dose esperada
+        ultima = ultima_dose_registrada(conn, id_prescricao)
+        if ultima is not None and data_fim < ultima:
+            raise ErroValidacao(f"Há doses desta prescrição registradas até {ultima}; "
+                                "o último dia não pode ser anterior")
+        conn.execute("UPDATE prescricoes SET data_fim = ? WHERE id = ?", (data_fim, id_prescricao))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        raise ErroBanco(f"Erro ao encerrar prescrição: {e}") from e
+
+@_altera_dados
+def remover_prescricao(conn, id_prescricao):
+    """Remove uma prescrição cadastrada por engano; as doses registradas viram avulsas"""
+    try:
+        conn.execute("DELETE FROM prescricoes WHERE id = ?", (id_prescricao,))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        raise ErroBanco(f"Erro ao remover prescrição: {e}") from e
+
+def _prescricoes_no_periodo(conn, inicio, fim, paciente_id=None, medicamento=None):
+    """Retorna as prescrições que têm alguma dose possível entre inicio e fim"""
+    c = conn.cursor()
+    c.row_factory = Prescricao.fabrica
+    filtro, parametros = "", [fim, inicio]
+    if paciente_id is not None:
+        filtro += " AND pr.paciente_id = ?"
+        parametros.append(paciente_id)
+    if medicamento is not None:
+        filtro += " AND pr.medicamento = ? COLLATE NOCASE"
+        parametros.append(medicamento)
+    c.execute(f"""SELECT pr.id, p.nome, pr.medicamento, pr.horarios, pr.data_inicio, pr.data_fim,
+                         pr.intervalo_dias, pr.dias_semana, pr.observacoes, pr.paciente_id
+                  FROM prescricoes pr
+                  JOIN pacientes p ON pr.paciente_id = p.id
+                  WHERE pr.data_inicio <= ? AND (pr.data_fim IS NULL OR pr.data_fim >= ?)
+                  {filtro}""", parametros)
+    return c.fetchall()
+
+def _limites_da_regra(prescricao, ordinal_inicio, ordinal_fim):
+    """Primeiro e último ordinal possíveis da regra no período, o primeiro já
+    alinhado ao "a cada N dias desde data_inicio" (primeiro > último se não houver)"""
+    origem = date.fromisoformat(prescricao.data_inicio).toordinal()
+    intervalo = prescricao.intervalo_dias
+    primeiro = max(origem, ordinal_inicio)
+    ultimo = ordinal_fim
+    if prescricao.data_fim:
+        ultimo = min(ultimo, date.fromisoformat(prescricao.data_fim).toordinal())
+    atraso = (primeiro - origem) % intervalo
+    if atraso:
+        primeiro += intervalo - atraso
+    return primeiro, ultimo
+
+def _semana_da_regra(prescricao):
+    dias_semana = prescricao.dias_semana
+    return frozenset(int(d) for d in dias_semana.split(",")) if dias_semana else None
+
+def _dias_da_regra(prescricao, ordinal_inicio, ordinal_fim):
+    """Ordinais dos dias entre ordinal_inicio e ordinal_fim em que a regra prevê doses"""
+    primeiro, ultimo = _limites_da_regra(prescricao, ordinal_inicio, ordinal_fim)
+    semana = _semana_da_regra(prescricao)
+    for ordinal in range(primeiro, ultimo + 1, prescricao.intervalo_dias):
+        # date.fromordinal(1) é uma segunda-feira
+        if semana is None or (ordinal - 1) % 7 in semana:
+            yield ordinal
+
+def _contar_dias_da_regra(prescricao, ordinal_inicio, ordinal_fim):
+    """Quantidade de dias de _dias_da_regra, sem percorrê-los"""
+    primeiro, ultimo = _limites_da_regra(prescricao, ordinal_inicio, ordinal_fim)
+    if primeiro > ultimo:
+        return 0
+    intervalo = prescricao.intervalo_dias
+    passos = (ultimo - primeiro) // intervalo + 1
+    semana = _semana_da_regra(prescricao)
+    if semana is None:
+        return passos
+    # Sete passos de `intervalo` dias somam um múltiplo de 7: os dias da
+    # semana visitados se repetem a cada ciclo de sete passos
+    ciclos, resto = divmod(passos, 7)
+    no_ciclo = [(primeiro + passo * intervalo - 1) % 7 in semana for passo in range(7)]
+    return ciclos * sum(no_ciclo) + sum(no_ciclo[:resto])
+
+def expandir_prescricoes(prescricoes, inicio, fim):
+    """Gera as doses das prescrições entre inicio e fim (datas 'YYYY-MM-DD').
+
+    Trabalha com ordinais de data e converte cada dia para texto uma única
+    vez, de modo que expandir centenas de prescrições em milhares de doses
+    custa apenas um laço sobre os dias válidos de cada uma.
+    """
+    ordinal_inicio = date.fromisoformat(inicio).toordinal()
+    ordinal_fim = date.fromisoformat(fim).toordinal()
+    datas = {}  # ordinal -> 'YYYY-MM-DD'
+    doses = []
+
+    for prescricao in prescricoes:
+        lista_horarios = prescricao.horarios.split(",")
+
+        for ordinal in _dias_da_regra(prescricao, ordinal_inicio, ordinal_fim):
+            data = datas.get(ordinal)
+            if data is None:
+                data = datas[ordinal] = date.fromordinal(ordinal).isoformat()
+            for horario in lista_horarios:
+                doses.append(Dose(None, prescricao.nome_paciente, prescricao.medicamento, horario,
+                                  0, prescricao.observacoes, prescricao.id, data))
+
+    return doses
+
+def contar_previstas_por_paciente(prescricoes, inicio, fim):
+    """Conta as doses previstas de cada paciente entre inicio e fim.
+
+    Cada prescrição custa uma conta (_contar_dias_da_regra), qualquer que
+    seja o tamanho do período.
+    """
+    ordinal_inicio = date.fromisoformat(inicio).toordinal()
+    ordinal_fim = date.fromisoformat(fim).toordinal()
+    contagens = {}
+    for prescricao in prescricoes:
+        quantidade = (_contar_dias_da_regra(prescricao, ordinal_inicio, ordinal_fim)
+                      * len(prescricao.horarios.split(",")))
+        if quantidade:
+            contagens[prescricao.paciente_id] = contagens.get(prescricao.paciente_id, 0) + quantidade
+    return contagens
+
+def contar_previstas_por_dia(prescricoes, inicio, fim):
+    """Lista com as doses previstas de cada dia entre inicio e fim (índice 0 = inicio).
+
+    As prescrições são agrupadas pelo padrão da regra (intervalo, dia de
+    partida no ciclo e dias da semana). Dentro de um grupo cada prescrição
+    só marca onde começa e onde termina (soma de prefixos), e cada dia é
+    visitado uma vez por grupo: o custo é prescrições + grupos × dias, e
+    quase todas as prescrições diárias caem no mesmo grupo.
+    """
+    ordinal_inicio = date.fromisoformat(inicio).toordinal()
+    ordinal_fim = date.fromisoformat(fim).toordinal()
+    dias = ordinal_fim - ordinal_inicio + 1
+    grupos = {}  # padrão -> variações da soma por dia
+    for prescricao in prescricoes:
+        primeiro, ultimo = _limites_da_regra(prescricao, ordinal_inicio, ordinal_fim)
+        if primeiro > ultimo:
+            continue
+        intervalo = prescricao.intervalo_dias
+        padrao = (intervalo, primeiro % intervalo, _semana_da_regra(prescricao))
+        variacoes = grupos.get(padrao)
+        if variacoes is None:
+            variacoes = grupos[padrao] = [0] * (dias + 1)
+        por_dia = len(prescricao.horarios.split(","))
+        variacoes[primeiro - ordinal_inicio] += por_dia
+        variacoes[ultimo - ordinal_inicio + 1] -= por_dia
+
+    contagens = [0] * dias
+    for (intervalo, resto, semana), variacoes in grupos.items():
+        soma = 0
+        for deslocamento in range(dias):
+            soma += variacoes[deslocamento]
+            ordinal = ordinal_inicio + deslocamento
+            if (soma and ordinal % intervalo == resto
+                    and (semana is None or (ordinal - 1) % 7 in semana)):
+                contagens[deslocamento] += soma
+    return contagens
+
+def _ordem_dose(dose):
+    return dose.data, dose.horario
+
+def _dose_gravada(cursor, linha):
+    """row_factory das doses lidas da tabela doses (minuto e dia inteiros)"""
+    id_dose, nome, medicamento, minuto, tomou, observacoes, prescricao_id, dia = linha
+    return Dose(id_dose, nome, medicamento, _HORARIOS[minuto], tomou, observacoes,
+                prescricao_id, data_do_dia(dia))
+
+def iterar_doses_por_periodo(conn, inicio, fim, paciente_id=None):
+    """Percorre as doses avulsas, registradas e previstas entre inicio e fim,
+    em ordem de data e horário.
+
+    As doses gravadas vêm direto do cursor, sem fetchall(); só as doses
+    previstas (limitadas pelas prescrições ativas) ficam em memória. Se o
+    período alcança doses arquivadas, cada arquivo é lido pelo seu próprio
+    cursor e entra na mesma intercalação. Com `paciente_id`, só as doses
+    desse paciente (lidas pelo índice de paciente e dia).
+    """
+    try:
+        dia_inicio, dia_fim = dia_da_data(inicio), dia_da_data(fim)
+        esquemas = _esquemas_de_doses(conn, dia_inicio, dia_fim)
+        filtro, parametros = "", (dia_inicio, dia_fim)
+        if paciente_id is not None:
+            filtro, parametros = "AND m.paciente_id = ?", (dia_inicio, dia_fim, paciente_id)
+
+        # Doses de prescrição já registradas substituem as previstas
+        registradas = set()
+        for esquema in esquemas:
+            c = conn.execute(f"""SELECT m.prescricao_id, m.dia, m.minuto FROM {esquema}.doses m
+                                 WHERE m.dia BETWEEN ? AND ? AND m.prescricao_id IS NOT NULL
+                                 {filtro}""", parametros)
+            registradas.update((prescricao_id, data_do_dia(dia), _HORARIOS[minuto])
+                               for prescricao_id, dia, minuto in c)
+        previstas = [
+            dose for dose in expandir_prescricoes(
+                _prescricoes_no_periodo(conn, inicio, fim, paciente_id), inicio, fim)
+            if (dose.prescricao_id, dose.data, dose.horario) not in registradas
+        ]
+        previstas.sort(key=_ordem_dose)
+
+        cursores = []
+        for esquema in esquemas:
+            c = conn.cursor()
+            c.row_factory = _dose_gravada
+            c.execute(f"""SELECT m.id, p.nome, m.medicamento, m.minuto, m.tomou, m.observacoes,
+                                 m.prescricao_id, m.dia
+                          FROM {esquema}.doses m
+                          JOIN main.pacientes p ON m.paciente_id = p.id
+                          WHERE m.dia BETWEEN ? AND ? {filtro}
+                          ORDER BY m.dia, m.minuto""", parametros)
+            cursores.append(c)
+        yield from heapq.merge(*cursores, previstas, key=_ordem_dose)
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao listar medicamentos: {e}") from e
+
+@_em_cache
+def listar_doses_por_periodo(conn, inicio, fim):
+    """Retorna as doses avulsas, registradas e previstas entre inicio e fim"""
+    return list(iterar_doses_por_periodo(conn, inicio, fim))
+
+def contar_doses_por_dia(conn, inicio, fim):
+    """Conta as doses de cada dia entre inicio e fim"""
+    return {dia.data: dia.total for dia in resumo_por_dia(conn, inicio, fim) if dia.total}
+
+_REGISTRAR_DOSE_PREVISTA = """INSERT INTO doses
+    (paciente_id, medicamento, minuto, dia, tomou, observacoes, prescricao_id)
+    SELECT paciente_id, medicamento, ?, ?, ?, observacoes, id
+    FROM prescricoes WHERE id = ?
+    ON CONFLICT(prescricao_id, dia, minuto) DO UPDATE SET tomou = excluded.tomou"""
+
+@_altera_dados
+def registrar_status_dose(conn, prescricao_id, data, horario, status):
+    """Grava o status de uma dose prevista, criando sua linha em doses"""
+    try:
+        c = conn.cursor()
+        c.execute(_REGISTRAR_DOSE_PREVISTA, (minuto_do_horario(horario), dia_da_data(data),
+                                             status, prescricao_id))
+        conn.commit()
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao atualizar status do medicamento: {e}") from e
+
+def atualizar_status_dose(conn, dose, status):
+    """Atualiza o status de uma dose, gravada ou apenas prevista"""
+    if dose.id is not None:
+        atualizar_status_medicamento(conn, dose.id, status)
+    else:
+        registrar_status_dose(conn, dose.prescricao_id, dose.data, dose.horario, status)
+
+@_altera_dados
+def atualizar_status_em_lote(conn, alteracoes):
+    """Aplica vários pares (dose, status) em uma única transação"""
+    gravadas = [(status, dose.id) for dose, status in alteracoes if dose.id is not None]
+    previstas = [(minuto_do_horario(dose.horario), dia_da_data(dose.data), status,
+                  dose.prescricao_id)
+                 for dose, status in alteracoes if dose.id is None]
+
+    try:
+        c = conn.cursor()
+        c.executemany("UPDATE doses SET tomou=? WHERE id=?", gravadas)
+        c.executemany(_REGISTRAR_DOSE_PREVISTA, previstas)
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        raise ErroBanco(f"Erro ao atualizar status dos medicamentos: {e}") from e
+
+# --- CONFLITOS DE HORÁRIO ---
+# Uma dose avulsa conflita com outra dose do mesmo medicamento (sem
+# diferenciar maiúsculas) para o mesmo paciente a menos de `janela_min`
+# minutos, gravada ou prevista por uma prescrição, inclusive de um lado e
+# do outro da meia-noite. Uma prescrição nova conflita se alguma das doses
+# que ela prevê ficar nessa situação. A busca nas doses gravadas é um
+# intervalo no índice (paciente_id, medicamento, dia, minuto) e, como nas
+# consultas de período, inclui os arquivos anuais que o intervalo alcança.
+
+def _conflitos(conn, paciente_id, medicamento, dia, minuto, janela_min):
+    """Doses que conflitam com a dose (dia, minuto), em ordem de horário"""
+    if janela_min <= 0:
+        return []
+    momento = dia * 1440 + minuto
+    primeiro, ultimo = momento - janela_min + 1, momento + janela_min - 1
+    dia_inicio, dia_fim = primeiro // 1440, ultimo // 1440
+
+    doses = _tabela_doses(_esquemas_de_doses(conn, dia_inicio, dia_fim))
+    c = conn.execute(f"""SELECT id, medicamento, dia, minuto, prescricao_id FROM {doses}
+                         WHERE paciente_id = ? AND medicamento = ? COLLATE NOCASE
+                           AND dia BETWEEN ? AND ?
+                           AND dia * 1440 + minuto BETWEEN ? AND ?""",
+                     (paciente_id, medicamento, dia_inicio, dia_fim, primeiro, ultimo))
+    conflitos = [Conflito(id_dose, nome, data_do_dia(dia_dose), _HORARIOS[minuto_dose],
+                          prescricao_id)
+                 for id_dose, nome, dia_dose, minuto_dose, prescricao_id in c]
+    registradas = {(conflito.prescricao_id, conflito.data, conflito.horario)
+                   for conflito in conflitos}
+
+    inicio, fim = data_do_dia(dia_inicio), data_do_dia(dia_fim)
+    for prescricao in _prescricoes_no_periodo(conn, inicio, fim, paciente_id, medicamento):
+        for ordinal in _dias_da_regra(prescricao, dia_inicio + EPOCA, dia_fim + EPOCA):
+            for horario in prescricao.horarios.split(","):
+                previsto = (ordinal - EPOCA) * 1440 + minuto_do_horario(horario)
+                data = data_do_dia(ordinal - EPOCA)
+                if (primeiro <= previsto <= ultimo
+                        and (prescricao.id, data, horario) not in registradas):
+                    conflitos.append(Conflito(None, prescricao.medicamento, data, horario,
+                                              prescricao.id))
+    conflitos.sort(key=lambda conflito: (conflito.data, conflito.horario))
+    return conflitos
+
+def buscar_conflitos(conn, paciente_id, medicamento, horario, data, janela_min=JANELA_CONFLITO_MIN):
+    """Retorna as doses que conflitariam com uma nova dose avulsa"""
+    _, medicamento, dia, minuto, _ = _validar_medicamento(paciente_id, medicamento, horario, data, "")
+    try:
+        return _conflitos(conn, paciente_id, medicamento, dia, minuto, janela_min)
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao verificar conflitos de horário: {e}") from e
+
+def _vigencia(prescricao):
+    """Primeiro e último ordinal da prescrição (date.max se for de uso contínuo)"""
+    fim = date.fromisoformat(prescricao.data_fim) if prescricao.data_fim else date.max
+    return date.fromisoformat(prescricao.data_inicio).toordinal(), fim.toordinal()
+
+def _regra_perto(regra, minutos, ordinal, minuto, janela_min):
+    """A regra (com os `minutos` de seus horários) prevê dose a menos de
+    `janela_min` minutos do momento (ordinal, minuto)?"""
+    alcance = janela_min // 1440 + 1
+    momento = ordinal * 1440 + minuto
+    for dia in _dias_da_regra(regra, ordinal - alcance, ordinal + alcance):
+        for minuto_regra in minutos:
+            if abs(dia * 1440 + minuto_regra - momento) < janela_min:
+                return True
+    return False
+
+def _conflitos_entre_regras(nova, outra, janela_min, registradas=frozenset()):
+    """Doses previstas por `outra` que ficam perto de alguma dose de `nova`"""
+    alcance = janela_min // 1440 + 1
+    inicio_nova, fim_nova = _vigencia(nova)
+    inicio_outra, fim_outra = _vigencia(outra)
+    inicio = max(inicio_nova, inicio_outra) - alcance
+    fim = min(fim_nova, fim_outra) + alcance
+    # Os dias das duas regras se repetem juntos a cada mmc(intervalos, 7)
+    # dias: um ciclo a partir do início comum basta para achar o conflito
+    ciclo = math.lcm(nova.intervalo_dias, outra.intervalo_dias, 7)
+    fim = min(fim, inicio + ciclo + 2 * alcance)
+
+    minutos = [minuto_do_horario(horario) for horario in nova.horarios.split(",")]
+    conflitos = []
+    for ordinal in _dias_da_regra(outra, inicio, fim):
+        for horario in outra.horarios.split(","):
+            if _regra_perto(nova, minutos, ordinal, minuto_do_horario(horario), janela_min):
+                data = date.fromordinal(ordinal).isoformat()
+                if (outra.id, data, horario) not in registradas:
+                    conflitos.append(Conflito(None, outra.medicamento, data, horario, outra.id))
+    return conflitos
+
+def _conflitos_da_prescricao(conn, nova, janela_min, pendentes=()):
+    """Doses gravadas, previstas ou de `pendentes` (regras ainda não gravadas)
+    que conflitam com a prescrição `nova`, em ordem de horário"""
+    if janela_min <= 0:
+        return []
+    alcance = janela_min // 1440 + 1
+    inicio, fim = _vigencia(nova)
+    minutos = [minuto_do_horario(horario) for horario in nova.horarios.split(",")]
+
+    dia_inicio = inicio - alcance - EPOCA
+    dia_fim = min(fim + alcance, date.max.toordinal()) - EPOCA
+    doses = _tabela_doses(_esquemas_de_doses(conn, dia_inicio, dia_fim))
+    c = conn.execute(f"""SELECT id, medicamento, dia, minuto, prescricao_id FROM {doses}
+                         WHERE paciente_id = ? AND medicamento = ? COLLATE NOCASE
+                           AND dia BETWEEN ? AND ?""",
+                     (nova.paciente_id, nova.medicamento, dia_inicio, dia_fim))
+    conflitos = [Conflito(id_dose, nome, data_do_dia(dia), _HORARIOS[minuto], prescricao_id)
+                 for id_dose, nome, dia, minuto, prescricao_id in c
+                 if _regra_perto(nova, minutos, dia + EPOCA, minuto, janela_min)]
+    registradas = {(conflito.prescricao_id, conflito.data, conflito.horario)
+                   for conflito in conflitos}
+
+    fim_texto = nova.data_fim or date.max.isoformat()
+    for outra in itertools.chain(pendentes, _prescricoes_no_periodo(
+            conn, nova.data_inicio, fim_texto, nova.paciente_id, nova.medicamento)):
+        conflitos += _conflitos_entre_regras(nova, outra, janela_min, registradas)
+    conflitos.sort(key=lambda conflito: (conflito.data, conflito.horario))
+    return conflitos
+
+def _prescricao_dos_valores(valores):
+    """Prescrição ainda sem id a partir dos valores de _validar_prescricao"""
+    (paciente_id, medicamento, horarios, data_inicio, data_fim, intervalo_dias, dias_semana,
+     observacoes) = valores
+    return Prescricao(None, "", medicamento, horarios, data_inicio, data_fim, intervalo_dias,
+                      dias_semana, observacoes, paciente_id)
+
+def _erro_conflito(medicamento, conflitos):
+    horarios = ", ".join(f"{conflito.horario} de {conflito.data}" for conflito in conflitos[:5])
+    return ErroConflito(f"{medicamento} já está agendado para o paciente perto deste horário "
+                        f"({horarios})", conflitos)
+
+# --- FUNÇÕES DE BUSCA ---
+LIMITE_BUSCA = 20
+
+def _consulta_fts(termo):
+    """Converte o texto digitado em uma consulta FTS5 de prefixos.
+
+    Cada palavra vira um prefixo entre aspas ("capto"*), de modo que
+    caracteres especiais da sintaxe do FTS5 digitados pelo usuário não
+    causam erro. Todas as palavras precisam aparecer no resultado.
+    """
+    palavras = [p.replace('"', '""') for p in termo.split()]
+    return " ".join(f'"{p}"*' for p in palavras if p)
+
+@_em_cache
+def buscar_pacientes(conn, termo, limite=LIMITE_BUSCA):
+    """Busca pacientes por nome ou condição, do mais ao menos relevante"""
+    consulta = _consulta_fts(termo)
+    if not consulta:
+        return []
+
+    try:
+        c = conn.cursor()
+        c.row_factory = Paciente.fabrica
+        # Peso maior para o nome do que para a condição
+        c.execute("""SELECT p.* FROM pacientes_fts
+                     JOIN pacientes p ON p.id = pacientes_fts.rowid
+                     WHERE pacientes_fts MATCH ?
+                     ORDER BY bm25(pacientes_fts, 10.0, 1.0)
+                     LIMIT ?""", (consulta, limite))
+        return c.fetchall()
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao buscar pacientes: {e}") from e
+
+@_em_cache
+def buscar_medicamentos(conn, termo, limite=LIMITE_BUSCA):
+    """Busca medicamentos e observações no catálogo de medicamentos"""
+    consulta = _consulta_fts(termo)
+    if not consulta:
+        return []
+
+    try:
+        c = conn.cursor()
+        c.row_factory = MedicamentoEncontrado.fabrica
+        c.execute("""SELECT cm.paciente_id, p.nome, cm.medicamento, cm.observacoes, cm.usos
+                     FROM catalogo_fts
+                     JOIN catalogo_medicamentos cm ON cm.id = catalogo_fts.rowid
+                     JOIN pacientes p ON p.id = cm.paciente_id
+                     WHERE catalogo_fts MATCH ?
+                     ORDER BY bm25(catalogo_fts, 10.0, 1.0)
+                     LIMIT ?""", (consulta, limite))
+        return c.fetchall()
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao buscar medicamentos: {e}") from e
+
+# --- FUNÇÕES PARA RELATÓRIOS ---
+# Os relatórios leem resumo_diario (uma linha por dia) e somam as doses
+# previstas das prescrições; doses previstas sem registro contam como não
+# tomadas.
+
+@_em_cache
+def contar_pacientes(conn):
+    """Retorna o total de pacientes cadastrados"""
+    try:
+        return conn.execute("SELECT COUNT(*) FROM pacientes").fetchone()[0]
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao gerar relatórios: {e}") from e
+
+@_em_cache
+def resumo_por_dia(conn, inicio, fim):
+    """Retorna o resumo (total, tomados, não tomados) de cada dia entre inicio e fim"""
+    try:
+        c = conn.cursor()
+        c.execute("""SELECT dia, total - de_prescricao, tomados FROM resumo_diario
+                     WHERE dia BETWEEN ? AND ?""", (dia_da_data(inicio), dia_da_data(fim)))
+        totais = {data_do_dia(dia): (total, tomados) for dia, total, tomados in c.fetchall()}
+
+        previstas = contar_previstas_por_dia(_prescricoes_no_periodo(conn, inicio, fim),
+                                             inicio, fim)
+        ordinal_inicio = date.fromisoformat(inicio).toordinal()
+        dias = []
+        for deslocamento, quantidade in enumerate(previstas):
+            data = date.fromordinal(ordinal_inicio + deslocamento).isoformat()
+            total, tomados = totais.get(data, (0, 0))
+            total += quantidade
+            dias.append(ResumoDia(data, total, tomados, total - tomados))
+        return dias
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao gerar relatórios: {e}") from e
+
+@_em_cache
+def adesao_por_paciente(conn, inicio, fim):
+    """Retorna o total de doses e as tomadas por paciente entre inicio e fim"""
+    try:
+        dia_inicio, dia_fim = dia_da_data(inicio), dia_da_data(fim)
+        doses = _tabela_doses(_esquemas_de_doses(conn, dia_inicio, dia_fim))
+        c = conn.cursor()
+        c.execute(f"""SELECT p.id, p.nome,
+                             COUNT(m.id) - COUNT(m.prescricao_id),
+                             COALESCE(SUM(m.tomou = 1), 0)
+                      FROM pacientes p
+                      LEFT JOIN {doses} m
+                          ON m.paciente_id = p.id AND m.dia BETWEEN ? AND ?
+                      GROUP BY p.id
+                      ORDER BY p.nome""", (dia_inicio, dia_fim))
+        linhas = c.fetchall()
+
+        previstas = contar_previstas_por_paciente(_prescricoes_no_periodo(conn, inicio, fim),
+                                                  inicio, fim)
+
+        return [AdesaoPaciente(paciente_id, nome, total + previstas.get(paciente_id, 0), tomados)
+                for paciente_id, nome, total, tomados in linhas]
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao gerar relatórios: {e}") from e
+
+# --- UNIDADES ---
+# Cada casa de repouso (unidade) tem seu próprio arquivo SQLite: a trava de
+# escrita de uma casa não atrasa as outras. O banco de CAMINHO_BANCO é a
+# unidade "principal"; as demais ficam em PASTA_UNIDADES como <nome>.db.
+# As funções de dados continuam recebendo a conexão; quem escolhe o
+# arquivo da sessão é a aplicação. relatorio_unidades junta os agregados
+# de todas as unidades, calculados em paralelo.
+PASTA_UNIDADES = Path('data/unidades')
+UNIDADE_PRINCIPAL = "principal"
+MAXIMO_THREADS_UNIDADES = 8
+
+def _e_copia_de_relatorios(caminho):
+    """Arquivo de cópia dos relatórios (instantaneo.py), que não é uma unidade"""
+    return re.fullmatch(r".+_relatorios(_\d+)?", Path(caminho).stem) is not None
+
+def listar_unidades(pasta=PASTA_UNIDADES, principal=CAMINHO_BANCO):
+    """Retorna {nome: caminho} das unidades, a principal primeiro"""
+    unidades = {UNIDADE_PRINCIPAL: Path(principal)}
+    pasta = Path(pasta)
+    if pasta.is_dir():
+        for caminho in sorted(pasta.glob("*.db")):
+            # Cópias dos relatórios ficam ao lado do banco de cada unidade
+            if not _e_copia_de_relatorios(caminho):
+                unidades[caminho.stem] = caminho
+    return unidades
+
+def criar_unidade(nome, pasta=PASTA_UNIDADES):
+    """Cria o banco de uma nova unidade e retorna (nome normalizado, caminho)"""
+    nome = unicodedata.normalize("NFKD", nome.strip().lower())
+    nome = "".join(letra for letra in nome if not unicodedata.combining(letra))
+    nome = re.sub(r"[^a-z0-9]+", "_", nome).strip("_")
+    if not nome:
+        raise ErroValidacao("O nome da unidade não pode estar vazio")
+    if nome == UNIDADE_PRINCIPAL or _e_copia_de_relatorios(nome):
+        raise ErroValidacao(f"Nome de unidade reservado: {nome}")
+    caminho = Path(pasta) / f"{nome}.db"
+    if caminho.exists():
+        raise ErroValidacao(f"A unidade {nome} já existe")
+    conn = conectar(caminho)
+    try:
+        # A unidade começa vazia, sem os pacientes de exemplo do banco novo
+        conn.execute("DELETE FROM pacientes")
+        conn.commit()
+    except sqlite3.Error as e:
+        raise ErroBanco(f"Erro ao criar unidade: {e}") from e
+    finally:
+        conn.close()
+    return nome, caminho
+
+def _agregados_da_unidade(caminho, inicio, fim):
+    conn = conectar(caminho)
+    try:
+        return contar_pacientes(conn), resumo_por_dia(conn, inicio, fim)
+    finally:
+        conn.close()
+
+def relatorio_unidades(unidades, inicio, fim, maximo_threads=MAXIMO_THREADS_UNIDADES):
+    """Calcula os agregados de cada unidade em paralelo e os junta.
+
+    `unidades` é {nome: caminho}, como em listar_unidades. Retorna
+    (adesões, dias): uma AdesaoUnidade por unidade no período e o resumo
+    por dia com as doses de todas as unidades somadas. Cada unidade é lida
+    por uma conexão própria em uma thread do pool; o sqlite3 libera o GIL
+    enquanto a consulta roda.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(len(unidades), maximo_threads)),
+                            thread_name_prefix="relatorio-unidade") as pool:
+        futuros = {nome: pool.submit(_agregados_da_unidade, caminho, inicio, fim)
+                   for nome, caminho in unidades.items()}
+
+    adesoes = []
+    totais = {}  # data -> [total, tomados]
+    for nome, futuro in futuros.items():
+        try:
+            pacientes, dias = futuro.result()
+        except ErroBanco as e:
+            raise ErroBanco(f"Unidade {nome}: {e}") from e
+        adesoes.append(AdesaoUnidade(nome, pacientes, sum(dia.total for dia in dias),
+                                     sum(dia.tomados for dia in dias)))
+        for dia in dias:
+            soma = totais.setdefault(dia.data, [0, 0])
+            soma[0] += dia.total
+            soma[1] += dia.tomados
+    dias = [ResumoDia(data, total, tomados, total - tomados)
+            for data, (total, tomados) in sorted(totais.items())]
+    return adesoes, dias
+
+# --- DOSES ARQUIVADAS ---
+# arquivo_doses.py move as doses anteriores a uma data de corte para um
+# arquivo SQLite por ano (pacientes_2024.db, ...), registrado na tabela
+# arquivos_doses. resumo_diario e catalogo_medicamentos continuam contando
+# as doses arquivadas, então os relatórios por dia não precisam dos
+# arquivos; as consultas que leem doses de um período (calendário, listas,
+# adesão, exportação) anexam com ATTACH os arquivos que o período alcança.
+MAXIMO_ANEXADOS = 9   # o SQLite aceita 10 bancos anexados por conexão
+
+def _caminho_principal(conn):
+    """Arquivo do banco principal da conexão"""
+    for _, nome, arquivo in conn.execute("PRAGMA database_list"):
+        if nome == "main":
+            return Path(arquivo)
+    raise ErroBanco("Banco principal não encontrado")
+
+def _anexados(conn):
+    return {nome for _, nome, _ in conn.execute("PRAGMA database_list")}
+
+def _esquemas_de_doses(conn, dia_inicio, dia_fim):
+    """Esquemas cujas tabelas doses têm dias entre dia_inicio e dia_fim.
+
+    O principal vem sempre primeiro; os arquivos do período são anexados
+    se ainda não estiverem.
+    """
+    arquivos = conn.execute("""SELECT ano, caminho FROM arquivos_doses
+                               WHERE dia_fim >= ? AND dia_inicio <= ?
+                               ORDER BY ano""", (dia_inicio, dia_fim)).fetchall()
+    if not arquivos:
+        return ["main"]
+
+    anexados = {nome for nome in _anexados(conn) if nome.startswith("arquivo_")}
+    pasta = _caminho_principal(conn).parent
+    necessarios = {f"arquivo_{ano}" for ano, _ in arquivos}
+    faltando = [(ano, caminho) for ano, caminho in arquivos if f"arquivo_{ano}" not in anexados]
+    # Libera espaço soltando arquivos anexados por consultas anteriores
+    for nome in sorted(anexados - necessarios):
+        if len(anexados) + len(faltando) <= MAXIMO_ANEXADOS:
+            break
+        conn.execute(f"DETACH DATABASE {nome}")
+        anexados.discard(nome)
+    for ano, caminho in faltando:
+        conn.execute(f"ATTACH DATABASE ? AS arquivo_{int(ano)}", (str(pasta / caminho),))
+    return ["main"] + [f"arquivo_{int(ano)}" for ano, _ in arquivos]
+
+def _tabela_doses(esquemas):
+    """Tabela (ou união) com as doses dos esquemas, para usar no FROM"""
+    if esquemas == ["main"]:
+        return "doses"
+    return "(" + " UNION ALL ".join(f"SELECT * FROM {esquema}.doses" for esquema in esquemas) + ")"
+
+# --- IMPORTAÇÃO E EXPORTAÇÃO ---
+# Os arquivos são lidos e gravados linha a linha: a importação valida cada
+# linha com as mesmas regras de adicionar_paciente, adicionar_medicamento e
+# adicionar_prescricao e grava em lotes (um executemany e um commit por
+# lote); a exportação percorre cursores sem carregar a tabela inteira.
+# Arquivos .csv (separados por vírgula, ponto e vírgula ou tabulação) e
+# .jsonl (um objeto JSON por linha) usam os mesmos nomes de coluna.
+TAMANHO_LOTE_IMPORTACAO = 1000
+COLUNAS_PACIENTES = ["id", "nome", "idade", "condicao", "data_cadastro"]
+COLUNAS_DOSES = ["data", "horario", "paciente", "medicamento", "tomou", "observacoes",
+                 "prescricao_id"]
+_DIAS_SEMANA = ["seg", "ter", "qua", "qui", "sex", "sab", "dom"]
+
+class ResultadoImportacao:
+    """Resumo de uma importação: linhas lidas, gravadas e as que tinham erro"""
+    __slots__ = ("lidas", "importadas", "erros")
+
+    def __init__(self):
+        self.lidas = 0
+        self.importadas = 0
+        self.erros = []  # (número da linha no arquivo, mensagem)
+
+def _formato_do_arquivo(arquivo, formato):
+    if formato:
+        return formato
+    sufixo = Path(getattr(arquivo, "name", str(arquivo))).suffix.lower()
+    return "jsonl" if sufixo in (".jsonl", ".ndjson") else "csv"
+
+@contextlib.contextmanager
+def _abrir_texto(arquivo, modo):
+    """Abre um caminho como texto UTF-8, ou usa o arquivo já aberto como está"""
+    if hasattr(arquivo, "read") or hasattr(arquivo, "write"):
+        yield arquivo
+        return
+    # utf-8-sig aceita a marca BOM que o Excel coloca no início do CSV
+    codificacao = "utf-8-sig" if modo == "r" else "utf-8"
+    with open(arquivo, modo, encoding=codificacao, newline="") as texto:
+        yield texto
+
+def _ler_registros(arquivo, formato):
+    """Gera (número da linha, dicionário) para cada registro do arquivo"""
+    if formato == "jsonl":
+        for numero, linha in enumerate(arquivo, start=1):
+            if not linha.strip():
+                continue
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError as e:
+                yield numero, ErroValidacao(f"JSON inválido: {e}")
+                continue
+            if not isinstance(registro, dict):
+                yield numero, ErroValidacao("Cada linha deve ser um objeto JSON")
+                continue
+            yield numero, registro
+        return
+
+    cabecalho = arquivo.readline()
+    if not cabecalho:
+        return
+    try:
+        dialeto = csv.Sniffer().sniff(cabecalho, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(itertools.chain([cabecalho], arquivo), dialect=dialeto)
+    leitor.fieldnames = [campo.strip().lower() for campo in leitor.fieldnames]
+    for registro in leitor:
+        yield leitor.line_num, registro
+
+def _texto(registro, campo, obrigatorio=False):
+    valor = registro.get(campo)
+    valor = "" if valor is None else str(valor).strip()
+    if obrigatorio and not valor:
+        raise ErroValidacao(f"Coluna '{campo}' vazia ou ausente")
+    return valor
+
+def _ler_data(texto):
+    """Aceita AAAA-MM-DD ou DD/MM/AAAA e retorna AAAA-MM-DD"""
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(texto, formato).date().isoformat()
+        except ValueError:
+            pass
+    raise ErroValidacao(f"Data inválida: {texto!r} (use AAAA-MM-DD ou DD/MM/AAAA)")
+
+def _ler_inteiro(texto, campo):
+    try:
+        return int(float(texto.replace(",", ".")))
+    except ValueError:
+        raise ErroValidacao(f"Valor inválido em '{campo}': {texto!r}") from None
+
+def _ler_dias_semana(texto):
+    """Aceita '0,2,4' ou 'seg, qua, sex' (0 = segunda)"""
+    dias = []
+    for parte in texto.replace(";", ",").split(","):
+        parte = parte.strip().lower()
+        if not parte:
+            continue
+        if parte[:3].replace("á", "a") in _DIAS_SEMANA:
+            dias.append(_DIAS_SEMANA.index(parte[:3].replace("á", "a")))
+        else:
+            dias.append(_ler_inteiro(parte, "dias_semana"))
+    return dias
+
+class _ResolvedorPacientes:
+    """Encontra o id do paciente pela coluna paciente_id ou pelo nome em 'paciente'"""
+
+    def __init__(self, conn):
+        self.ids = set()
+        self.por_nome = {}  # nome em minúsculas -> id, ou None se o nome se repete
+        for paciente in iterar_pacientes(conn):
+            self.ids.add(paciente.id)
+            chave = paciente.nome.casefold()
+            self.por_nome[chave] = None if chave in self.por_nome else paciente.id
+
+    def __call__(self, registro):
+        texto_id = _texto(registro, "paciente_id")
+        if texto_id:
+            paciente_id = _ler_inteiro(texto_id, "paciente_id")
+            if paciente_id not in self.ids:
+                raise ErroValidacao(f"Paciente {paciente_id} não existe")
+            return paciente_id
+
+        nome = _texto(registro, "paciente", obrigatorio=True)
+        chave = nome.casefold()
+        if chave not in self.por_nome:
+            raise ErroValidacao(f"Paciente '{nome}' não encontrado")
+        if self.por_nome[chave] is None:
+            raise ErroValidacao(f"Há mais de um paciente chamado '{nome}'; use paciente_id")
+        return self.por_nome[chave]
+
+def _importar(conn, arquivo, formato, sql, converter, tamanho_lote, progresso,
+              depois_do_lote=None):
+    """Lê, valida e grava os registros do arquivo em lotes de `tamanho_lote`.
+
+    `depois_do_lote`, se informado, é chamado sem argumentos a cada lote
+    gravado (para o conversor esquecer o que já está no banco).
+    """
+    resultado = ResultadoImportacao()
+    lote = []
+    primeira_linha_do_lote = None
+
+    def gravar():
+        try:
+            conn.executemany(sql, lote)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            raise ErroBanco(f"Erro ao importar as linhas {primeira_linha_do_lote} em diante "
+                            f"({resultado.importadas} já gravadas): {e}") from e
+        resultado.importadas += len(lote)
+        lote.clear()
+        if depois_do_lote:
+            depois_do_lote()
+        if progresso:
+            progresso(resultado)
+
+    with _abrir_texto(arquivo, "r") as texto:
+        for numero, registro in _ler_registros(texto, _formato_do_arquivo(arquivo, formato)):
+            resultado.lidas += 1
+            try:
+                if isinstance(registro, ErroValidacao):
+                    raise registro
+                valores = converter(registro)
+            except ErroValidacao as e:
+                resultado.erros.append((numero, str(e)))
+                continue
+            if not lote:
+                primeira_linha_do_lote = numero
+            lote.append(valores)
+            if len(lote) >= tamanho_lote:
+                gravar()
+        if lote:
+            gravar()
+    return resultado
+
+@_altera_dados
+def importar_pacientes(conn, arquivo, formato=None, tamanho_lote=TAMANHO_LOTE_IMPORTACAO,
+                       progresso=None):
+    """Importa pacientes (colunas nome, idade, condicao) e retorna o ResultadoImportacao.
+
+    Linhas inválidas são puladas e listadas em `erros`; cada lote gravado
+    fica salvo mesmo que um lote seguinte falhe. `progresso`, se
+    informado, é chamado com o resultado parcial após cada lote.
+    """
+    def converter(registro):
+        return _validar_paciente(_texto(registro, "nome"),
+                                 _ler_inteiro(_texto(registro, "idade", obrigatorio=True), "idade"),
+                                 _texto(registro, "condicao"))
+
+    return _importar(conn, arquivo, formato,
+                     "INSERT INTO pacientes (nome, idade, condicao) VALUES (?, ?, ?)",
+                     converter, tamanho_lote, progresso)
+
+@_altera_dados
+def importar_medicamentos(conn, arquivo, formato=None, tamanho_lote=TAMANHO_LOTE_IMPORTACAO,
+                          progresso=None, janela_min=JANELA_CONFLITO_MIN):
+    """Importa doses avulsas (paciente ou paciente_id, medicamento, horario, data, observacoes).
+
+    Uma linha que conflita com a agenda do paciente ou com uma linha
+    anterior do mesmo arquivo (a menos de `janela_min` minutos) vira erro
+    de linha; `janela_min=0` desliga a verificação.
+    """
+    paciente_de = _ResolvedorPacientes(conn)
+    # Linhas aceitas do lote ainda não gravado; as dos lotes anteriores já
+    # estão no banco e são vistas por _conflitos
+    aceitas = {}  # (paciente_id, medicamento em minúsculas, dia) -> minutos
+
+    def no_arquivo(paciente_id, medicamento, dia, minuto):
+        momento = dia * 1440 + minuto
+        conflitos = []
+        for outro_dia in (dia - 1, dia, dia + 1):
+            for outro in aceitas.get((paciente_id, medicamento.lower(), outro_dia), ()):
+                if abs(outro_dia * 1440 + outro - momento) < janela_min:
+                    conflitos.append(Conflito(None, medicamento, data_do_dia(outro_dia),
+                                              _HORARIOS[outro], None))
+        return conflitos
+
+    def converter(registro):
+        valores = _validar_medicamento(paciente_de(registro), _texto(registro, "medicamento"),
+                                       _texto(registro, "horario", obrigatorio=True),
+                                       _ler_data(_texto(registro, "data", obrigatorio=True)),
+                                       _texto(registro, "observacoes"))
+        if janela_min > 0:
+            paciente_id, medicamento, dia, minuto, _ = valores
+            try:
+                conflitos = (no_arquivo(paciente_id, medicamento, dia, minuto)
+                             or _conflitos(conn, paciente_id, medicamento, dia, minuto, janela_min))
+            except sqlite3.Error as e:
+                raise ErroBanco(f"Erro ao verificar conflitos de horário: {e}") from e
+            if conflitos:
+                raise _erro_conflito(medicamento, conflitos)
+            aceitas.setdefault((paciente_id, medicamento.lower(), dia), []).append(minuto)
+        return valores
+
+    return _importar(conn, arquivo, formato, _INSERIR_DOSE, converter, tamanho_lote, progresso,
+                     aceitas.clear)
+
+@_altera_dados
+def importar_prescricoes(conn, arquivo, formato=None, tamanho_lote=TAMANHO_LOTE_IMPORTACAO,
+                         progresso=None, janela_min=JANELA_CONFLITO_MIN):
+    """Importa prescrições recorrentes.
+
+    Colunas: paciente ou paciente_id, medicamento, horarios ('08:00, 20:00'),
+    data_inicio, data_fim, intervalo_dias, dias_semana, observacoes. Como
+    em importar_medicamentos, prescrições que conflitam com a agenda ou
+    com linhas anteriores do arquivo viram erros de linha.
+    """
+    paciente_de = _ResolvedorPacientes(conn)
+    aceitas = {}  # (paciente_id, medicamento em minúsculas) -> prescrições do lote não gravado
+
+    def converter(registro):
+        data_fim = _texto(registro, "data_fim")
+        intervalo = _texto(registro, "intervalo_dias")
+        valores = _validar_prescricao(
+            paciente_de(registro),
+            _texto(registro, "medicamento"),
+            _texto(registro, "horarios"),
+            _ler_data(_texto(registro, "data_inicio", obrigatorio=True)),
+            _ler_data(data_fim) if data_fim else None,
+            _ler_inteiro(intervalo, "intervalo_dias") if intervalo else 1,
+            _ler_dias_semana(_texto(registro, "dias_semana")),
+            _texto(registro, "observacoes"),
+        )
+        if janela_min > 0:
+            nova = _prescricao_dos_valores(valores)
+            chave = (nova.paciente_id, nova.medicamento.lower())
+            try:
+                conflitos = _conflitos_da_prescricao(conn, nova, janela_min,
+                                                     aceitas.get(chave, ()))
+            except sqlite3.Error as e:
+                raise ErroBanco(f"Erro ao verificar conflitos de horário: {e}") from e
+            if conflitos:
+                raise _erro_conflito(nova.medicamento, conflitos)
+            aceitas.setdefault(chave, []).append(nova)
+        return valores
+
+    return _importar(conn, arquivo, formato, _INSERIR_PRESCRICAO, converter, tamanho_lote,
+                     progresso, aceitas.clear)
+
+def _gravar_registros(saida, formato, colunas, linhas):
+    """Grava as linhas (tuplas na ordem de `colunas`) e retorna quantas foram gravadas"""
+    formato = _formato_do_arquivo(saida, formato)
+    quantidade = 0
+    with _abrir_texto(saida, "w") as texto:
+        if formato == "jsonl":
+            for linha in linhas:
+                texto.write(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False) + "\n")
+                quantidade += 1
+        else:
+            escritor = csv.writer(texto)
+            escritor.writerow(colunas)
+            for linha in linhas:
+                escritor.writerow(linha)
+                quantidade += 1
+    return quantidade
+
+def exportar_pacientes(conn, saida, formato=None):
+    """Grava todos os pacientes em CSV ou JSON Lines e retorna quantos foram gravados"""
+    return _gravar_registros(saida, formato, COLUNAS_PACIENTES, iterar_pacientes(conn))
+
+DIAS_POR_BLOCO_EXPORTACAO = 31
+
+def iterar_doses_em_blocos(conn, inicio, fim, dias_por_bloco=DIAS_POR_BLOCO_EXPORTACAO):
+    """Percorre as doses entre inicio e fim em ordem, um bloco de dias por vez.
+
+    As doses previstas de cada bloco são geradas só quando o bloco é lido,
+    então períodos longos não ficam inteiros na memória.
+    """
+    ordinal = date.fromisoformat(inicio).toordinal()
+    ultimo = date.fromisoformat(fim).toordinal()
+    while ordinal <= ultimo:
+        fim_bloco = min(ordinal + dias_por_bloco - 1, ultimo)
+        yield from iterar_doses_por_periodo(conn, date.fromordinal(ordinal).isoformat(),
+                                            date.fromordinal(fim_bloco).isoformat())
+        ordinal = fim_bloco + 1
+
+def exportar_doses(conn, saida, inicio, fim, formato=None):
+    """Grava o histórico de doses entre inicio e fim e retorna quantas foram gravadas.
+
+    Inclui as doses previstas das prescrições; as ainda sem registro saem
+    com tomou vazio.
+    """
+    linhas = ((dose.data, dose.horario, dose.nome_paciente, dose.medicamento,
+               None if dose.id is None else dose.tomou, dose.observacoes, dose.prescricao_id)
+              for dose in iterar_doses_em_blocos(conn, inicio, fim))
+    return _gravar_registros(saida, formato, COLUNAS_DOSES, linhas)
@@ -0,0 +1,271 @@
+"""Mede o tempo das consultas da camada de dados em bancos sintéticos.
+
+Uso:
+    python benchmark.py --tamanhos 1000 100000 1000000 --saida resultados.json
+
+Para cada tamanho (número aproximado de doses gravadas) um banco é
+gerado com gerar_dados.py em --pasta e reaproveitado nas execuções
+seguintes. Cada caso roda --repeticoes vezes e o resultado é gravado em
+JSON, para comparar execuções antes e depois de uma mudança. O cache de
+consultas fica desligado, a não ser com --com-cache, para que cada
+repetição vá ao banco.
+
+Depois dos casos, as escritas concorrentes são medidas no menor banco com
+cada quantidade de --escritores (threads gravando ao mesmo tempo), com
+commits próprios e pelo Escritor de escritor.py. `--escritores` sem valores
+pula essa parte.
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import banco
+from escritor import Escritor
+from gerar_dados import gerar_banco
+
+RESIDENTES = 150
+
+# --- CASOS ---
+# Cada caso recebe a conexão e o contexto do banco (datas de referência) e
+# executa uma vez o caminho de consulta que está sendo medido.
+
+def _listar_pacientes(conn, ctx):
+    banco.listar_pacientes(conn)
+
+def _listar_pacientes_pagina(conn, ctx):
+    banco.listar_pacientes_pagina(conn, 25, ctx["cursor_pacientes"])
+
+def _listar_medicamentos_por_data(conn, ctx):
+    banco.listar_medicamentos_por_data(conn, ctx["dia"])
+
+def _contar_medicamentos_por_data(conn, ctx):
+    banco.contar_medicamentos_por_data(conn, ctx["dia"])
+
+def _calendario_mes(conn, ctx):
+    # O que a aba Calendário faz a cada execução
+    banco.listar_medicamentos_por_mes(conn, ctx["ano"], ctx["mes"])
+
+def _relatorio_7_dias(conn, ctx):
+    banco.contar_pacientes(conn)
+    banco.resumo_por_dia(conn, ctx["dia_menos_6"], ctx["dia"])
+    banco.adesao_por_paciente(conn, ctx["dia_menos_6"], ctx["dia"])
+
+def _relatorio_12_meses(conn, ctx):
+    banco.resumo_por_dia(conn, ctx["dia_menos_364"], ctx["dia"])
+    banco.adesao_por_paciente(conn, ctx["dia_menos_364"], ctx["dia"])
+
+def _buscar(conn, ctx):
+    banco.buscar_pacientes(conn, "silva")
+    banco.buscar_medicamentos(conn, "losar")
+
+def _atualizar_status(conn, ctx):
+    banco.atualizar_status_medicamento(conn, ctx["dose_id"], 1)
+
+def _atualizar_status_em_lote(conn, ctx):
+    banco.atualizar_status_em_lote(conn, [(dose, 1) for dose in ctx["doses_do_dia"]])
+
+CASOS = [
+    ("listar_pacientes", _listar_pacientes),
+    ("listar_pacientes_pagina", _listar_pacientes_pagina),
+    ("listar_medicamentos_por_data", _listar_medicamentos_por_data),
+    ("contar_medicamentos_por_data", _contar_medicamentos_por_data),
+    ("calendario_mes", _calendario_mes),
+    ("relatorio_7_dias", _relatorio_7_dias),
+    ("relatorio_12_meses", _relatorio_12_meses),
+    ("buscar", _buscar),
+    ("atualizar_status", _atualizar_status),
+    ("atualizar_status_em_lote", _atualizar_status_em_lote),
+]
+
+# --- ESCRITAS CONCORRENTES ---
+# Alterações por segundo com N sessões gravando ao mesmo tempo: cada uma
+# com sua conexão e um commit por alteração ("direto") ou todas pelo
+# Escritor de escritor.py, que agrupa as alterações em transações.
+ALTERACOES_POR_ESCRITOR = 200
+
+def _escrever(alterar, doses, barreira, erros):
+    barreira.wait()
+    for i, dose in enumerate(doses):
+        try:
+            alterar(dose, i % 2)
+        except banco.ErroBanco:
+            erros.append(dose)
+
+def medir_escritas(caminho, escritores, modo, alteracoes=ALTERACOES_POR_ESCRITOR):
+    """Roda `escritores` threads com `alteracoes` cada e retorna o resultado"""
+    conn = banco.conectar(caminho)
+    try:
+        doses = [linha[0] for linha in conn.execute(
+            "SELECT id FROM doses ORDER BY id DESC LIMIT ?", (escritores * alteracoes,))]
+    finally:
+        conn.close()
+
+    escritor = Escritor(caminho) if modo == "escritor" else None
+    conexoes = []
+
+    def alteracao_da_thread():
+        if escritor is not None:
+            return lambda dose, status: escritor.executar(
+                banco.atualizar_status_medicamento, dose, status)
+        conexao = banco.abrir_conexao(caminho)
+        conexoes.append(conexao)
+        return lambda dose, status: banco.atualizar_status_medicamento(conexao, dose, status)
+
+    barreira = threading.Barrier(escritores + 1)
+    erros = []
+    threads = [threading.Thread(target=_escrever, args=(alteracao_da_thread(),
+                                                        doses[n::escritores], barreira, erros))
+               for n in range(escritores)]
+    for thread in threads:
+        thread.start()
+    barreira.wait()
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    segundos = time.perf_counter() - inicio
+
+    if escritor is not None:
+        escritor.fechar()
+    for conexao in conexoes:
+        conexao.close()
+    return {
+        "modo": modo,
+        "escritores": escritores,
+        "alteracoes": len(doses),
+        "erros": len(erros),
+        "transacoes": escritor.grupos if escritor is not None else len(doses),
+        "segundos": round(segundos, 3),
+        "alteracoes_por_s": round(len(doses) / segundos, 1),
+    }
+
+def executar_escritas(caminho, quantidades):
+    """Mede as escritas concorrentes diretas e pelo Escritor"""
+    resultados = []
+    for escritores in quantidades:
+        for modo in ("direto", "escritor"):
+            resultado = medir_escritas(caminho, escritores, modo)
+            resultados.append(resultado)
+            print(f"{escritores:>3} escritores {modo:<9} {resultado['alteracoes_por_s']:>10.1f} "
+                  f"alterações/s em {resultado['transacoes']} transações "
+                  f"({resultado['erros']} erros)", file=sys.stderr)
+    return resultados
+
+# --- EXECUÇÃO ---
+def preparar_banco(pasta, doses):
+    """Retorna o caminho do banco com ~`doses` linhas, gerando-o se preciso"""
+    caminho = Path(pasta) / f"bench_{doses}.db"
+    if not caminho.exists():
+        print(f"Gerando {caminho}...", file=sys.stderr)
+        gerar_banco(caminho, residentes=RESIDENTES, doses=doses)
+    return caminho
+
+def montar_contexto(conn):
+    """Escolhe as datas e linhas usadas pelos casos a partir do próprio banco"""
+    # O último dia do histórico é o "hoje" do banco gerado
+    dia = banco.data_do_dia(conn.execute("SELECT MAX(dia) FROM doses").fetchone()[0])
+    ultimo = date.fromisoformat(dia)
+    doses_do_dia = banco.listar_medicamentos_por_data(conn, dia)
+    pacientes = banco.listar_pacientes_pagina(conn, 26)
+    return {
+        "dia": dia,
+        "dia_menos_6": (ultimo - timedelta(days=6)).isoformat(),
+        "dia_menos_364": (ultimo - timedelta(days=364)).isoformat(),
+        "ano": ultimo.year,
+        "mes": ultimo.month,
+        "cursor_pacientes": (pacientes[-1].nome, pacientes[-1].id),
+        # Doses previstas de prescrições ainda não têm id
+        "dose_id": next(dose.id for dose in doses_do_dia if dose.id is not None),
+        "doses_do_dia": doses_do_dia,
+    }
+
+def medir(funcao, conn, ctx, repeticoes):
+    """Executa `funcao` uma vez para aquecer e retorna os tempos (ms) das repetições"""
+    funcao(conn, ctx)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(conn, ctx)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+def executar(tamanhos, pasta, repeticoes, filtro=None, com_cache=False):
+    """Roda os casos em cada tamanho e retorna a lista de resultados"""
+    Path(pasta).mkdir(parents=True, exist_ok=True)
+    resultados = []
+    for doses in tamanhos:
+        caminho = preparar_banco(pasta, doses)
+        conn = banco.conectar(caminho)
+        if not com_cache:
+            conn.cache_consultas.tamanho = 0
+        try:
+            linhas = conn.execute("SELECT COUNT(*) FROM doses").fetchone()[0]
+            ctx = montar_contexto(conn)
+            for nome, funcao in CASOS:
+                if filtro and filtro not in nome:
+                    continue
+                tempos = medir(funcao, conn, ctx, repeticoes)
+                resultado = {
+                    "tamanho": doses,
+                    "linhas": linhas,
+                    "caso": nome,
+                    "repeticoes": repeticoes,
+                    "min_ms": round(min(tempos), 3),
+                    "mediana_ms": round(statistics.median(tempos), 3),
+                    "media_ms": round(statistics.fmean(tempos), 3),
+                    "max_ms": round(max(tempos), 3),
+                }
+                resultados.append(resultado)
+                print(f"{doses:>9} {nome:<30} mediana {resultado['mediana_ms']:>10.3f} ms",
+                      file=sys.stderr)
+        finally:
+            conn.close()
+    return resultados
+
+def _versao_codigo():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="quantidade aproximada de doses de cada banco")
+    parser.add_argument("--pasta", default="data/benchmark", help="onde guardar os bancos gerados")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--caso", help="roda só os casos cujo nome contém este texto")
+    parser.add_argument("--com-cache", action="store_true",
+                        help="mantém o cache de consultas ligado (mede as repetições em cache)")
+    parser.add_argument("--escritores", type=int, nargs="*", default=[1, 10, 50],
+                        help="quantidades de threads gravando ao mesmo tempo")
+    parser.add_argument("--saida", default="benchmark_resultados.json")
+    args = parser.parse_args()
+
+    resultados = executar(args.tamanhos, args.pasta, args.repeticoes, args.caso, args.com_cache)
+    escritas = []
+    if args.escritores:
+        escritas = executar_escritas(preparar_banco(args.pasta, min(args.tamanhos)), args.escritores)
+    relatorio = {
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "versao": _versao_codigo(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "com_cache": args.com_cache,
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+        "escritas": escritas,
+    }
+    Path(args.saida).write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultados gravados em {args.saida}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
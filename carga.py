@@ -0,0 +1,285 @@
+"""Teste de carga: sessões simultâneas do teste.py pela API de testes do Streamlit.
+
+Uso:
+    python carga.py --sessoes 1 5 10 --acoes 20
+    python carga.py --sessoes 20 --residentes 150 --pausa-ms 500 --saida carga.json
+
+Cada sessão é um AppTest que executa o script inteiro (CSS, conexão, abas)
+em uma thread própria do mesmo processo, como o servidor do Streamlit faz
+com os navegadores conectados. As sessões repetem ações sorteadas (marcar
+doses na aba Hoje, abrir o calendário e os relatórios, cadastrar
+pacientes) e cada execução do script é cronometrada. O relatório traz
+p50/p95/p99 por ação e a espera pela escrita: tempo das alterações na fila
+do Escritor e tempo esperando a trava do arquivo SQLite.
+
+O banco é gerado com gerar_dados.py em --pasta/data/pacientes.db (o
+caminho que o teste.py usa, relativo à pasta de trabalho) e refeito quando
+não tem doses de hoje para marcar. Só são usados bancos criados pelo
+próprio carga.py (com a tabela carga_gerado); nenhum outro é alterado ou
+apagado.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+import banco
+import escritor
+from gerar_dados import gerar_banco
+
+SCRIPT = Path(__file__).resolve().parent / "teste.py"
+TEMPO_LIMITE_S = 120  # por execução do script
+RESIDENTES = 150
+DIAS_HISTORICO = 90
+MARCA_CARGA = "carga_gerado"  # tabela que identifica os bancos criados aqui
+
+# Abas do teste.py (valores da chave "aba_atual")
+ABAS = {
+    "hoje": "💊 Hoje",
+    "calendario": "📅 Calendário",
+    "pacientes": "👴 Pacientes",
+    "relatorios": "📊 Relatórios",
+}
+
+# --- AÇÕES ---
+# Uma ação prepara um clique na aba já aberta e devolve o AppTest pronto
+# para executar, ou None se não houver o que clicar.
+
+def _marcar_dose(at, aleatorio):
+    botoes = [b for b in at.button if b.key and b.key.startswith(("tomou_", "nao_tomou_"))]
+    if not botoes:
+        return None
+    return aleatorio.choice(botoes).click()
+
+def _cadastrar_paciente(at, aleatorio):
+    campos = [campo for campo in at.text_input if campo.label == "Nome completo*"]
+    salvar = [botao for botao in at.button if "Salvar Paciente" in botao.label]
+    if not campos or not salvar:
+        return None
+    campos[0].input(f"Residente Carga {aleatorio.randrange(10**6)}")
+    at.number_input[0].set_value(aleatorio.randint(65, 100))
+    return salvar[0].click()
+
+# (nome, aba, ação dentro da aba ou None para só abri-la, peso no sorteio)
+ACOES = [
+    ("marcar_dose", "hoje", _marcar_dose, 50),
+    ("abrir_hoje", "hoje", None, 15),
+    ("abrir_calendario", "calendario", None, 15),
+    ("abrir_relatorios", "relatorios", None, 10),
+    ("cadastrar_paciente", "pacientes", _cadastrar_paciente, 10),
+]
+
+# --- SESSÕES ---
+class Medicoes:
+    """Tempos e erros das execuções de todas as sessões"""
+
+    def __init__(self):
+        self.tempos = {}  # ação -> [ms]
+        self.erros = []   # (ação, mensagem)
+        self._trava = threading.Lock()
+
+    def registrar(self, acao, ms, erros):
+        with self._trava:
+            self.tempos.setdefault(acao, []).append(ms)
+            self.erros.extend((acao, erro) for erro in erros)
+
+def _erros_da_execucao(at):
+    erros = [str(excecao.value) for excecao in at.exception]
+    # st.error também mostra as doses atrasadas (⏰), que não são falhas
+    erros += [erro.value for erro in at.error if erro.icon != "⏰"]
+    return erros
+
+def _executar(at, acao, medicoes):
+    inicio = time.perf_counter()
+    at.run(timeout=TEMPO_LIMITE_S)
+    medicoes.registrar(acao, (time.perf_counter() - inicio) * 1000, _erros_da_execucao(at))
+
+def sessao(numero, acoes, pausa_ms, semente, barreira, medicoes):
+    """Uma sessão: abre o app na aba Hoje e executa `acoes` ações sorteadas"""
+    aleatorio = random.Random(semente + numero)
+    at = AppTest.from_file(str(SCRIPT), default_timeout=TEMPO_LIMITE_S)
+    at.session_state["aba_atual"] = ABAS["hoje"]
+    barreira.wait()
+    _executar(at, "primeira_execucao", medicoes)
+
+    for _ in range(acoes):
+        nome, aba, preparar, _ = aleatorio.choices(ACOES, [acao[3] for acao in ACOES])[0]
+        if preparar is None or at.session_state["aba_atual"] != ABAS[aba]:
+            at.session_state["aba_atual"] = ABAS[aba]
+            _executar(at, f"abrir_{aba}", medicoes)
+        if preparar is not None and preparar(at, aleatorio) is not None:
+            _executar(at, nome, medicoes)
+        if pausa_ms:
+            time.sleep(aleatorio.uniform(0.5, 1.5) * pausa_ms / 1000)
+
+def _esperas_de_escrita():
+    """Soma dos contadores dos Escritores abertos pelo app neste processo"""
+    escritores = list(escritor.Escritor.abertos)
+    return {
+        "alteracoes": sum(e.alteracoes for e in escritores),
+        "transacoes": sum(e.grupos for e in escritores),
+        "espera_fila_ms": sum(e.espera_fila_ms for e in escritores),
+        "espera_trava_ms": sum(e.espera_trava_ms for e in escritores),
+        "maior_espera_trava_ms": max((e.maior_espera_trava_ms for e in escritores), default=0.0),
+    }
+
+def _percentis(tempos):
+    if len(tempos) == 1:
+        return tempos * 3
+    cortes = statistics.quantiles(tempos, n=100, method="inclusive")
+    return cortes[49], cortes[94], cortes[98]
+
+def executar_carga(sessoes, acoes, pausa_ms=0, semente=42):
+    """Roda `sessoes` sessões simultâneas e retorna o resultado agregado"""
+    medicoes = Medicoes()
+    barreira = threading.Barrier(sessoes + 1)
+    threads = [threading.Thread(target=sessao, name=f"sessao-{numero}",
+                                args=(numero, acoes, pausa_ms, semente, barreira, medicoes))
+               for numero in range(sessoes)]
+    antes = _esperas_de_escrita()
+    for thread in threads:
+        thread.start()
+    barreira.wait()
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    segundos = time.perf_counter() - inicio
+    depois = _esperas_de_escrita()
+
+    por_acao = {}
+    todos = []
+    for acao, tempos in sorted(medicoes.tempos.items()):
+        todos += tempos
+        p50, p95, p99 = _percentis(tempos)
+        por_acao[acao] = {"execucoes": len(tempos), "p50_ms": round(p50, 1),
+                          "p95_ms": round(p95, 1), "p99_ms": round(p99, 1),
+                          "max_ms": round(max(tempos), 1)}
+    p50, p95, p99 = _percentis(todos)
+    escrita = {chave: depois[chave] - antes[chave] for chave in depois
+               if chave != "maior_espera_trava_ms"}
+    alteracoes = escrita["alteracoes"] or 1
+    return {
+        "sessoes": sessoes,
+        "acoes_por_sessao": acoes,
+        "execucoes": len(todos),
+        "segundos": round(segundos, 2),
+        "execucoes_por_s": round(len(todos) / segundos, 2),
+        "p50_ms": round(p50, 1),
+        "p95_ms": round(p95, 1),
+        "p99_ms": round(p99, 1),
+        "por_acao": por_acao,
+        "erros": len(medicoes.erros),
+        "erros_trava": sum("locked" in erro for _, erro in medicoes.erros),
+        "exemplos_erros": medicoes.erros[:5],
+        "escrita": {
+            "alteracoes": escrita["alteracoes"],
+            "transacoes": escrita["transacoes"],
+            "espera_fila_media_ms": round(escrita["espera_fila_ms"] / alteracoes, 2),
+            "espera_trava_total_ms": round(escrita["espera_trava_ms"], 1),
+            "maior_espera_trava_ms": round(depois["maior_espera_trava_ms"], 1),
+        },
+    }
+
+# --- EXECUÇÃO ---
+def preparar_banco(pasta, residentes, dias):
+    """Gera pasta/data/pacientes.db se não existir ou não tiver doses de hoje.
+
+    Só usa (e apaga para refazer) bancos criados pelo carga.py; qualquer
+    outro, como o banco real com --pasta ., gera FileExistsError.
+    """
+    caminho = Path(pasta) / banco.CAMINHO_BANCO
+    if caminho.exists():
+        conn = sqlite3.connect(caminho)
+        try:
+            gerado = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                  (MARCA_CARGA,)).fetchone()
+            if not gerado:
+                raise FileExistsError(f"{caminho} não foi criado pelo carga.py; "
+                                      f"escolha outra --pasta")
+            ultimo = conn.execute("SELECT MAX(dia) FROM doses").fetchone()[0]
+        finally:
+            conn.close()
+        if ultimo == banco.dia_da_data(date.today().isoformat()):
+            return caminho
+        print(f"{caminho} não tem doses de hoje; gerando de novo...", file=sys.stderr)
+        # O banco, seu WAL e as cópias dos relatórios
+        for sufixo in ("", "-wal", "-shm"):
+            Path(f"{caminho}{sufixo}").unlink(missing_ok=True)
+        for padrao in ("_relatorios*.db", "_relatorios*.tmp"):
+            for arquivo in caminho.parent.glob(caminho.stem + padrao):
+                arquivo.unlink()
+    else:
+        print(f"Gerando {caminho}...", file=sys.stderr)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    gerar_banco(caminho, residentes=residentes, dias=dias)
+    conn = sqlite3.connect(caminho)
+    try:
+        conn.execute(f"CREATE TABLE {MARCA_CARGA} (criado_em TEXT)")
+        conn.execute(f"INSERT INTO {MARCA_CARGA} VALUES (datetime('now', 'localtime'))")
+        conn.commit()
+    finally:
+        conn.close()
+    return caminho
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessoes", type=int, nargs="+", default=[1, 5, 10],
+                        help="quantidades de sessões simultâneas a medir")
+    parser.add_argument("--acoes", type=int, default=20, help="ações por sessão")
+    parser.add_argument("--pausa-ms", type=int, default=0,
+                        help="pausa média entre as ações de uma sessão")
+    parser.add_argument("--residentes", type=int, default=RESIDENTES)
+    parser.add_argument("--dias", type=int, default=DIAS_HISTORICO, help="dias de histórico")
+    parser.add_argument("--pasta", default="data/carga", help="pasta de trabalho do app")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default="carga_resultados.json")
+    args = parser.parse_args()
+
+    saida = Path(args.saida).resolve()
+    try:
+        preparar_banco(args.pasta, args.residentes, args.dias)
+    except FileExistsError as e:
+        parser.exit(1, f"{e}\n")
+    # O teste.py abre data/pacientes.db relativo à pasta de trabalho
+    os.chdir(args.pasta)
+
+    resultados = []
+    for sessoes in args.sessoes:
+        resultado = executar_carga(sessoes, args.acoes, args.pausa_ms, args.semente)
+        resultados.append(resultado)
+        escrita = resultado["escrita"]
+        print(f"{sessoes:>3} sessões  p50 {resultado['p50_ms']:>8.1f} ms  "
+              f"p95 {resultado['p95_ms']:>8.1f} ms  p99 {resultado['p99_ms']:>8.1f} ms  "
+              f"{resultado['execucoes_por_s']:>6.2f} exec/s  {resultado['erros']} erros  "
+              f"fila {escrita['espera_fila_media_ms']:.1f} ms/alteração  "
+              f"trava {escrita['espera_trava_total_ms']:.1f} ms", file=sys.stderr)
+        for acao, medidas in resultado["por_acao"].items():
+            print(f"      {acao:<20} {medidas['execucoes']:>5}x  p50 {medidas['p50_ms']:>8.1f}  "
+                  f"p95 {medidas['p95_ms']:>8.1f}  p99 {medidas['p99_ms']:>8.1f} ms",
+                  file=sys.stderr)
+
+    relatorio = {
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "residentes": args.residentes,
+        "pausa_ms": args.pausa_ms,
+        "resultados": resultados,
+    }
+    saida.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultados gravados em {saida}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
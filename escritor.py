@@ -0,0 +1,150 @@
+"""Escritor único do banco.
+
+Com várias sessões gravando ao mesmo tempo (troca de plantão), cada clique
+abria sua própria transação e disputava a trava de escrita do arquivo. O
+Escritor recebe as alterações de todas as sessões em uma fila e as aplica
+em uma única thread, juntando em uma só transação (um commit para o grupo)
+as que chegaram enquanto o grupo anterior era gravado e as que chegarem
+dentro de uma janela opcional. Cada chamada recebe seu resultado, ou sua
+exceção, por um Future.
+"""
+import contextvars
+import queue
+import sqlite3
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+import banco
+from instrumentacao import ConexaoInstrumentada
+
+JANELA_AGRUPAMENTO_MS = 0  # espera extra por mais alterações antes de gravar o grupo
+MAXIMO_POR_GRUPO = 200     # alterações por transação
+
+class ConexaoEscritor(ConexaoInstrumentada):
+    """Conexão do Escritor: dentro de um grupo, commit e rollback são locais.
+
+    As funções de alteração chamam conn.commit() e conn.rollback() ao
+    terminar; durante um grupo o commit fica para o fim e o rollback desfaz
+    só a alteração atual (até o SAVEPOINT aberto para ela).
+    """
+    em_grupo = False
+
+    def commit(self):
+        if not self.em_grupo:
+            super().commit()
+
+    def rollback(self):
+        if self.em_grupo:
+            self.execute("ROLLBACK TO alteracao")
+        else:
+            super().rollback()
+
+class Escritor:
+    """Thread única que aplica as alterações no banco, em grupos por transação"""
+    abertos = weakref.WeakSet()  # escritores do processo, lidos pelo teste de carga
+
+    def __init__(self, caminho=banco.CAMINHO_BANCO, janela_ms=JANELA_AGRUPAMENTO_MS,
+                 maximo_por_grupo=MAXIMO_POR_GRUPO):
+        self.conn = banco.abrir_conexao(caminho, factory=ConexaoEscritor)
+        self.janela_ms = janela_ms
+        self.maximo_por_grupo = maximo_por_grupo
+        self.grupos = 0       # transações gravadas
+        self.alteracoes = 0   # alterações aplicadas (com ou sem erro)
+        self.espera_fila_ms = 0.0   # soma do tempo das alterações na fila
+        self.espera_trava_ms = 0.0  # soma do tempo esperando a trava de escrita do arquivo
+        self.maior_espera_trava_ms = 0.0
+        self._fila = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._executar, name="escritor-banco", daemon=True)
+        self._thread.start()
+        Escritor.abertos.add(self)
+
+    def enviar(self, funcao, *args, **kwargs):
+        """Põe funcao(conn, *args, **kwargs) na fila e retorna o Future do resultado"""
+        futuro = Future()
+        # O contexto vai junto para a medição SQL da sessão (instrumentacao.py)
+        # registrar também as instruções executadas pelo Escritor
+        self._fila.put((futuro, contextvars.copy_context(), funcao, args, kwargs,
+                        time.perf_counter()))
+        return futuro
+
+    def executar(self, funcao, *args, **kwargs):
+        """Envia a alteração e espera o resultado (ou a exceção) dela"""
+        return self.enviar(funcao, *args, **kwargs).result()
+
+    def fechar(self):
+        """Grava o que já está na fila, encerra a thread e fecha a conexão"""
+        self._fila.put(None)
+        self._thread.join()
+        self.conn.close()
+
+    def _executar(self):
+        while True:
+            grupo, encerrar = self._proximo_grupo()
+            if grupo:
+                self._gravar(grupo)
+            if encerrar:
+                return
+
+    def _proximo_grupo(self):
+        """Espera a primeira alteração e junta as que chegarem dentro da janela"""
+        item = self._fila.get()
+        if item is None:
+            return [], True
+        grupo = [item]
+        limite = time.monotonic() + self.janela_ms / 1000
+        while len(grupo) < self.maximo_por_grupo:
+            try:
+                item = self._fila.get(timeout=max(limite - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                return grupo, True
+            grupo.append(item)
+        return grupo, False
+
+    def _gravar(self, grupo):
+        conn = self.conn
+        pendentes = [item for item in grupo if item[0].set_running_or_notify_cancel()]
+        if not pendentes:
+            return
+        resultados = []  # (futuro, resultado, exceção)
+        inicio = time.perf_counter()
+        self.espera_fila_ms += sum(inicio - item[-1] for item in pendentes) * 1000
+        try:
+            # Outro processo ou conexão gravando faz o BEGIN esperar (busy_timeout)
+            conn.execute("BEGIN IMMEDIATE")
+            espera = (time.perf_counter() - inicio) * 1000
+            self.espera_trava_ms += espera
+            self.maior_espera_trava_ms = max(self.maior_espera_trava_ms, espera)
+            conn.em_grupo = True
+            for futuro, contexto, funcao, args, kwargs, _ in pendentes:
+                conn.execute("SAVEPOINT alteracao")
+                try:
+                    resultados.append((futuro, contexto.run(funcao, conn, *args, **kwargs), None))
+                except Exception as e:
+                    # Desfaz só esta alteração; as demais do grupo seguem
+                    conn.execute("ROLLBACK TO alteracao")
+                    resultados.append((futuro, None, e))
+                conn.execute("RELEASE alteracao")
+            conn.em_grupo = False
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.em_grupo = False
+            if conn.in_transaction:
+                conn.rollback()
+            # Nada do grupo foi gravado; quem já tinha falhado mantém o próprio erro
+            erro = banco.ErroBanco(f"Erro ao gravar alterações: {e}")
+            proprios = {futuro: excecao for futuro, _, excecao in resultados if excecao}
+            resultados = [(futuro, None, proprios.get(futuro, erro)) for futuro, *_ in pendentes]
+        finally:
+            conn.cache_consultas.limpar()
+
+        self.grupos += 1
+        self.alteracoes += len(resultados)
+        for futuro, resultado, excecao in resultados:
+            if excecao is None:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(excecao)
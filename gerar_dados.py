@@ -0,0 +1,180 @@
+"""Gera um banco de dados sintético com residentes e histórico de doses.
+
+Uso:
+    python gerar_dados.py data/sintetico.db --residentes 150 --anos 2
+
+Cada residente recebe de 3 a 5 tratamentos com horários fixos (em média
+6 a 8 doses por dia). Cerca de três quartos deles são prescrições
+recorrentes (a maioria diárias, algumas a cada 2 dias ou só em certos
+dias da semana, parte já encerrada), cujas doses só viram linha quando o
+status é registrado, como no app; o restante é gravado como doses
+avulsas, dia a dia. A adesão fica em torno de 92%.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import banco
+
+NOMES = ["Maria", "José", "Ana", "João", "Antônia", "Francisco", "Francisca", "Antônio",
+         "Adriana", "Carlos", "Juliana", "Paulo", "Márcia", "Pedro", "Aparecida", "Lucas",
+         "Sandra", "Luiz", "Helena", "Sebastião", "Terezinha", "Benedito", "Cecília", "Raimundo"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves",
+              "Pereira", "Lima", "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida"]
+CONDICOES = ["Hipertensão", "Diabetes tipo 2", "Demência moderada", "Doença de Parkinson",
+             "Insuficiência cardíaca", "Hipotireoidismo", "Osteoporose", "Depressão",
+             "Artrose", "DPOC", ""]
+
+# (medicamento, horários do dia, observação)
+TRATAMENTOS = [
+    ("Losartana 50mg", ["08:00", "20:00"], ""),
+    ("Metformina 850mg", ["08:00", "12:00", "20:00"], "Tomar após as refeições"),
+    ("Sinvastatina 20mg", ["22:00"], ""),
+    ("Omeprazol 20mg", ["06:00"], "Em jejum"),
+    ("AAS 100mg", ["12:00"], "Após o almoço"),
+    ("Levotiroxina 50mcg", ["06:00"], "Em jejum, 30 min antes do café"),
+    ("Donepezila 10mg", ["20:00"], ""),
+    ("Captopril 25mg", ["08:00", "14:00", "20:00"], "Tomar antes do café"),
+    ("Furosemida 40mg", ["08:00"], ""),
+    ("Anlodipino 5mg", ["08:00"], ""),
+    ("Quetiapina 25mg", ["22:00"], "Observar sonolência"),
+    ("Sertralina 50mg", ["08:00"], ""),
+    ("Paracetamol 750mg", ["08:00", "14:00", "20:00"], "Se dor"),
+    ("Vitamina D 1000UI", ["12:00"], "Com leite"),
+]
+
+TAXA_ADESAO = 0.92
+FRACAO_PRESCRICOES = 0.75  # tratamentos cadastrados como prescrição recorrente
+TAXA_REGISTRO = 0.85       # doses de prescrição do passado com status registrado
+# (intervalo_dias, dias_semana, peso no sorteio)
+REGRAS = [(1, None, 80), (2, None, 10), (1, (0, 2, 4), 10)]
+TAMANHO_LOTE = 20000  # linhas por transação
+
+def gerar_banco(caminho, residentes=150, dias=365, doses=None, fim=None, semente=42, progresso=None):
+    """Cria um banco novo em `caminho` e retorna o número de doses gravadas.
+
+    O histórico vai de `fim - dias + 1` até `fim` (hoje, por padrão). Doses
+    de dias passados recebem status; as do último dia ficam pendentes. Se
+    `doses` for informado, o número de dias é escolhido para chegar o mais
+    perto possível dessa quantidade de linhas gravadas. `progresso`, se
+    informado, recebe (doses gravadas, dias gerados, total de dias).
+    """
+    caminho = Path(caminho)
+    if caminho.exists():
+        raise FileExistsError(f"{caminho} já existe")
+
+    aleatorio = random.Random(semente)
+    fim = fim or date.today()
+
+    conn = banco.conectar(caminho)
+    try:
+        # Remove os dados de exemplo criados pela primeira migração
+        conn.execute("DELETE FROM pacientes")
+        conn.commit()
+
+        c = conn.cursor()
+        regimes = []     # doses avulsas: (paciente_id, medicamento, minuto, observacao)
+        recorrentes = []  # tratamentos que viram prescrição: (paciente_id, tratamento)
+        for _ in range(residentes):
+            nome = f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}"
+            condicao = ", ".join(sorted(set(aleatorio.sample(CONDICOES, 2)) - {""}))
+            c.execute("INSERT INTO pacientes (nome, idade, condicao) VALUES (?, ?, ?)",
+                      (nome, aleatorio.randint(65, 98), condicao))
+            paciente_id = c.lastrowid
+            for tratamento in aleatorio.sample(TRATAMENTOS, aleatorio.randint(3, 5)):
+                if aleatorio.random() < FRACAO_PRESCRICOES:
+                    recorrentes.append((paciente_id, tratamento))
+                    continue
+                medicamento, horarios, observacao = tratamento
+                for horario in horarios:
+                    regimes.append((paciente_id, medicamento, banco.minuto_do_horario(horario),
+                                    observacao))
+
+        if doses is not None:
+            por_dia = len(regimes) + TAXA_REGISTRO * sum(len(t[1]) for _, t in recorrentes)
+            dias = max(1, round(doses / max(por_dia, 1)))
+        inicio = fim - timedelta(days=dias - 1)
+
+        # (id, paciente_id, medicamento, minutos, primeiro e último ordinal,
+        #  intervalo, dias da semana, observação)
+        prescricoes = []
+        for paciente_id, (medicamento, horarios, observacao) in recorrentes:
+            intervalo, semana, _ = aleatorio.choices(REGRAS, [regra[2] for regra in REGRAS])[0]
+            # Começa antes do histórico ou na primeira metade dele; uma em dez já terminou
+            inicio_regra = inicio + timedelta(days=aleatorio.randint(-180, dias // 2))
+            fim_regra = None
+            if aleatorio.random() < 0.1:
+                fim_regra = min(fim, inicio_regra + timedelta(days=aleatorio.randint(7, 120)))
+            c.execute("""INSERT INTO prescricoes
+                             (paciente_id, medicamento, horarios, data_inicio, data_fim,
+                              intervalo_dias, dias_semana, observacoes)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                      (paciente_id, medicamento, ",".join(horarios), inicio_regra.isoformat(),
+                       fim_regra.isoformat() if fim_regra else None, intervalo,
+                       ",".join(map(str, semana)) if semana else None, observacao))
+            prescricoes.append((c.lastrowid, paciente_id, medicamento,
+                                [banco.minuto_do_horario(h) for h in horarios],
+                                inicio_regra.toordinal(), (fim_regra or date.max).toordinal(),
+                                intervalo, semana, observacao))
+        conn.commit()
+
+        gravadas = 0
+        lote = []
+        for deslocamento in range(dias):
+            data = inicio + timedelta(days=deslocamento)
+            dia = banco.dia_da_data(data.isoformat())
+            ordinal = data.toordinal()
+            passado = data < fim
+            for paciente_id, medicamento, minuto, observacao in regimes:
+                tomou = 1 if passado and aleatorio.random() < TAXA_ADESAO else 0
+                lote.append((paciente_id, medicamento, minuto, dia, tomou, observacao, None))
+            # Doses de prescrição só são gravadas com status registrado (no passado)
+            for (prescricao_id, paciente_id, medicamento, minutos, origem, ultimo, intervalo,
+                 semana, observacao) in prescricoes if passado else ():
+                if (not origem <= ordinal <= ultimo or (ordinal - origem) % intervalo
+                        or (semana and (ordinal - 1) % 7 not in semana)):
+                    continue
+                for minuto in minutos:
+                    if aleatorio.random() < TAXA_REGISTRO:
+                        tomou = 1 if aleatorio.random() < TAXA_ADESAO else 0
+                        lote.append((paciente_id, medicamento, minuto, dia, tomou, observacao,
+                                     prescricao_id))
+
+            if len(lote) >= TAMANHO_LOTE or deslocamento == dias - 1:
+                c.executemany("""INSERT INTO doses
+                                 (paciente_id, medicamento, minuto, dia, tomou, observacoes,
+                                  prescricao_id)
+                                 VALUES (?, ?, ?, ?, ?, ?, ?)""", lote)
+                conn.commit()
+                gravadas += len(lote)
+                lote = []
+                if progresso:
+                    progresso(gravadas, deslocamento + 1, dias)
+
+        # Atualiza as estatísticas usadas pelo planejador de consultas
+        conn.execute("ANALYZE")
+        return gravadas
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("caminho", help="arquivo do banco a ser criado")
+    parser.add_argument("--residentes", type=int, default=150)
+    parser.add_argument("--anos", type=float, default=1.0, help="anos de histórico")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    def progresso(gravadas, dia, dias):
+        print(f"\r{gravadas} doses, dia {dia}/{dias}", end="", file=sys.stderr, flush=True)
+
+    inicio = time.perf_counter()
+    gravadas = gerar_banco(args.caminho, args.residentes, max(1, round(args.anos * 365)),
+                           semente=args.semente, progresso=progresso)
+    print(f"\n{gravadas} doses gravadas em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Cópia do banco para os relatórios.
+
+Os relatórios leem de uma cópia do banco feita com a API de backup do
+SQLite e refeita quando fica mais velha que o intervalo pedido. Consultas
+longas de análise não seguram então leituras no banco principal, e a
+equipe registrando doses não disputa o arquivo com elas.
+
+A cópia fica na mesma pasta do banco, para que os arquivos anuais de doses
+(caminhos relativos a ela) continuem sendo encontrados. Cada cópia é um
+arquivo novo (<banco>_relatorios_<geração>.db): a anterior continua aberta
+por quem ainda a lê e é apagada quando sua última conexão fecha, sem
+substituir um arquivo aberto (o que falha no Windows).
+"""
+import contextlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import banco
+from instrumentacao import ConexaoInstrumentada
+
+INTERVALO_INSTANTANEO_S = 300  # idade máxima padrão da cópia dos relatórios
+IDADE_COPIA_ABANDONADA_S = 24 * 3600  # cópias mais velhas, de outros processos, são apagadas
+
+class InstantaneoRelatorios:
+    """Cópia somente leitura do banco, refeita periodicamente.
+
+    Cada cópia tem seu GerenciadorConexoes: uma conexão por thread, e a de
+    uma thread que terminou é entregue à próxima (com seu cache de
+    consultas). Quando a cópia é refeita, a conexão de cada thread com a
+    anterior é fechada na próxima vez que ela pedir uma conexão, ou quando
+    a thread terminar, e o arquivo é apagado quando a última fecha. Só uma
+    thread refaz a cópia por vez; as demais continuam lendo a anterior.
+    """
+
+    def __init__(self, caminho=banco.CAMINHO_BANCO, intervalo_s=INTERVALO_INSTANTANEO_S):
+        self.origem = Path(caminho)
+        self.intervalo_s = intervalo_s  # padrão quando quem lê não informa o seu
+        self.criado_em = None  # datetime da última cópia
+        self._atual = None       # GerenciadorConexoes da cópia atual
+        self._anteriores = []    # os das cópias antigas que ainda têm conexões
+        self._trava = threading.Lock()     # uma cópia por vez
+        self._trava_conexoes = threading.Lock()
+        self._apagar_abandonadas()
+
+    def _arquivo(self, geracao):
+        return self.origem.with_name(f"{self.origem.stem}_relatorios_{geracao}.db")
+
+    def _apagar_abandonadas(self):
+        """Apaga cópias antigas deixadas por processos que já terminaram"""
+        limite = time.time() - IDADE_COPIA_ABANDONADA_S
+        nome = re.compile(re.escape(self.origem.stem) + r"_relatorios(_\d+)?\.(db|tmp)")
+        for caminho in self.origem.parent.glob(f"{self.origem.stem}_relatorios*"):
+            with contextlib.suppress(OSError):
+                if nome.fullmatch(caminho.name) and caminho.stat().st_mtime < limite:
+                    caminho.unlink()
+
+    def idade_s(self):
+        """Segundos desde a última cópia (None se ainda não houve cópia)"""
+        if self.criado_em is None:
+            return None
+        return (datetime.now() - self.criado_em).total_seconds()
+
+    def vencido(self, intervalo_s=None):
+        idade = self.idade_s()
+        return idade is None or idade >= (intervalo_s or self.intervalo_s)
+
+    def atualizar(self, forcar=False, intervalo_s=None):
+        """Refaz a cópia se for mais velha que `intervalo_s` (ou sempre, com forcar=True)"""
+        if not (forcar or self.vencido(intervalo_s)):
+            return
+        # Sem cópia ainda, espera quem estiver copiando; com cópia, segue com ela
+        if not self._trava.acquire(blocking=self.criado_em is None or forcar):
+            return
+        try:
+            if not forcar and not self.vencido(intervalo_s):
+                return  # outra thread acabou de copiar
+            self._copiar()
+        finally:
+            self._trava.release()
+
+    def _copiar(self):
+        # Milissegundos: nomes únicos também entre processos com o mesmo banco
+        geracao = time.time_ns() // 1_000_000
+        destino = self._arquivo(geracao)
+        temporario = destino.with_suffix(".tmp")
+        try:
+            origem = banco.abrir_conexao(self.origem)
+            try:
+                copia = sqlite3.connect(str(temporario))
+                try:
+                    # Em uma única etapa: a cópia é um retrato consistente e,
+                    # com WAL, a leitura não bloqueia quem está gravando
+                    origem.backup(copia)
+                    # A cópia é aberta só para leitura; sem WAL ela não precisa
+                    # criar os arquivos -wal e -shm
+                    copia.execute("PRAGMA journal_mode = DELETE")
+                finally:
+                    copia.close()
+            finally:
+                origem.close()
+            # O destino é novo: nenhuma conexão o tem aberto
+            os.replace(temporario, destino)
+        except (sqlite3.Error, OSError) as e:
+            raise banco.ErroConexao(f"Erro ao copiar o banco para os relatórios: {e}") from e
+        with self._trava_conexoes:
+            if self._atual is not None:
+                self._anteriores.append(self._atual)
+            self._atual = banco.GerenciadorConexoes(destino, abrir=self._abrir)
+            self.criado_em = datetime.now()
+
+    @staticmethod
+    def _abrir(caminho):
+        try:
+            conn = sqlite3.connect(
+                f"{caminho.resolve().as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                cached_statements=banco.TAMANHO_CACHE_INSTRUCOES,
+                factory=ConexaoInstrumentada,
+            )
+        except sqlite3.Error as e:
+            raise banco.ErroConexao(f"Erro ao abrir a cópia dos relatórios: {e}") from e
+        # A cópia não muda: o cache só é descartado junto com a conexão
+        conn.cache_consultas = banco.CacheConsultas()
+        return conn
+
+    def _liberar_anteriores(self):
+        """Fecha as conexões da thread atual e das que terminaram com as cópias
+        antigas e apaga as que ficaram sem conexões"""
+        restantes = []
+        for gerenciador in self._anteriores:
+            if gerenciador.liberar():
+                restantes.append(gerenciador)
+            else:
+                with contextlib.suppress(OSError):
+                    gerenciador.caminho.unlink(missing_ok=True)
+        self._anteriores = restantes
+
+    def conexao(self, intervalo_s=None):
+        """Retorna a conexão da thread atual com a cópia, refazendo-a se for
+        mais velha que `intervalo_s` (padrão: self.intervalo_s)"""
+        self.atualizar(intervalo_s=intervalo_s)
+        with self._trava_conexoes:
+            self._liberar_anteriores()
+            return self._atual.conexao()
+
+    def fechar_todas(self):
+        """Fecha as conexões e apaga as cópias deste instantâneo"""
+        with self._trava_conexoes:
+            gerenciadores = self._anteriores + ([self._atual] if self._atual else [])
+            self._atual, self._anteriores = None, []
+            self.criado_em = None
+            for gerenciador in gerenciadores:
+                gerenciador.fechar_todas()
+                with contextlib.suppress(OSError):
+                    gerenciador.caminho.unlink(missing_ok=True)
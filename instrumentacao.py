@@ -0,0 +1,226 @@
+"""Medição das instruções SQL executadas pela aplicação.
+
+As conexões abertas por banco.py usam ConexaoInstrumentada. Enquanto não
+houver uma medição ativa na thread, os cursores se comportam como os do
+sqlite3 (o custo é uma verificação por execute). Dentro de
+`PerfilConsultas.medir(...)` cada instrução é registrada com parâmetros,
+linhas lidas ou alteradas e tempo gasto, incluindo o tempo de leitura das
+linhas. Instruções lentas têm o plano (EXPLAIN QUERY PLAN) guardado.
+"""
+import sqlite3
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+LIMITE_CONSULTA_LENTA_MS = 50  # acima disso a consulta entra no registro de lentas
+EXECUCOES_GUARDADAS = 30        # execuções do script mantidas no histórico
+CONSULTAS_LENTAS_GUARDADAS = 50
+
+# Medição ativa na thread (ou contexto) atual
+_execucao_atual = ContextVar("execucao_sql", default=None)
+
+# --- REGISTROS ---
+class ConsultaRegistrada:
+    """Uma instrução executada: SQL, parâmetros, linhas e tempo acumulado"""
+    __slots__ = ("sql", "parametros", "linhas", "duracao_ms", "plano")
+
+    def __init__(self, sql, parametros):
+        self.sql = " ".join(sql.split())
+        self.parametros = parametros
+        self.linhas = 0
+        self.duracao_ms = 0.0
+        self.plano = None
+
+class Execucao:
+    """Instruções executadas em um bloco medido (uma execução de uma aba)"""
+
+    def __init__(self, rotulo):
+        self.rotulo = rotulo
+        self.inicio = datetime.now()
+        self.consultas = []
+        self.duracao_ms = 0.0  # tempo total do bloco, dentro e fora do banco
+        self._conexoes = []    # conexão de cada consulta, para o EXPLAIN
+
+    def registrar(self, conexao, sql, parametros):
+        registro = ConsultaRegistrada(sql, parametros)
+        self.consultas.append(registro)
+        self._conexoes.append(conexao)
+        return registro
+
+    @property
+    def tempo_banco_ms(self):
+        return sum(consulta.duracao_ms for consulta in self.consultas)
+
+    def repeticoes(self):
+        """Retorna [(sql, vezes, tempo_ms)] das instruções mais executadas.
+
+        Uma mesma instrução repetida muitas vezes em uma execução costuma
+        indicar um laço com uma consulta por item (N+1).
+        """
+        contagem = {}
+        for consulta in self.consultas:
+            vezes, tempo = contagem.get(consulta.sql, (0, 0.0))
+            contagem[consulta.sql] = (vezes + 1, tempo + consulta.duracao_ms)
+        return sorted(((sql, vezes, tempo) for sql, (vezes, tempo) in contagem.items()),
+                      key=lambda item: (-item[1], -item[2]))
+
+# --- PERFIL ---
+class PerfilConsultas:
+    """Histórico das execuções medidas e registro das consultas lentas"""
+
+    def __init__(self, limite_lenta_ms=LIMITE_CONSULTA_LENTA_MS,
+                 execucoes=EXECUCOES_GUARDADAS, lentas=CONSULTAS_LENTAS_GUARDADAS):
+        self.limite_lenta_ms = limite_lenta_ms
+        self.execucoes = deque(maxlen=execucoes)
+        self.lentas = deque(maxlen=lentas)  # (rótulo, ConsultaRegistrada)
+
+    @contextmanager
+    def medir(self, rotulo):
+        """Registra as instruções executadas dentro do bloco.
+
+        Se já houver uma medição ativa (por exemplo, um fragmento desenhado
+        durante a execução completa da aba), as instruções vão para ela.
+        """
+        if _execucao_atual.get() is not None:
+            yield _execucao_atual.get()
+            return
+
+        execucao = Execucao(rotulo)
+        token = _execucao_atual.set(execucao)
+        inicio = time.perf_counter()
+        try:
+            yield execucao
+        finally:
+            execucao.duracao_ms = (time.perf_counter() - inicio) * 1000
+            _execucao_atual.reset(token)
+            self._guardar(execucao)
+
+    def _guardar(self, execucao):
+        for consulta, conexao in zip(execucao.consultas, execucao._conexoes):
+            if consulta.duracao_ms >= self.limite_lenta_ms:
+                consulta.plano = plano_da_consulta(conexao, consulta.sql, consulta.parametros)
+                self.lentas.append((execucao.rotulo, consulta))
+        execucao._conexoes = []
+        self.execucoes.append(execucao)
+
+    def resumo_por_rotulo(self):
+        """Retorna {rótulo: (execuções, consultas, tempo no banco em ms)}"""
+        resumo = {}
+        for execucao in self.execucoes:
+            execucoes, consultas, tempo = resumo.get(execucao.rotulo, (0, 0, 0.0))
+            resumo[execucao.rotulo] = (execucoes + 1, consultas + len(execucao.consultas),
+                                       tempo + execucao.tempo_banco_ms)
+        return resumo
+
+    def limpar(self):
+        self.execucoes.clear()
+        self.lentas.clear()
+
+def plano_da_consulta(conexao, sql, parametros):
+    """Retorna as linhas de EXPLAIN QUERY PLAN da instrução, ou o erro ao obtê-las"""
+    if sql.split(None, 1)[0].upper() not in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE"):
+        return []
+    try:
+        # Cursor comum, para o próprio EXPLAIN não ser registrado
+        c = sqlite3.Cursor(conexao)
+        c.execute(f"EXPLAIN QUERY PLAN {sql}", parametros or ())
+        return [detalhe for _, _, _, detalhe in c.fetchall()]
+    except sqlite3.Error as e:
+        return [f"(plano indisponível: {e})"]
+
+# --- CONEXÃO E CURSOR ---
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que registra execute/executemany na medição ativa"""
+    _registro = None
+
+    def execute(self, sql, parametros=()):
+        execucao = _execucao_atual.get()
+        if execucao is None:
+            self._registro = None
+            return super().execute(sql, parametros)
+
+        registro = execucao.registrar(self.connection, sql, parametros)
+        self._registro = registro
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            registro.duracao_ms += (time.perf_counter() - inicio) * 1000
+            if self.description is None:
+                registro.linhas = max(self.rowcount, 0)
+
+    def executemany(self, sql, sequencia):
+        execucao = _execucao_atual.get()
+        if execucao is None:
+            self._registro = None
+            return super().executemany(sql, sequencia)
+
+        sequencia = list(sequencia)
+        # Guarda só o primeiro conjunto de parâmetros (usado no EXPLAIN)
+        registro = execucao.registrar(self.connection, sql, sequencia[0] if sequencia else ())
+        self._registro = registro
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, sequencia)
+        finally:
+            registro.duracao_ms += (time.perf_counter() - inicio) * 1000
+            registro.linhas = max(self.rowcount, 0)
+
+    # A leitura das linhas também conta no tempo da consulta: o SQLite
+    # executa o plano aos poucos, à medida que as linhas são pedidas.
+    def _medir_leitura(self, leitura, *args):
+        registro = self._registro
+        if registro is None:
+            return leitura(*args)
+        inicio = time.perf_counter()
+        resultado = leitura(*args)
+        registro.duracao_ms += (time.perf_counter() - inicio) * 1000
+        if isinstance(resultado, list):
+            registro.linhas += len(resultado)
+        elif resultado is not None:
+            registro.linhas += 1
+        return resultado
+
+    def fetchone(self):
+        return self._medir_leitura(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._medir_leitura(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._medir_leitura(super().fetchall)
+
+    def __iter__(self):
+        # Sem medição ativa a iteração fica a cargo do próprio sqlite3
+        if self._registro is None:
+            return self
+        return self._iterar_medindo(self._registro)
+
+    def _iterar_medindo(self, registro):
+        proxima = super().__next__
+        while True:
+            inicio = time.perf_counter()
+            try:
+                linha = proxima()
+            except StopIteration:
+                registro.duracao_ms += (time.perf_counter() - inicio) * 1000
+                return
+            registro.duracao_ms += (time.perf_counter() - inicio) * 1000
+            registro.linhas += 1
+            yield linha
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """Conexão cujos cursores registram as instruções na medição ativa"""
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    # Connection.execute do sqlite3 chama o execute do cursor em C,
+    # sem passar pelo método sobrescrito; por isso é refeito aqui.
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
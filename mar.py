@@ -0,0 +1,183 @@
+"""Gera a folha mensal de administração de medicamentos (MAR) de cada residente.
+
+Uso:
+    python mar.py 2024 5                        # folhas de maio/2024 em folhas_mar/2024-05
+    python mar.py 2024 5 --pasta impressao --processos 4
+    python mar.py 2024 5 --paciente 12 --banco data/unidades/casa_sao_jose.db
+
+Cada folha é um HTML pronto para imprimir (ou salvar em PDF pelo
+navegador): uma linha por medicamento e horário, uma coluna por dia do
+mês. As folhas são geradas por um pool de processos; cada processo abre
+sua própria conexão, lê as doses do residente com uma consulta pelo
+índice (paciente_id, dia) e grava a folha linha a linha. O processo
+principal percorre os residentes sem carregá-los todos e mantém só
+algumas folhas em andamento por vez. Um index.html lista as folhas.
+"""
+import argparse
+import calendar
+import html
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+from pathlib import Path
+
+import banco
+
+MESES = ["janeiro", "fevereiro", "março", "abril", "maio", "junho", "julho",
+         "agosto", "setembro", "outubro", "novembro", "dezembro"]
+FOLHAS_POR_PROCESSO = 2  # folhas enviadas ao pool e ainda não concluídas, por processo
+
+ESTILO = """<style>
+@page { size: A4 landscape; margin: 10mm; }
+body { font-family: sans-serif; font-size: 10px; color: #222; }
+h1 { font-size: 16px; margin: 0 0 4px; color: #166088; }
+p { margin: 0 0 8px; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #999; padding: 2px; text-align: center; }
+td.med { text-align: left; white-space: nowrap; }
+.tomou { color: #2e7d32; font-weight: bold; }
+.nao { color: #c62828; font-weight: bold; }
+.fds { background: #f0f0f0; }
+</style>"""
+
+# --- FOLHA DE UM RESIDENTE (roda nos processos do pool) ---
+_conexao = None  # conexão do processo trabalhador
+
+def _iniciar_processo(caminho_banco):
+    global _conexao
+    _conexao = banco.abrir_conexao(caminho_banco)
+    # Cada folha lê um residente diferente: nada a reaproveitar no cache
+    _conexao.cache_consultas.tamanho = 0
+
+def _marca(dose, hoje):
+    if dose.tomou:
+        return '<span class="tomou">✔</span>'
+    if dose.data < hoje:
+        return '<span class="nao">✘</span>'
+    return ""
+
+def gerar_folha(paciente, ano, mes, pasta):
+    """Grava a folha do residente no mês e retorna (arquivo, doses)"""
+    inicio, fim = banco.intervalo_do_mes(ano, mes)
+    dias = calendar.monthrange(ano, mes)[1]
+    hoje = date.today().isoformat()
+
+    # Grade (horário, medicamento) -> marcas por dia; só o mês de um residente
+    grade = {}
+    observacoes = {}
+    doses = 0
+    for dose in banco.iterar_doses_por_periodo(_conexao, inicio, fim, paciente.id):
+        linha = grade.setdefault((dose.horario, dose.medicamento), [""] * dias)
+        linha[int(dose.data[8:]) - 1] += _marca(dose, hoje)
+        if dose.observacoes:
+            observacoes.setdefault((dose.horario, dose.medicamento), dose.observacoes)
+        doses += 1
+
+    arquivo = Path(pasta) / f"{paciente.id:05d}.html"
+    fim_de_semana = {dia for dia in range(1, dias + 1) if date(ano, mes, dia).weekday() >= 5}
+    with open(arquivo, "w", encoding="utf-8") as saida:
+        saida.write(f"<!DOCTYPE html><html lang='pt-BR'><head><meta charset='utf-8'>"
+                    f"<title>MAR {html.escape(paciente.nome)} {mes:02d}/{ano}</title>"
+                    f"{ESTILO}</head><body>\n")
+        saida.write(f"<h1>Registro de administração de medicamentos – "
+                    f"{MESES[mes - 1]} de {ano}</h1>\n")
+        saida.write(f"<p><strong>{html.escape(paciente.nome)}</strong>, {paciente.idade} anos"
+                    + (f" · {html.escape(paciente.condicao)}" if paciente.condicao else "")
+                    + "</p>\n")
+        if not grade:
+            saida.write("<p>Nenhuma dose no mês.</p>\n</body></html>\n")
+            return str(arquivo), 0
+
+        saida.write("<table><thead><tr><th>Horário</th><th>Medicamento</th>")
+        for dia in range(1, dias + 1):
+            classe = ' class="fds"' if dia in fim_de_semana else ""
+            saida.write(f"<th{classe}>{dia}</th>")
+        saida.write("</tr></thead><tbody>\n")
+        for chave in sorted(grade):
+            horario, medicamento = chave
+            nome = html.escape(medicamento)
+            if chave in observacoes:
+                nome += f"<br><small>{html.escape(observacoes[chave])}</small>"
+            saida.write(f"<tr><td>{horario}</td><td class='med'>{nome}</td>")
+            for dia, marca in enumerate(grade[chave], start=1):
+                classe = ' class="fds"' if dia in fim_de_semana else ""
+                saida.write(f"<td{classe}>{marca}</td>")
+            saida.write("</tr>\n")
+        saida.write("</tbody></table>\n"
+                    "<p><span class='tomou'>✔</span> tomada · <span class='nao'>✘</span> "
+                    "não tomada</p>\n</body></html>\n")
+    return str(arquivo), doses
+
+# --- LOTE ---
+def gerar_folhas(caminho_banco, ano, mes, pasta, processos=None, pacientes=None, progresso=None):
+    """Gera as folhas do mês em paralelo e retorna [(paciente, arquivo, doses)].
+
+    `pacientes` limita a geração a esses ids; `progresso`, se informado,
+    é chamado a cada folha concluída com (concluídas, paciente, arquivo).
+    """
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    processos = processos or os.cpu_count() or 1
+    limite = processos * FOLHAS_POR_PROCESSO
+
+    conn = banco.conectar(caminho_banco)
+    geradas = []
+    try:
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo,
+                                 initargs=(str(caminho_banco),)) as pool, \
+                open(pasta / "index.html", "w", encoding="utf-8") as indice:
+            indice.write(f"<!DOCTYPE html><html lang='pt-BR'><head><meta charset='utf-8'>"
+                         f"<title>MAR {mes:02d}/{ano}</title>{ESTILO}</head><body>\n"
+                         f"<h1>Folhas de {MESES[mes - 1]} de {ano}</h1><ul>\n")
+
+            def concluir(futuros):
+                for futuro in futuros:
+                    paciente = andamento.pop(futuro)
+                    arquivo, doses = futuro.result()
+                    geradas.append((paciente, arquivo, doses))
+                    indice.write(f"<li><a href='{Path(arquivo).name}'>"
+                                 f"{html.escape(paciente.nome)}</a> ({doses} doses)</li>\n")
+                    if progresso:
+                        progresso(len(geradas), paciente, arquivo)
+
+            # Os residentes vêm do cursor aos poucos; no máximo `limite`
+            # folhas ficam pendentes no pool ao mesmo tempo
+            andamento = {}
+            for paciente in banco.iterar_pacientes(conn):
+                if pacientes and paciente.id not in pacientes:
+                    continue
+                if len(andamento) >= limite:
+                    prontos, _ = wait(andamento, return_when=FIRST_COMPLETED)
+                    concluir(prontos)
+                andamento[pool.submit(gerar_folha, paciente, ano, mes, str(pasta))] = paciente
+            concluir(list(andamento))
+            indice.write("</ul></body></html>\n")
+    finally:
+        conn.close()
+    return geradas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("ano", type=int)
+    parser.add_argument("mes", type=int, choices=range(1, 13), metavar="mes")
+    parser.add_argument("--banco", default=str(banco.CAMINHO_BANCO))
+    parser.add_argument("--pasta", help="onde gravar as folhas (padrão: folhas_mar/AAAA-MM)")
+    parser.add_argument("--processos", type=int, help="processos do pool (padrão: um por CPU)")
+    parser.add_argument("--paciente", type=int, action="append",
+                        help="gera só a folha deste residente (pode repetir)")
+    args = parser.parse_args()
+    pasta = args.pasta or f"folhas_mar/{args.ano}-{args.mes:02d}"
+
+    def progresso(concluidas, paciente, arquivo):
+        print(f"\r{concluidas} folhas geradas", end="", file=sys.stderr, flush=True)
+
+    try:
+        geradas = gerar_folhas(args.banco, args.ano, args.mes, pasta, args.processos,
+                               set(args.paciente or ()), progresso)
+    except banco.ErroBanco as e:
+        parser.exit(1, f"\n{e}\n")
+    print(f"\r{len(geradas)} folhas gravadas em {pasta}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
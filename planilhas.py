@@ -0,0 +1,82 @@
+"""Importa e exporta pacientes, doses e prescrições em CSV ou JSON Lines.
+
+Uso:
+    python planilhas.py importar pacientes novos_residentes.csv
+    python planilhas.py importar prescricoes farmacia.jsonl --lote 5000
+    python planilhas.py importar medicamentos doses.csv --janela-conflito 120
+    python planilhas.py exportar pacientes pacientes.csv
+    python planilhas.py exportar doses historico.csv --inicio 2024-01-01 --fim 2024-12-31
+
+O formato vem da extensão do arquivo (.csv ou .jsonl). As colunas
+esperadas estão nas funções importar_* de banco.py.
+"""
+import argparse
+import sys
+from datetime import date
+
+import banco
+
+IMPORTADORES = {
+    "pacientes": banco.importar_pacientes,
+    "medicamentos": banco.importar_medicamentos,
+    "prescricoes": banco.importar_prescricoes,
+}
+ERROS_EXIBIDOS = 20
+
+def importar(conn, args):
+    def progresso(resultado):
+        print(f"\r{resultado.lidas} linhas lidas, {resultado.importadas} importadas",
+              end="", file=sys.stderr, flush=True)
+
+    opcoes = {} if args.tipo == "pacientes" else {"janela_min": args.janela_conflito}
+    resultado = IMPORTADORES[args.tipo](conn, args.arquivo, tamanho_lote=args.lote,
+                                        progresso=progresso, **opcoes)
+    print(f"\r{resultado.lidas} linhas lidas, {resultado.importadas} importadas, "
+          f"{len(resultado.erros)} com erro", file=sys.stderr)
+    for numero, mensagem in resultado.erros[:ERROS_EXIBIDOS]:
+        print(f"  linha {numero}: {mensagem}", file=sys.stderr)
+    if len(resultado.erros) > ERROS_EXIBIDOS:
+        print(f"  ... e mais {len(resultado.erros) - ERROS_EXIBIDOS}", file=sys.stderr)
+    return 1 if resultado.erros else 0
+
+def exportar(conn, args):
+    if args.tipo == "pacientes":
+        quantidade = banco.exportar_pacientes(conn, args.arquivo)
+    else:
+        quantidade = banco.exportar_doses(conn, args.arquivo, args.inicio, args.fim)
+    print(f"{quantidade} linhas gravadas em {args.arquivo}", file=sys.stderr)
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--banco", default=str(banco.CAMINHO_BANCO))
+    acoes = parser.add_subparsers(dest="acao", required=True)
+
+    p_importar = acoes.add_parser("importar")
+    p_importar.add_argument("tipo", choices=sorted(IMPORTADORES))
+    p_importar.add_argument("arquivo")
+    p_importar.add_argument("--lote", type=int, default=banco.TAMANHO_LOTE_IMPORTACAO,
+                            help="linhas gravadas por transação")
+    p_importar.add_argument("--janela-conflito", type=int, default=banco.JANELA_CONFLITO_MIN,
+                            help="minutos entre doses do mesmo medicamento (0 desliga a verificação)")
+
+    p_exportar = acoes.add_parser("exportar")
+    p_exportar.add_argument("tipo", choices=["pacientes", "doses"])
+    p_exportar.add_argument("arquivo")
+    p_exportar.add_argument("--inicio", default=date.today().replace(month=1, day=1).isoformat())
+    p_exportar.add_argument("--fim", default=date.today().isoformat())
+    args = parser.parse_args()
+
+    try:
+        conn = banco.conectar(args.banco)
+    except banco.ErroBanco as e:
+        parser.exit(1, f"{e}\n")
+    try:
+        return (importar if args.acao == "importar" else exportar)(conn, args)
+    except banco.ErroBanco as e:
+        parser.exit(1, f"\n{e}\n")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,27 @@
 import streamlit as st
-import sqlite3
-from datetime import time, datetime, date, timedelta
+from datetime import time, date, datetime, timedelta
 import calendar
+import io
 import os
-from pathlib import Path
+from contextlib import nullcontext
 from PIL import Image
 
+from banco import (
+    CAMINHO_BANCO, LIMITE_BUSCA, ErroBanco, ErroConflito, GerenciadorConexoes,
+    JANELA_CONFLITO_MIN, Paciente, UNIDADE_PRINCIPAL,
+    adesao_por_paciente, adicionar_medicamento, adicionar_paciente, adicionar_prescricao,
+    atualizar_paciente, atualizar_status_dose, atualizar_status_em_lote, buscar_medicamentos,
+    buscar_pacientes, contar_pacientes, criar_unidade, encerrar_prescricao, importar_medicamentos,
+    importar_pacientes, importar_prescricoes, inicializar_tabelas, listar_medicamentos_hoje,
+    listar_medicamentos_por_mes, listar_pacientes_pagina, listar_prescricoes, listar_unidades,
+    relatorio_unidades, remover_paciente, remover_prescricao, resumo_por_dia,
+    ultima_dose_registrada,
+)
+from agendador import JANELA_PROXIMAS_MIN, AgendadorDoses
+from escritor import Escritor
+from instantaneo import INTERVALO_INSTANTANEO_S, InstantaneoRelatorios
+from instrumentacao import LIMITE_CONSULTA_LENTA_MS, PerfilConsultas
+
 # CONFIG INICIAL
 st.set_page_config(page_title="Casa de Repouso", page_icon="🏥", layout="wide")
 
@@ -103,515 +119,928 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- GERENCIAMENTO DO BANCO DE DADOS ---
+# Cada unidade (casa) tem seu banco; os recursos abaixo existem uma vez por
+# processo para cada arquivo e a sessão usa os da unidade escolhida.
+@st.cache_data(ttl=60)
+def unidades_disponiveis():
+    """{nome: caminho} das unidades, relido a cada minuto"""
+    return {nome: str(caminho) for nome, caminho in listar_unidades().items()}
+
+def caminho_da_sessao():
+    """Arquivo do banco da unidade escolhida na sessão"""
+    return unidades_disponiveis().get(st.session_state.get("unidade"), str(CAMINHO_BANCO))
+
+@st.cache_resource
+def obter_gerenciador(caminho):
+    """Cria o gerenciador de conexões uma única vez por processo (e por unidade)"""
+    gerenciador = GerenciadorConexoes(caminho)
+    # A verificação e atualização do esquema roda só na criação do gerenciador
+    inicializar_tabelas(gerenciador.conexao())
+    return gerenciador
+
+@st.cache_resource
+def obter_instantaneo(caminho):
+    """Cópia do banco lida pelos relatórios, compartilhada pelas sessões"""
+    obter_gerenciador(caminho)  # garante o esquema atualizado antes da primeira cópia
+    return InstantaneoRelatorios(caminho)
+
+@st.cache_resource
+def obter_escritor(caminho):
+    """Thread única que grava as alterações de todas as sessões da unidade"""
+    obter_gerenciador(caminho)
+    return Escritor(caminho)
+
+@st.cache_resource
+def obter_agendador(caminho):
+    """Agenda em memória das doses pendentes do dia, compartilhada pelas sessões"""
+    obter_gerenciador(caminho)
+    return AgendadorDoses(caminho).iniciar()
+
+def gravar(funcao, *args, **kwargs):
+    """Aplica uma função de alteração de banco.py pelo Escritor e retorna o resultado"""
+    resultado = obter_escritor(caminho_da_sessao()).executar(funcao, *args, **kwargs)
+    # Mudanças de status entram direto na agenda; o resto pede uma releitura
+    agendador = obter_agendador(caminho_da_sessao())
+    if funcao is atualizar_status_dose:
+        agendador.marcar(*args)
+    elif funcao is atualizar_status_em_lote:
+        for dose, status in args[0]:
+            agendador.marcar(dose, status)
+    else:
+        agendador.recarregar()
+    return resultado
+
 def criar_conexao():
-    """Cria e retorna uma conexão com o banco de dados"""
+    """Retorna a conexão com o banco de dados da thread atual"""
     try:
-        # Garante que o diretório existe
-        Path('data').mkdir(exist_ok=True)
-        
-        # Cria o arquivo do banco de dados se não existir
-        db_path = Path('data/pacientes.db')
-        if not db_path.exists():
-            db_path.touch()
-            
-        conn = sqlite3.connect('data/pacientes.db', check_same_thread=False)
-        
-        # Configura para garantir que as chaves estrangeiras são respeitadas
-        conn.execute("PRAGMA foreign_keys = ON")
-        
-        return conn
-    except Exception as e:
-        st.error(f"Erro ao conectar ao banco de dados: {str(e)}")
+        return obter_gerenciador(caminho_da_sessao()).conexao()
+    except ErroBanco as e:
+        st.error(str(e))
         return None
 
-def inicializar_tabelas(conn):
-    """Cria as tabelas necessárias se não existirem"""
-    if conn is None:
+def perfil_sql():
+    """Perfil de consultas da sessão, ou None com a depuração SQL desligada"""
+    if not st.session_state.get("depuracao_sql"):
+        return None
+    if "perfil_sql" not in st.session_state:
+        st.session_state["perfil_sql"] = PerfilConsultas()
+    return st.session_state["perfil_sql"]
+
+def medir_execucao(rotulo):
+    """Registra as consultas do bloco no perfil da sessão, se a depuração estiver ligada"""
+    perfil = perfil_sql()
+    return perfil.medir(rotulo) if perfil else nullcontext()
+
+# --- COMPONENTES DA INTERFACE ---
+# Cada componente é um fragmento do Streamlit: um clique dentro dele executa
+# apenas a função do fragmento, e não a página inteira. As gravações ficam em
+# callbacks (on_click), que rodam antes do fragmento ser redesenhado, e vão
+# para o Escritor (ver gravar), que aplica as alterações de todas as sessões
+# em uma única thread.
+
+def chave_dose(dose):
+    """Identificador estável de uma dose para chaves de widgets"""
+    if dose.id is not None:
+        return str(dose.id)
+    return f"p{dose.prescricao_id}_{dose.data}_{dose.horario}"
+
+def limpar_estado(prefixo):
+    """Remove do session_state os valores guardados pelos fragmentos"""
+    for chave in [k for k in st.session_state if str(k).startswith(prefixo)]:
+        del st.session_state[chave]
+
+def _marcar_dose(med, status):
+    """Callback dos botões do cartão: grava o status antes do fragmento redesenhar"""
+    try:
+        with medir_execucao("💊 Hoje (cartão)"):
+            gravar(atualizar_status_dose, med, status)
+    except ErroBanco as e:
+        st.error(str(e))
         return
+    st.session_state[f"status_{chave_dose(med)}"] = status
+
+@st.fragment
+def cartao_dose(med):
+    """Cartão de uma dose do dia com os botões de status"""
+    chave = chave_dose(med)
+    # Status gravado por este cartão desde a última execução completa
+    tomou = st.session_state.get(f"status_{chave}", med.tomou)
+    
+    with st.container():
+        st.markdown(f"<div class='paciente-card'>", unsafe_allow_html=True)
         
-    try:
-        c = conn.cursor()
+        cols = st.columns([0.3, 0.3, 0.2, 0.2])
+        with cols[0]: st.write(f"**Paciente:** {med.nome_paciente}")
+        with cols[1]: st.write(f"**Medicamento:** {med.medicamento}")
+        with cols[2]: st.write(f"**Horário:** {med.horario}")
+        with cols[3]: 
+            status = "✅ Tomou" if tomou else "❌ Não tomou"
+            st.write(f"**Status:** {status}")
         
-        # Verifica se a tabela de pacientes já existe
-        c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pacientes'")
-        if not c.fetchone():
-            # Tabela de pacientes
-            c.execute('''CREATE TABLE pacientes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                idade INTEGER,
-                condicao TEXT,
-                data_cadastro TEXT DEFAULT CURRENT_TIMESTAMP
-            )''')
-            
-            # Tabela de medicamentos
-            c.execute('''CREATE TABLE medicamentos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                paciente_id INTEGER NOT NULL,
-                medicamento TEXT NOT NULL,
-                horario TEXT NOT NULL,
-                data TEXT NOT NULL,
-                tomou INTEGER DEFAULT 0,
-                observacoes TEXT,
-                FOREIGN KEY(paciente_id) REFERENCES pacientes(id) ON DELETE CASCADE
-            )''')
-            
-            # Tabela de calendário
-            c.execute('''CREATE TABLE calendario_medicamentos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                medicamento_id INTEGER NOT NULL,
-                data TEXT NOT NULL,
-                status TEXT CHECK(status IN ("pendente", "tomado", "nao_tomado", "adiado")),
-                observacoes TEXT,
-                FOREIGN KEY(medicamento_id) REFERENCES medicamentos(id) ON DELETE CASCADE
-            )''')
-            
-            # Adiciona alguns dados de exemplo
-            c.execute("INSERT INTO pacientes (nome, idade, condicao) VALUES (?, ?, ?)", 
-                     ("Maria da Silva", 78, "Hipertensão, Diabetes"))
-            c.execute("INSERT INTO pacientes (nome, idade, condicao) VALUES (?, ?, ?)", 
-                     ("João Oliveira", 82, "Demência moderada"))
-            
-            # Medicamentos de exemplo
-            hoje = date.today().strftime("%Y-%m-%d")
-            amanha = (date.today() + timedelta(days=1)).strftime("%Y-%m-%d")
-            
-            c.execute("""INSERT INTO medicamentos 
-                        (paciente_id, medicamento, horario, data, observacoes) 
-                        VALUES (?, ?, ?, ?, ?)""", 
-                     (1, "Captopril 25mg", "08:00", hoje, "Tomar antes do café"))
-            c.execute("""INSERT INTO medicamentos 
-                        (paciente_id, medicamento, horario, data, observacoes) 
-                        VALUES (?, ?, ?, ?, ?)""", 
-                     (1, "Metformina 850mg", "12:00", hoje, "Tomar após almoço"))
-            c.execute("""INSERT INTO medicamentos 
-                        (paciente_id, medicamento, horario, data, observacoes) 
-                        VALUES (?, ?, ?, ?, ?)""", 
-                     (2, "Donepezila 10mg", "09:00", hoje, "Com leite"))
-            
-            conn.commit()
-    except sqlite3.Error as e:
-        st.error(f"Erro ao criar tabelas: {e}")
-
-# --- FUNÇÕES PARA PACIENTES ---
-def adicionar_paciente(conn, nome, idade, condicao):
-    """Adiciona um novo paciente ao banco de dados"""
-    if conn is None:
-        st.error("Sem conexão com o banco de dados")
-        return False
+        if med.observacoes:
+            with st.expander("Observações"):
+                st.write(med.observacoes)
         
-    try:
-        if not nome.strip():
-            st.error("O nome não pode estar vazio")
-            return False
-        if idade <= 0:
-            st.error("Idade inválida")
-            return False
-            
-        c = conn.cursor()
-        c.execute("INSERT INTO pacientes (nome, idade, condicao) VALUES (?, ?, ?)", 
-                 (nome.strip(), int(idade), condicao.strip()))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        st.error(f"Erro ao adicionar paciente: {e}")
-        return False
-
-def listar_pacientes(conn):
-    """Retorna todos os pacientes cadastrados"""
-    if conn is None:
-        return []
+        # Botões para marcar como tomado/não tomado
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button(f"Marcar como tomado - {med.medicamento}", key=f"tomou_{chave}",
+                      on_click=_marcar_dose, args=(med, 1))
+        with col2:
+            st.button(f"Marcar como não tomado - {med.medicamento}", key=f"nao_tomou_{chave}",
+                      on_click=_marcar_dose, args=(med, 0))
         
+        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown("---")
+
+def _salvar_paciente(paciente):
+    """Callback do formulário de edição: grava antes do fragmento redesenhar"""
+    id_paciente = paciente.id
+    novo_nome = st.session_state[f"editar_nome_{id_paciente}"]
+    nova_idade = st.session_state[f"editar_idade_{id_paciente}"]
+    nova_condicao = st.session_state[f"editar_condicao_{id_paciente}"]
+    
     try:
-        c = conn.cursor()
-        c.execute("SELECT * FROM pacientes ORDER BY nome")
-        return c.fetchall()
-    except sqlite3.Error as e:
-        st.error(f"Erro ao listar pacientes: {e}")
-        return []
-
-def atualizar_paciente(conn, id_paciente, nome, idade, condicao):
-    """Atualiza os dados de um paciente existente"""
-    if conn is None:
-        st.error("Sem conexão com o banco de dados")
-        return False
+        with medir_execucao("👴 Pacientes (edição)"):
+            gravar(atualizar_paciente, id_paciente, novo_nome, nova_idade, nova_condicao)
+    except ErroBanco as e:
+        st.error(str(e))
+        return
+    st.session_state[f"paciente_{id_paciente}"] = Paciente(
+        id_paciente, novo_nome.strip(), int(nova_idade), nova_condicao.strip(), paciente.data_cadastro
+    )
+    st.session_state[f"editando_{id_paciente}"] = False
+
+def _alternar_edicao(id_paciente, editando):
+    """Callback que abre ou fecha o formulário de edição de um paciente"""
+    st.session_state[f"editando_{id_paciente}"] = editando
+
+@st.fragment
+def linha_paciente(paciente):
+    """Linha da lista de pacientes; o formulário só é criado durante a edição"""
+    # Dados gravados por esta linha desde a última execução completa
+    paciente = st.session_state.get(f"paciente_{paciente.id}", paciente)
+    
+    col1, col2, col3, col4 = st.columns([0.4, 0.2, 0.2, 0.2])
+    with col1: st.write(paciente.nome)
+    with col2: st.write(paciente.idade)
+    with col3: st.write(paciente.condicao if paciente.condicao else "-")
+    
+    if not st.session_state.get(f"editando_{paciente.id}"):
+        with col4:
+            st.button("⚙️ Editar", key=f"abrir_edicao_{paciente.id}",
+                      on_click=_alternar_edicao, args=(paciente.id, True))
+        return
+    
+    with col4:
+        st.button("Fechar", key=f"fechar_edicao_{paciente.id}",
+                  on_click=_alternar_edicao, args=(paciente.id, False))
+    
+    with st.form(f"editar_{paciente.id}"):
+        st.text_input("Nome", paciente.nome, key=f"editar_nome_{paciente.id}")
+        st.number_input("Idade", value=paciente.idade, key=f"editar_idade_{paciente.id}")
+        st.text_area("Condição", paciente.condicao if paciente.condicao else "",
+                     key=f"editar_condicao_{paciente.id}")
         
+        col1, col2 = st.columns(2)
+        with col1:
+            st.form_submit_button("Atualizar", on_click=_salvar_paciente, args=(paciente,))
+        with col2:
+            if st.form_submit_button("❌ Remover"):
+                try:
+                    gravar(remover_paciente, paciente.id)
+                except ErroBanco as e:
+                    st.error(str(e))
+                else:
+                    st.success("Paciente removido!")
+                    # A lista inteira muda, então a página é refeita
+                    st.rerun()
+    
+    prescricoes_do_paciente(paciente)
+
+def _alterar_prescricao(funcao, *args):
+    """Callback dos botões das prescrições: grava antes do fragmento redesenhar"""
     try:
-        c = conn.cursor()
-        c.execute("UPDATE pacientes SET nome=?, idade=?, condicao=? WHERE id=?", 
-                 (nome.strip(), int(idade), condicao.strip(), id_paciente))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        st.error(f"Erro ao atualizar paciente: {e}")
-        return False
-
-def remover_paciente(conn, id_paciente):
-    """Remove um paciente do banco de dados"""
+        gravar(funcao, *args)
+    except ErroBanco as e:
+        st.error(str(e))
+
+def _encerrar_prescricao(id_prescricao):
+    fim = st.session_state[f"fim_prescricao_{id_prescricao}"]
+    _alterar_prescricao(encerrar_prescricao, id_prescricao, fim.isoformat())
+
+def prescricoes_do_paciente(paciente):
+    """Prescrições em vigor do paciente, com os botões para encerrar ou remover"""
+    conn = criar_conexao()
     if conn is None:
-        st.error("Sem conexão com o banco de dados")
-        return False
+        return
+    hoje = date.today()
+    prescricoes = listar_prescricoes(conn, paciente.id, hoje.isoformat())
+    if not prescricoes:
+        st.caption("Nenhuma prescrição em vigor.")
+        return
+    
+    st.markdown("**Prescrições em vigor**")
+    for prescricao in prescricoes:
+        inicio = date.fromisoformat(prescricao.data_inicio)
+        # Não encerra antes de uma dose já registrada (ver encerrar_prescricao)
+        ultima = ultima_dose_registrada(conn, prescricao.id)
+        minimo = max(inicio, date.fromisoformat(ultima)) if ultima else inicio
+        col1, col2, col3, col4 = st.columns([0.4, 0.3, 0.15, 0.15], vertical_alignment="bottom")
+        with col1:
+            st.write(f"{prescricao.medicamento} – {prescricao.horarios.replace(',', ', ')}")
+            st.caption(f"Desde {inicio.strftime('%d/%m/%Y')}"
+                       + (f" até {date.fromisoformat(prescricao.data_fim).strftime('%d/%m/%Y')}"
+                          if prescricao.data_fim else " (uso contínuo)"))
+        with col2:
+            st.date_input("Último dia", value=max(hoje, minimo), min_value=minimo,
+                          key=f"fim_prescricao_{prescricao.id}")
+        with col3:
+            st.button("⏹️ Encerrar", key=f"encerrar_prescricao_{prescricao.id}",
+                      on_click=_encerrar_prescricao, args=(prescricao.id,))
+        with col4:
+            st.button("🗑️ Remover", key=f"remover_prescricao_{prescricao.id}",
+                      help="Para prescrições cadastradas por engano",
+                      on_click=_alterar_prescricao, args=(remover_prescricao, prescricao.id))
+
+IMPORTACOES = {
+    "Pacientes (nome, idade, condicao)": importar_pacientes,
+    "Doses avulsas (paciente, medicamento, horario, data, observacoes)": importar_medicamentos,
+    "Prescrições (paciente, medicamento, horarios, data_inicio, data_fim, intervalo_dias, "
+    "dias_semana, observacoes)": importar_prescricoes,
+}
+
+def painel_importacao(conn):
+    """Importação de planilhas (CSV ou JSON Lines) exportadas pela farmácia"""
+    with st.expander("📥 Importar planilha"):
+        tipo = st.radio("Conteúdo do arquivo", list(IMPORTACOES), key="tipo_importacao")
+        arquivo = st.file_uploader("Arquivo", type=["csv", "jsonl"], key="arquivo_importacao")
+        if arquivo is None or not st.button("Importar", key="importar_planilha"):
+            return
         
-    try:
-        c = conn.cursor()
-        c.execute("DELETE FROM pacientes WHERE id=?", (id_paciente,))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        st.error(f"Erro ao remover paciente: {e}")
-        return False
-
-# --- FUNÇÕES PARA MEDICAMENTOS ---
-def adicionar_medicamento(conn, paciente_id, medicamento, horario, data, observacoes):
-    """Adiciona um novo medicamento para um paciente"""
-    if conn is None:
-        st.error("Sem conexão com o banco de dados")
-        return False
+        andamento = st.empty()
+        def progresso(resultado):
+            andamento.caption(f"{resultado.lidas} linhas lidas, {resultado.importadas} importadas...")
         
-    try:
-        if not medicamento.strip():
-            st.error("O nome do medicamento não pode estar vazio")
-            return False
-            
-        c = conn.cursor()
-        c.execute("""INSERT INTO medicamentos 
-                    (paciente_id, medicamento, horario, data, observacoes) 
-                    VALUES (?, ?, ?, ?, ?)""", 
-                 (paciente_id, medicamento.strip(), horario, data, observacoes.strip()))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        st.error(f"Erro ao adicionar medicamento: {e}")
-        return False
-
-def listar_medicamentos_hoje(conn):
-    """Retorna os medicamentos para o dia atual"""
-    if conn is None:
-        return []
+        # O arquivo enviado é lido aos poucos, como texto, direto do upload
+        texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+        try:
+            resultado = IMPORTACOES[tipo](conn, texto, progresso=progresso)
+        except ErroBanco as e:
+            st.error(str(e))
+            return
+        finally:
+            texto.detach()
         
+        obter_agendador(caminho_da_sessao()).recarregar()
+        andamento.empty()
+        st.success(f"{resultado.importadas} de {resultado.lidas} linhas importadas.")
+        if resultado.erros:
+            st.warning(f"{len(resultado.erros)} linhas com erro não foram importadas:")
+            st.dataframe([{"Linha": numero, "Erro": mensagem} for numero, mensagem in resultado.erros],
+                         hide_index=True)
+
+TAMANHOS_PAGINA = [10, 25, 50, 100]
+PERIODOS_RELATORIO = {"7 dias": 7, "90 dias": 90, "12 meses": 365}
+# Idade máxima da cópia lida pelos relatórios; "Ao vivo" lê o banco principal
+ATUALIZACAO_RELATORIOS = {"Ao vivo": 0, "1 min": 60, "5 min": 300, "15 min": 900, "1 hora": 3600}
+
+def conexao_relatorios(intervalo_s):
+    """Conexão com a cópia dos relatórios, ou com o banco se intervalo_s for 0"""
+    if not intervalo_s:
+        return criar_conexao()
+    # O intervalo é da sessão: o instantâneo é compartilhado por todas
+    return obter_instantaneo(caminho_da_sessao()).conexao(intervalo_s)
+
+def _descrever_idade(segundos):
+    minutos = int(segundos // 60)
+    if minutos < 1:
+        return "agora há pouco"
+    if minutos < 60:
+        return f"há {minutos} min"
+    return f"há {minutos // 60} h {minutos % 60:02d} min"
+
+@st.fragment
+def painel_relatorios():
+    """Métricas e gráfico da aba de relatórios"""
+    opcoes = list(ATUALIZACAO_RELATORIOS)
+    col_intervalo, col_botao = st.columns([1, 1])
+    rotulo = col_intervalo.selectbox(
+        "Atualizar dados a cada", opcoes, key="intervalo_relatorios",
+        index=list(ATUALIZACAO_RELATORIOS.values()).index(INTERVALO_INSTANTANEO_S),
+        help="Os relatórios leem uma cópia do banco, para não atrasar o registro das doses.",
+    )
+    intervalo_s = ATUALIZACAO_RELATORIOS[rotulo]
+    # Recalcula só este painel, sem refazer o resto da página
+    atualizar = col_botao.button("🔄 Atualizar relatórios", key="atualizar_relatorios")
+    
     try:
-        c = conn.cursor()
-        hoje = date.today().strftime("%Y-%m-%d")
-        c.execute("""SELECT m.id, p.nome, m.medicamento, m.horario, m.tomou, m.observacoes 
-                     FROM medicamentos m
-                     JOIN pacientes p ON m.paciente_id = p.id
-                     WHERE m.data = ?
-                     ORDER BY m.horario""", (hoje,))
-        return c.fetchall()
-    except sqlite3.Error as e:
-        st.error(f"Erro ao listar medicamentos: {e}")
-        return []
-
-def listar_medicamentos_por_data(conn, data):
-    """Retorna os medicamentos para uma data específica"""
+        if intervalo_s and atualizar:
+            obter_instantaneo(caminho_da_sessao()).atualizar(forcar=True)
+        conn = conexao_relatorios(intervalo_s)
+    except ErroBanco as e:
+        st.error(str(e))
+        return
     if conn is None:
-        return []
-        
+        return
+    if intervalo_s:
+        instantaneo = obter_instantaneo(caminho_da_sessao())
+        st.caption(f"📸 Dados de {instantaneo.criado_em:%d/%m %H:%M} "
+                   f"({_descrever_idade(instantaneo.idade_s())})")
+    
     try:
-        c = conn.cursor()
-        c.execute("""SELECT m.id, p.nome, m.medicamento, m.horario, m.tomou, m.observacoes 
-                     FROM medicamentos m
-                     JOIN pacientes p ON m.paciente_id = p.id
-                     WHERE m.data = ?
-                     ORDER BY m.horario""", (data,))
-        return c.fetchall()
-    except sqlite3.Error as e:
-        st.error(f"Erro ao listar medicamentos: {e}")
-        return []
-
-def atualizar_status_medicamento(conn, id_medicamento, status):
-    """Atualiza o status de um medicamento (1 = tomou, 0 = não tomou)"""
-    if conn is None:
-        st.error("Sem conexão com o banco de dados")
-        return False
-        
+        with medir_execucao("📊 Relatórios (painel)"):
+            _desenhar_relatorios(conn)
+    except ErroBanco as e:
+        st.error(str(e))
+
+def _grafico_doses(dias, por_mes):
+    """Barras de doses tomadas e não tomadas por dia (ou por mês)"""
+    grafico = {}
+    for dia in dias:
+        rotulo = dia.data[:7] if por_mes else dia.data
+        soma = grafico.setdefault(rotulo, [0, 0])
+        soma[0] += dia.tomados
+        soma[1] += dia.nao_tomados
+    
+    st.bar_chart(
+        {
+            "Dia": list(grafico),
+            "Tomados": [v[0] for v in grafico.values()],
+            "Não tomados": [v[1] for v in grafico.values()],
+        },
+        x="Dia",
+        y=["Tomados", "Não tomados"],
+        color=["#2e7d32", "#c62828"],
+    )
+
+def _desenhar_relatorios(conn):
+    st.markdown("### Estatísticas")
+    col1, col2, col3 = st.columns(3)
+    
+    # Total de pacientes
+    col1.metric("Total de Pacientes", contar_pacientes(conn))
+    
+    # Medicamentos e adesão de hoje (inclui doses previstas de prescrições)
+    hoje = date.today()
+    resumo_hoje = resumo_por_dia(conn, hoje.isoformat(), hoje.isoformat())[0]
+    meds_hoje, meds_tomados = resumo_hoje.total, resumo_hoje.tomados
+    col2.metric("Medicamentos Hoje", meds_hoje)
+    taxa = (meds_tomados / meds_hoje * 100) if meds_hoje > 0 else 0
+    col3.metric("Taxa de Adesão Hoje", f"{taxa:.1f}%")
+    
+    st.markdown("---")
+    periodo = st.radio("Período", list(PERIODOS_RELATORIO), horizontal=True, key="periodo_relatorio")
+    inicio = (hoje - timedelta(days=PERIODOS_RELATORIO[periodo] - 1)).isoformat()
+    
+    # Gráfico de adesão por dia (ou por mês nos períodos longos)
+    st.markdown(f"### Medicamentos - {periodo}")
+    dias = resumo_por_dia(conn, inicio, hoje.isoformat())
+    por_mes = PERIODOS_RELATORIO[periodo] > 90
+    
+    _grafico_doses(dias, por_mes)
+    
+    # Adesão por paciente no mesmo período
+    st.markdown("### Adesão por Paciente")
+    linhas = adesao_por_paciente(conn, inicio, hoje.isoformat())
+    if linhas:
+        st.dataframe(
+            {
+                "Paciente": [linha.nome for linha in linhas],
+                "Doses": [linha.total for linha in linhas],
+                "Tomadas": [linha.tomados for linha in linhas],
+                "Adesão (%)": [
+                    round(linha.tomados / linha.total * 100, 1) if linha.total else 0.0
+                    for linha in linhas
+                ],
+            },
+            hide_index=True,
+        )
+    
+    if len(unidades_disponiveis()) > 1:
+        _desenhar_unidades(periodo, inicio, hoje.isoformat(), por_mes)
+
+@st.cache_data(ttl=INTERVALO_INSTANTANEO_S, show_spinner="Somando as unidades...")
+def relatorio_das_unidades(unidades, inicio, fim):
+    """Agregados de todas as unidades, guardados pelo intervalo dos relatórios"""
+    return relatorio_unidades(unidades, inicio, fim)
+
+def _desenhar_unidades(periodo, inicio, fim, por_mes):
+    st.markdown(f"### 🏘️ Todas as Unidades - {periodo}")
+    adesoes, dias = relatorio_das_unidades(unidades_disponiveis(), inicio, fim)
+    st.dataframe(
+        {
+            "Unidade": [linha.unidade for linha in adesoes],
+            "Pacientes": [linha.pacientes for linha in adesoes],
+            "Doses": [linha.total for linha in adesoes],
+            "Tomadas": [linha.tomados for linha in adesoes],
+            "Adesão (%)": [
+                round(linha.tomados / linha.total * 100, 1) if linha.total else 0.0
+                for linha in adesoes
+            ],
+        },
+        hide_index=True,
+    )
+    _grafico_doses(dias, por_mes)
+
+def _trocar_unidade():
+    """Callback do seletor: descarta o que a sessão guardou da unidade anterior"""
+    for prefixo in ("status_", "paciente_", "editando_", "editar_", "pacientes_cursores"):
+        limpar_estado(prefixo)
+
+def _criar_unidade():
     try:
-        c = conn.cursor()
-        c.execute("UPDATE medicamentos SET tomou=? WHERE id=?", (status, id_medicamento))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        st.error(f"Erro ao atualizar status do medicamento: {e}")
-        return False
-
-def contar_medicamentos_por_data(conn, data):
-    """Conta quantos medicamentos existem para uma data específica"""
-    if conn is None:
-        return 0
+        nome, _ = criar_unidade(st.session_state["nova_unidade"])
+    except ErroBanco as e:
+        st.session_state["erro_unidade"] = str(e)
+        return
+    unidades_disponiveis.clear()
+    st.session_state["nova_unidade"] = ""
+    st.session_state["unidade"] = nome
+    _trocar_unidade()
+
+def seletor_unidade():
+    """Escolha da unidade (casa) cujo banco a sessão usa"""
+    with st.sidebar:
+        unidades = list(unidades_disponiveis())
+        if st.session_state.get("unidade") not in unidades:
+            st.session_state["unidade"] = UNIDADE_PRINCIPAL
+        st.selectbox("🏠 Unidade", unidades, key="unidade", on_change=_trocar_unidade)
+        with st.expander("➕ Nova unidade"):
+            st.text_input("Nome da unidade", key="nova_unidade")
+            st.button("Criar unidade", key="criar_unidade", on_click=_criar_unidade)
+            if "erro_unidade" in st.session_state:
+                st.error(st.session_state.pop("erro_unidade"))
+
+def painel_busca(conn):
+    """Caixa de busca na barra lateral"""
+    with st.sidebar:
+        st.markdown("### 🔎 Buscar")
+        termo = st.text_input("Paciente, condição ou medicamento", key="termo_busca")
+        if not termo.strip():
+            return
         
-    try:
-        c = conn.cursor()
-        c.execute("SELECT COUNT(*) FROM medicamentos WHERE data = ?", (data,))
-        return c.fetchone()[0]
-    except sqlite3.Error as e:
-        st.error(f"Erro ao contar medicamentos: {e}")
-        return 0
+        try:
+            pacientes = buscar_pacientes(conn, termo)
+            medicamentos = buscar_medicamentos(conn, termo)
+        except ErroBanco as e:
+            st.error(str(e))
+            return
+        if not pacientes and not medicamentos:
+            st.caption("Nada encontrado.")
+            return
+        
+        if pacientes:
+            st.markdown("**Pacientes**")
+            for paciente in pacientes:
+                st.write(f"{paciente.nome} ({paciente.idade} anos)")
+                if paciente.condicao:
+                    st.caption(paciente.condicao)
+        if medicamentos:
+            st.markdown("**Medicamentos**")
+            for item in medicamentos:
+                st.write(f"{item.medicamento} - {item.nome_paciente}")
+                if item.observacoes:
+                    st.caption(f"{item.observacoes} ({item.usos} registros)")
+                else:
+                    st.caption(f"{item.usos} registros")
+
+def painel_depuracao(perfil, execucoes):
+    """Tempo gasto no banco nesta execução, por aba e nas consultas lentas"""
+    if execucoes:
+        st.markdown("**Esta execução**")
+        for execucao in execucoes:
+            st.caption(f"{execucao.rotulo}: {len(execucao.consultas)} consultas, "
+                       f"{execucao.tempo_banco_ms:.1f} ms no banco de "
+                       f"{execucao.duracao_ms:.1f} ms")
+            # PRAGMA data_version se repete a cada leitura do cache, de propósito
+            repetidas = [item for item in execucao.repeticoes()
+                         if item[1] > 1 and not item[0].startswith("PRAGMA")][:3]
+            for sql, vezes, tempo in repetidas:
+                st.warning(f"{vezes}x ({tempo:.1f} ms): {sql[:120]}")
+
+        with st.expander("Consultas desta execução"):
+            st.dataframe(
+                [{"Aba": execucao.rotulo, "SQL": consulta.sql, "Parâmetros": repr(consulta.parametros),
+                  "Linhas": consulta.linhas, "ms": round(consulta.duracao_ms, 2)}
+                 for execucao in execucoes for consulta in execucao.consultas],
+                hide_index=True,
+            )
+
+    cache = getattr(criar_conexao(), "cache_consultas", None)
+    if cache is not None:
+        st.caption(f"Cache de consultas: {cache.acertos} acertos, {cache.falhas} leituras "
+                   f"no banco, {len(cache.resultados)} resultados guardados")
+
+    resumo = perfil.resumo_por_rotulo()
+    if resumo:
+        st.markdown("**Por aba (últimas execuções)**")
+        st.dataframe(
+            [{"Aba": rotulo, "Execuções": vezes, "Consultas/execução": round(consultas / vezes, 1),
+              "ms no banco/execução": round(tempo / vezes, 1)}
+             for rotulo, (vezes, consultas, tempo) in resumo.items()],
+            hide_index=True,
+        )
+
+    st.markdown(f"**Consultas lentas** (≥ {perfil.limite_lenta_ms} ms)")
+    if not perfil.lentas:
+        st.caption("Nenhuma até agora.")
+    for rotulo, consulta in reversed(perfil.lentas):
+        with st.expander(f"{consulta.duracao_ms:.1f} ms - {rotulo}"):
+            st.code(consulta.sql, language="sql")
+            st.caption(f"Parâmetros: {consulta.parametros!r} · {consulta.linhas} linhas")
+            if consulta.plano:
+                st.code("\n".join(consulta.plano), language="text")
+
+    st.button("Limpar histórico", key="limpar_perfil_sql", on_click=perfil.limpar)
 
 # --- INTERFACE DO USUÁRIO ---
-def main():
-    # Cabeçalho
-    col1, col2 = st.columns([0.9, 0.1])
+def aba_calendario(conn):
+    """Aba do calendário mensal de medicamentos"""
+    st.subheader("📅 Calendário de Medicamentos")
+    hoje = date.today()
+    
+    # Seletor de mês/ano
+    col1, col2 = st.columns(2)
     with col1:
-        st.markdown('<div class="titulo">🏥 Gestão de Medicamentos - Casa de Repouso</div>', unsafe_allow_html=True)
+        mes = st.selectbox("Mês", list(calendar.month_name[1:]), index=hoje.month-1)
+    with col2:
+        ano = st.selectbox("Ano", range(hoje.year-1, hoje.year+3), index=1)
     
-    # Conexão com o banco de dados
-    conn = criar_conexao()
-    if conn is None:
-        st.error("Não foi possível conectar ao banco de dados. O aplicativo não pode continuar.")
-        return
+    # Gerar calendário
+    mes_num = list(calendar.month_name).index(mes)
+    cal = calendar.monthcalendar(ano, mes_num)
     
-    inicializar_tabelas(conn)
+    # Carrega todos os medicamentos do mês de uma só vez
+    medicamentos_mes = listar_medicamentos_por_mes(conn, ano, mes_num)
     
-    # Abas principais
-    abas = st.tabs(["📅 Calendário", "💊 Hoje", "👴 Pacientes", "➕ Novo Medicamento", "📊 Relatórios"])
+    # Exibir calendário
+    st.markdown(f"### {mes} {ano}")
     
-    with abas[0]:  # Aba Calendário
-        st.subheader("📅 Calendário de Medicamentos")
-        hoje = date.today()
-        
-        # Seletor de mês/ano
-        col1, col2 = st.columns(2)
-        with col1:
-            mes = st.selectbox("Mês", list(calendar.month_name[1:]), index=hoje.month-1)
-        with col2:
-            ano = st.selectbox("Ano", range(hoje.year-1, hoje.year+3), index=1)
-        
-        # Gerar calendário
-        mes_num = list(calendar.month_name).index(mes)
-        cal = calendar.monthcalendar(ano, mes_num)
-        
-        # Exibir calendário
-        st.markdown(f"### {mes} {ano}")
-        
-        # Cabeçalho dos dias da semana
-        dias_semana = ["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"]
+    # Cabeçalho dos dias da semana
+    dias_semana = ["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"]
+    cols = st.columns(7)
+    for i, dia in enumerate(dias_semana):
+        cols[i].write(f"**{dia}**")
+    
+    # Dias do mês
+    for semana in cal:
         cols = st.columns(7)
-        for i, dia in enumerate(dias_semana):
-            cols[i].write(f"**{dia}**")
-        
-        # Dias do mês
-        for semana in cal:
-            cols = st.columns(7)
-            for i, dia in enumerate(semana):
-                if dia == 0:
-                    cols[i].write(" ")
-                else:
-                    data_str = f"{ano}-{mes_num:02d}-{dia:02d}"
-                    data_completa = date(ano, mes_num, dia)
-                    
-                    # Verifica se é o dia atual
-                    classe_css = "dia-calendario"
-                    if data_completa == hoje:
-                        classe_css += " dia-atual"
+        for i, dia in enumerate(semana):
+            if dia == 0:
+                cols[i].write(" ")
+            else:
+                data_str = f"{ano}-{mes_num:02d}-{dia:02d}"
+                data_completa = date(ano, mes_num, dia)
+                
+                # Verifica se é o dia atual
+                classe_css = "dia-calendario"
+                if data_completa == hoje:
+                    classe_css += " dia-atual"
+                
+                # Verifica se há medicamentos para este dia
+                medicamentos = medicamentos_mes.get(data_str, [])
+                num_meds = len(medicamentos)
+                if num_meds > 0:
+                    classe_css += " com-medicamento"
+                
+                with cols[i]:
+                    st.markdown(f"""<div class="{classe_css}">
+                        <strong>{dia}</strong>
+                        {f'<br><small>{num_meds} meds</small>' if num_meds > 0 else ''}
+                    </div>""", unsafe_allow_html=True)
                     
-                    # Verifica se há medicamentos para este dia
-                    num_meds = contar_medicamentos_por_data(conn, data_str)
+                    # Mostrar detalhes ao clicar
                     if num_meds > 0:
-                        classe_css += " com-medicamento"
-                    
-                    with cols[i]:
-                        st.markdown(f"""<div class="{classe_css}">
-                            <strong>{dia}</strong>
-                            {f'<br><small>{num_meds} meds</small>' if num_meds > 0 else ''}
-                        </div>""", unsafe_allow_html=True)
-                        
-                        # Mostrar detalhes ao clicar
-                        if num_meds > 0:
-                            with st.expander("Ver medicamentos"):
-                                medicamentos = listar_medicamentos_por_data(conn, data_str)
-                                for med in medicamentos:
-                                    st.write(f"**{med[1]}** - {med[2]} às {med[3]}")
-                                    if med[5]:
-                                        st.caption(f"Obs: {med[5]}")
-            
+                        with st.expander("Ver medicamentos"):
+                            for med in medicamentos:
+                                st.write(f"**{med.nome_paciente}** - {med.medicamento} às {med.horario}")
+                                if med.observacoes:
+                                    st.caption(f"Obs: {med.observacoes}")
+
+def _descrever_atraso(horario):
+    previsto = datetime.combine(date.today(), time.fromisoformat(horario))
+    minutos = int((datetime.now() - previsto).total_seconds() // 60)
+    return f"{minutos // 60} h {minutos % 60:02d} min" if minutos >= 60 else f"{minutos} min"
+
+@st.fragment(run_every=60)
+def painel_atrasadas():
+    """Doses atrasadas e as que vencem em breve, lidas da agenda em memória"""
+    agendador = obter_agendador(caminho_da_sessao())
+    atrasadas, proximas = agendador.atrasadas(), agendador.proximas()
+    if agendador.erro:
+        st.warning(f"A agenda do dia pode estar desatualizada: {agendador.erro}")
     
-    with abas[1]:  # Aba Hoje
-        st.subheader("💊 Medicamentos para Hoje")
-        hoje_str = date.today().strftime("%d/%m/%Y")
-        st.markdown(f"### {hoje_str}")
-        
-        medicamentos_hoje = listar_medicamentos_hoje(conn)
-        
-        if not medicamentos_hoje:
-            st.info("Nenhum medicamento agendado para hoje.")
+    col1, col2 = st.columns(2)
+    with col1:
+        if atrasadas:
+            st.error(f"⏰ {len(atrasadas)} doses atrasadas")
+            for dose in atrasadas:
+                st.markdown(f"**{dose.horario}** · {dose.nome_paciente} · {dose.medicamento} "
+                            f"(há {_descrever_atraso(dose.horario)})")
         else:
-            for med in medicamentos_hoje:
-                with st.container():
-                    st.markdown(f"<div class='paciente-card'>", unsafe_allow_html=True)
-                    
-                    cols = st.columns([0.3, 0.3, 0.2, 0.2])
-                    with cols[0]: st.write(f"**Paciente:** {med[1]}")
-                    with cols[1]: st.write(f"**Medicamento:** {med[2]}")
-                    with cols[2]: st.write(f"**Horário:** {med[3]}")
-                    with cols[3]: 
-                        status = "✅ Tomou" if med[4] else "❌ Não tomou"
-                        st.write(f"**Status:** {status}")
-                    
-                    if med[5]:  # Observações
-                        with st.expander("Observações"):
-                            st.write(med[5])
-                    
-                    # Botões para marcar como tomado/não tomado
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button(f"Marcar como tomado - {med[2]}", key=f"tomou_{med[0]}"):
-                            if atualizar_status_medicamento(conn, med[0], 1):
-                                st.success("Status atualizado!")
-                                st.rerun()
-                    with col2:
-                        if st.button(f"Marcar como não tomado - {med[2]}", key=f"nao_tomou_{med[0]}"):
-                            if atualizar_status_medicamento(conn, med[0], 0):
-                                st.success("Status atualizado!")
-                                st.rerun()
-                    
-                    st.markdown("</div>", unsafe_allow_html=True)
-                    st.markdown("---")
-    
-    with abas[2]:  # Aba Pacientes
-        st.subheader("👴 Cadastro de Pacientes")
-        
-        with st.expander("➕ Adicionar Novo Paciente", expanded=True):
-            with st.form("form_paciente", clear_on_submit=True):
-                nome = st.text_input("Nome completo*", help="Obrigatório")
-                idade = st.number_input("Idade*", 0, 120, help="Obrigatório")
-                condicao = st.text_area("Condições médicas e observações")
-                
-                if st.form_submit_button("💾 Salvar Paciente"):
-                    if nome and idade:
-                        if adicionar_paciente(conn, nome, idade, condicao):
-                            st.success("Paciente cadastrado com sucesso!")
-                            st.rerun()
-                    else:
-                        st.error("Por favor, preencha pelo menos o nome e a idade do paciente.")
-        
-        st.markdown("---")
-        st.subheader("📋 Lista de Pacientes")
-        pacientes = listar_pacientes(conn)
-        
-        if not pacientes:
-            st.info("Nenhum paciente cadastrado ainda.")
+            st.success("⏰ Nenhuma dose atrasada")
+    with col2:
+        if proximas:
+            st.warning(f"🔔 {len(proximas)} doses nos próximos {JANELA_PROXIMAS_MIN} min")
+            for dose in proximas:
+                st.markdown(f"**{dose.horario}** · {dose.nome_paciente} · {dose.medicamento}")
         else:
-            # Cabeçalho da tabela
-            cols = st.columns([0.4, 0.2, 0.2, 0.2])
-            with cols[0]: st.write("**Nome**")
-            with cols[1]: st.write("**Idade**")
-            with cols[2]: st.write("**Condição**")
-            with cols[3]: st.write("**Ações**")
-            
-            for paciente in pacientes:
-                col1, col2, col3, col4 = st.columns([0.4, 0.2, 0.2, 0.2])
-                with col1: st.write(paciente[1])
-                with col2: st.write(paciente[2])
-                with col3: st.write(paciente[3] if paciente[3] else "-")
-                
-                with col4:
-                    with st.expander("⚙️"):
-                        with st.form(f"editar_{paciente[0]}"):
-                            novo_nome = st.text_input("Nome", paciente[1])
-                            nova_idade = st.number_input("Idade", value=paciente[2])
-                            nova_condicao = st.text_area("Condição", paciente[3] if paciente[3] else "")
-                            
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                if st.form_submit_button("Atualizar"):
-                                    if atualizar_paciente(conn, paciente[0], novo_nome, nova_idade, nova_condicao):
-                                        st.success("Paciente atualizado!")
-                                        st.rerun()
-                            with col2:
-                                if st.form_submit_button("❌ Remover"):
-                                    if remover_paciente(conn, paciente[0]):
-                                        st.success("Paciente removido!")
-                                        st.rerun()
-    
-    with abas[3]:  # Aba Novo Medicamento
-        st.subheader("➕ Adicionar Novo Medicamento")
+            st.info(f"🔔 Nenhuma dose nos próximos {JANELA_PROXIMAS_MIN} min")
+
+def aba_hoje(conn):
+    """Aba com as doses do dia"""
+    st.subheader("💊 Medicamentos para Hoje")
+    hoje_str = date.today().strftime("%d/%m/%Y")
+    st.markdown(f"### {hoje_str}")
+    
+    medicamentos_hoje = listar_medicamentos_hoje(conn)
+    # Uma execução completa relê o banco; descarta o que os cartões guardaram
+    limpar_estado("status_")
+    
+    if not medicamentos_hoje:
+        st.info("Nenhum medicamento agendado para hoje.")
+    else:
+        painel_atrasadas()
         
-        pacientes = listar_pacientes(conn)
-        if not pacientes:
-            st.warning("Cadastre pacientes antes de adicionar medicamentos.")
-        else:
-            with st.form("form_medicamento", clear_on_submit=True):
-                paciente_id = st.selectbox(
-                    "Paciente*",
-                    options=pacientes,
-                    format_func=lambda x: f"{x[1]} (ID: {x[0]})",
-                    help="Obrigatório"
+        # Registro em lote: nada é gravado até o envio do formulário
+        with st.expander("✅ Registrar várias doses de uma vez"):
+            with st.form("form_lote", clear_on_submit=True):
+                doses_escolhidas = st.multiselect(
+                    "Doses",
+                    options=medicamentos_hoje,
+                    format_func=lambda m: f"{m.horario} - {m.nome_paciente} - {m.medicamento}"
                 )
-                medicamento = st.text_input("Medicamento*", help="Obrigatório")
-                
                 col1, col2 = st.columns(2)
                 with col1:
-                    horario = st.time_input("Horário*", time(8, 0), help="Obrigatório")
+                    pacientes_escolhidos = st.multiselect(
+                        "Todas as doses dos pacientes",
+                        options=sorted({m.nome_paciente for m in medicamentos_hoje})
+                    )
                 with col2:
-                    data = st.date_input("Data*", help="Obrigatório")
+                    horarios_escolhidos = st.multiselect(
+                        "Todas as doses dos horários",
+                        options=sorted({m.horario for m in medicamentos_hoje})
+                    )
                 
-                observacoes = st.text_area("Observações")
+                col1, col2 = st.columns(2)
+                with col1:
+                    lote_tomou = st.form_submit_button("Marcar selecionadas como tomadas")
+                with col2:
+                    lote_nao_tomou = st.form_submit_button("Marcar selecionadas como não tomadas")
                 
-                if st.form_submit_button("💾 Salvar Medicamento"):
-                    if medicamento and paciente_id:
-                        if adicionar_medicamento(
-                            conn, 
-                            paciente_id[0], 
-                            medicamento, 
-                            horario.strftime("%H:%M"), 
-                            data.strftime("%Y-%m-%d"), 
-                            observacoes
-                        ):
-                            st.success("Medicamento cadastrado com sucesso!")
+                if lote_tomou or lote_nao_tomou:
+                    chaves = {chave_dose(m) for m in doses_escolhidas}
+                    lote = [
+                        m for m in medicamentos_hoje
+                        if chave_dose(m) in chaves
+                        or m.nome_paciente in pacientes_escolhidos
+                        or m.horario in horarios_escolhidos
+                    ]
+                    if not lote:
+                        st.error("Selecione pelo menos uma dose, paciente ou horário.")
+                    else:
+                        try:
+                            gravar(atualizar_status_em_lote, [(m, 1 if lote_tomou else 0) for m in lote])
+                        except ErroBanco as e:
+                            st.error(str(e))
+                        else:
+                            st.success(f"{len(lote)} doses atualizadas!")
                             st.rerun()
+        
+        for med in medicamentos_hoje:
+            cartao_dose(med)
+
+def aba_pacientes(conn):
+    """Aba de cadastro e lista de pacientes"""
+    st.subheader("👴 Cadastro de Pacientes")
+    
+    with st.expander("➕ Adicionar Novo Paciente", expanded=True):
+        with st.form("form_paciente", clear_on_submit=True):
+            nome = st.text_input("Nome completo*", help="Obrigatório")
+            idade = st.number_input("Idade*", 0, 120, help="Obrigatório")
+            condicao = st.text_area("Condições médicas e observações")
+            
+            if st.form_submit_button("💾 Salvar Paciente"):
+                if nome and idade:
+                    try:
+                        gravar(adicionar_paciente, nome, idade, condicao)
+                    except ErroBanco as e:
+                        st.error(str(e))
                     else:
-                        st.error("Por favor, preencha todos os campos obrigatórios.")
+                        st.success("Paciente cadastrado com sucesso!")
+                        st.rerun()
+                else:
+                    st.error("Por favor, preencha pelo menos o nome e a idade do paciente.")
+    
+    painel_importacao(conn)
+    
+    st.markdown("---")
+    st.subheader("📋 Lista de Pacientes")
+    
+    # Pilha com a chave de início de cada página visitada (None = primeira)
+    if "pacientes_cursores" not in st.session_state:
+        st.session_state["pacientes_cursores"] = [None]
+    cursores = st.session_state["pacientes_cursores"]
     
-    with abas[4]:  # Aba Relatórios
-        st.subheader("📊 Relatórios")
+    tamanho = st.selectbox(
+        "Pacientes por página", TAMANHOS_PAGINA, key="pacientes_por_pagina",
+        on_change=lambda: st.session_state.update(pacientes_cursores=[None])
+    )
+    # Busca um paciente a mais só para saber se existe próxima página
+    pacientes = listar_pacientes_pagina(conn, tamanho + 1, cursores[-1])
+    tem_proxima = len(pacientes) > tamanho
+    pacientes = pacientes[:tamanho]
+    limpar_estado("paciente_")
+    
+    if not pacientes:
+        st.info("Nenhum paciente cadastrado ainda.")
+    else:
+        # Cabeçalho da tabela
+        cols = st.columns([0.4, 0.2, 0.2, 0.2])
+        with cols[0]: st.write("**Nome**")
+        with cols[1]: st.write("**Idade**")
+        with cols[2]: st.write("**Condição**")
+        with cols[3]: st.write("**Ações**")
         
-        st.markdown("### Estatísticas")
-        col1, col2, col3 = st.columns(3)
+        for paciente in pacientes:
+            linha_paciente(paciente)
         
-        try:
-            c = conn.cursor()
-            
-            # Total de pacientes
-            c.execute("SELECT COUNT(*) FROM pacientes")
-            total_pacientes = c.fetchone()[0]
-            col1.metric("Total de Pacientes", total_pacientes)
-            
-            # Total de medicamentos hoje
-            hoje = date.today().strftime("%Y-%m-%d")
-            c.execute("SELECT COUNT(*) FROM medicamentos WHERE data = ?", (hoje,))
-            meds_hoje = c.fetchone()[0]
-            col2.metric("Medicamentos Hoje", meds_hoje)
-            
-            # Taxa de adesão
-            c.execute("SELECT COUNT(*) FROM medicamentos WHERE tomou = 1 AND data = ?", (hoje,))
-            meds_tomados = c.fetchone()[0]
-            taxa = (meds_tomados / meds_hoje * 100) if meds_hoje > 0 else 0
-            col3.metric("Taxa de Adesão Hoje", f"{taxa:.1f}%")
-            
-            # Gráfico de medicamentos por dia (últimos 7 dias)
-            st.markdown("---")
-            st.markdown("### Medicamentos dos Últimos 7 Dias")
-            
-            datas = []
-            counts = []
-            for i in range(7):
-                data = (date.today() - timedelta(days=i)).strftime("%Y-%m-%d")
-                c.execute("SELECT COUNT(*) FROM medicamentos WHERE data = ?", (data,))
-                count = c.fetchone()[0]
-                datas.append(data)
-                counts.append(count)
+        col1, col2, col3 = st.columns([0.2, 0.6, 0.2])
+        with col1:
+            if st.button("⬅️ Anterior", disabled=len(cursores) == 1):
+                cursores.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"Página {len(cursores)}")
+        with col3:
+            if st.button("Próxima ➡️", disabled=not tem_proxima):
+                cursores.append((pacientes[-1].nome, pacientes[-1].id))
+                st.rerun()
+
+CONFLITOS_EXIBIDOS = 10
+
+def aba_novo_medicamento(conn):
+    """Aba de cadastro de medicamentos e prescrições"""
+    st.subheader("➕ Adicionar Novo Medicamento")
+    
+    # A lista de pacientes vem da busca, e não da tabela inteira
+    termo = st.text_input("Buscar paciente", help="Digite parte do nome ou da condição")
+    if termo.strip():
+        pacientes = buscar_pacientes(conn, termo)
+    else:
+        pacientes = listar_pacientes_pagina(conn, LIMITE_BUSCA)
+        if len(pacientes) == LIMITE_BUSCA:
+            st.caption(f"Mostrando os {LIMITE_BUSCA} primeiros pacientes. Use a busca para encontrar os demais.")
+    
+    if not pacientes:
+        if termo.strip():
+            st.warning("Nenhum paciente encontrado.")
+        else:
+            st.warning("Cadastre pacientes antes de adicionar medicamentos.")
+    else:
+        # Fora do formulário para que os campos mudem assim que a opção é trocada
+        frequencia = st.radio("Frequência", ["Dose única", "Recorrente"], horizontal=True)
+        
+        with st.form("form_medicamento", clear_on_submit=True):
+            paciente = st.selectbox(
+                "Paciente*",
+                options=pacientes,
+                format_func=lambda x: f"{x.nome} (ID: {x.id})",
+                help="Obrigatório"
+            )
+            medicamento = st.text_input("Medicamento*", help="Obrigatório")
             
-            # Inverter para mostrar do mais recente para o mais antigo
-            datas.reverse()
-            counts.reverse()
+            if frequencia == "Dose única":
+                col1, col2 = st.columns(2)
+                with col1:
+                    horario = st.time_input("Horário*", time(8, 0), help="Obrigatório")
+                with col2:
+                    data = st.date_input("Data*", help="Obrigatório")
+            else:
+                horarios = st.text_input("Horários*", "08:00, 20:00", help="Formato HH:MM, separados por vírgula")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    data_inicio = st.date_input("Início*", help="Obrigatório")
+                with col2:
+                    data_fim = st.date_input("Fim", value=None, help="Deixe em branco para uso contínuo; para encerrar depois, use ⚙️ Editar na lista de pacientes")
+                with col3:
+                    intervalo = st.number_input("A cada quantos dias", 1, 365, 1)
+                dias_semana = st.multiselect(
+                    "Dias da semana",
+                    options=list(range(7)),
+                    format_func=lambda d: ["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"][d],
+                    help="Deixe em branco para todos os dias"
+                )
             
-            st.bar_chart(dict(zip([datetime.strptime(d, "%Y-%m-%d").strftime("%d/%m") for d in datas], counts)))
+            observacoes = st.text_area("Observações")
+            permitir_conflito = st.checkbox(
+                "Salvar mesmo com conflito de horário",
+                help=f"Doses do mesmo medicamento a menos de {JANELA_CONFLITO_MIN} minutos"
+            )
             
-        except sqlite3.Error as e:
-            st.error(f"Erro ao gerar relatórios: {e}")
+            if st.form_submit_button("💾 Salvar Medicamento"):
+                if medicamento and paciente:
+                    try:
+                        if frequencia == "Recorrente":
+                            gravar(
+                                adicionar_prescricao,
+                                paciente.id,
+                                medicamento,
+                                horarios,
+                                data_inicio.strftime("%Y-%m-%d"),
+                                data_fim.strftime("%Y-%m-%d") if data_fim else None,
+                                intervalo,
+                                dias_semana,
+                                observacoes,
+                                permitir_conflito=permitir_conflito
+                            )
+                        else:
+                            gravar(
+                                adicionar_medicamento,
+                                paciente.id, 
+                                medicamento, 
+                                horario.strftime("%H:%M"), 
+                                data.strftime("%Y-%m-%d"), 
+                                observacoes,
+                                permitir_conflito=permitir_conflito
+                            )
+                    except ErroConflito as e:
+                        st.warning(f"⚠️ {e}. Marque 'Salvar mesmo com conflito de horário' "
+                                   "para cadastrar assim mesmo.")
+                        for conflito in e.conflitos[:CONFLITOS_EXIBIDOS]:
+                            origem = "prescrição" if conflito.prescricao_id else "dose avulsa"
+                            st.write(f"- {conflito.data} às {conflito.horario}: "
+                                     f"{conflito.medicamento} ({origem})")
+                        if len(e.conflitos) > CONFLITOS_EXIBIDOS:
+                            st.write(f"- ... e mais {len(e.conflitos) - CONFLITOS_EXIBIDOS}")
+                    except ErroBanco as e:
+                        st.error(str(e))
+                    else:
+                        if frequencia == "Recorrente":
+                            st.success("Prescrição cadastrada com sucesso!")
+                        else:
+                            st.success("Medicamento cadastrado com sucesso!")
+                        st.rerun()
+                else:
+                    st.error("Por favor, preencha todos os campos obrigatórios.")
+
+def aba_relatorios(conn):
+    """Aba de relatórios"""
+    st.subheader("📊 Relatórios")
     
-    # Fechar conexão ao final
-    conn.close()
+    painel_relatorios()
+
+ABAS = [
+    ("📅 Calendário", aba_calendario),
+    ("💊 Hoje", aba_hoje),
+    ("👴 Pacientes", aba_pacientes),
+    ("➕ Novo Medicamento", aba_novo_medicamento),
+    ("📊 Relatórios", aba_relatorios),
+]
+
+def main():
+    # Cabeçalho
+    col1, col2 = st.columns([0.9, 0.1])
+    with col1:
+        st.markdown('<div class="titulo">🏥 Gestão de Medicamentos - Casa de Repouso</div>', unsafe_allow_html=True)
+    
+    # Conexão com o banco de dados da unidade escolhida
+    seletor_unidade()
+    conn = criar_conexao()
+    if conn is None:
+        st.error("Não foi possível conectar ao banco de dados. O aplicativo não pode continuar.")
+        return
+    
+    # Depuração SQL: o painel é reservado aqui e preenchido no fim da
+    # execução, depois que as consultas da aba foram medidas
+    st.sidebar.toggle("🐞 Depuração SQL", key="depuracao_sql")
+    if perfil_sql():
+        st.sidebar.number_input("Consulta lenta a partir de (ms)", min_value=1,
+                                value=LIMITE_CONSULTA_LENTA_MS, key="limite_consulta_lenta")
+        perfil_sql().limite_lenta_ms = st.session_state["limite_consulta_lenta"]
+    painel_sql = st.sidebar.container()
+    execucoes = []
+
+    with medir_execucao("🔎 Busca") as execucao:
+        painel_busca(conn)
+    execucoes.append(execucao)
+
+    # Abas principais: com on_change="rerun" só a aba aberta é executada, e a
+    # aba escolhida fica guardada na sessão
+    abas = st.tabs([titulo for titulo, _ in ABAS], key="aba_atual", on_change="rerun")
+    for aba, (titulo, desenhar) in zip(abas, ABAS):
+        if aba.open:
+            with aba, medir_execucao(titulo) as execucao:
+                try:
+                    desenhar(conn)
+                except ErroBanco as e:
+                    st.error(str(e))
+            execucoes.append(execucao)
+
+    if perfil_sql():
+        with painel_sql:
+            painel_depuracao(perfil_sql(), [execucao for execucao in execucoes if execucao])
 
 if __name__ == "__main__":
     main()
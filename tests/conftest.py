@@ -0,0 +1,36 @@
+import shutil
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+# Banco versionado no repositório, no formato anterior às migrações
+BANCO_REFERENCIA = RAIZ / "pacientes.db"
+
+import banco  # noqa: E402
+
+def ler_referencia(sql):
+    """Linhas de uma consulta no banco de referência, sem alterá-lo"""
+    conn = sqlite3.connect(f"{BANCO_REFERENCIA.as_uri()}?mode=ro", uri=True)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+@pytest.fixture
+def caminho_banco(tmp_path):
+    """Cópia do banco de referência, ainda sem migrar"""
+    caminho = tmp_path / "pacientes.db"
+    shutil.copy(BANCO_REFERENCIA, caminho)
+    return caminho
+
+@pytest.fixture
+def conn(caminho_banco):
+    """Conexão com a cópia do banco de referência já migrada"""
+    conn = banco.conectar(caminho_banco)
+    yield conn
+    conn.close()
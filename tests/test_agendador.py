@@ -0,0 +1,78 @@
+import time
+from datetime import datetime
+
+import pytest
+
+import agendador
+import banco
+
+class Relogio:
+    def __init__(self, agora):
+        self.agora = agora
+
+    def __call__(self):
+        return self.agora
+
+@pytest.fixture
+def relogio():
+    return Relogio(datetime(2026, 10, 1, 10, 0))
+
+@pytest.fixture
+def agenda(conn, caminho_banco, relogio):
+    for horario in ("08:00", "10:20", "14:00"):
+        banco.adicionar_medicamento(conn, 2, f"Remédio {horario}", horario, "2026-10-01", "")
+    banco.adicionar_prescricao(conn, 1, "Losartana", "09:50", "2026-09-01")
+    return agendador.AgendadorDoses(caminho_banco, janela_min=30, relogio=relogio)
+
+def _nomes(doses):
+    return [dose.medicamento for dose in doses]
+
+def test_doses_passam_de_futuras_a_proximas_e_atrasadas(conn, agenda, relogio):
+    agenda.carregar(conn)
+    assert agenda.pendentes() == 4
+    assert _nomes(agenda.atrasadas()) == ["Remédio 08:00", "Losartana"]
+    assert _nomes(agenda.proximas()) == ["Remédio 10:20"]
+
+    relogio.agora = datetime(2026, 10, 1, 13, 45)
+    assert _nomes(agenda.atrasadas()) == ["Remédio 08:00", "Losartana", "Remédio 10:20"]
+    assert _nomes(agenda.proximas()) == ["Remédio 14:00"]
+
+def test_marcar_atualiza_a_agenda_sem_reler_o_banco(conn, agenda):
+    agenda.carregar(conn)
+    losartana, = [dose for dose in agenda.atrasadas() if dose.prescricao_id is not None]
+    agenda.marcar(losartana, 1)
+    assert _nomes(agenda.atrasadas()) == ["Remédio 08:00"]
+    assert agenda.pendentes() == 3
+    agenda.marcar(losartana, 0)
+    assert _nomes(agenda.atrasadas()) == ["Remédio 08:00", "Losartana"]
+
+def _esperar(condicao, limite_s=5):
+    fim = time.monotonic() + limite_s
+    while not condicao():
+        assert time.monotonic() < fim, "a agenda não foi recarregada"
+        time.sleep(0.01)
+
+def test_thread_recarrega_quando_outra_conexao_grava(conn, agenda, monkeypatch):
+    monkeypatch.setattr(agendador, "INTERVALO_VERIFICACAO_S", 0.02)
+    agenda.iniciar()
+    try:
+        assert agenda.pendentes() == 4
+        carregado_em = agenda.carregado_em
+        time.sleep(0.1)
+        # Sem gravações a agenda não é relida
+        assert agenda.carregado_em == carregado_em
+
+        banco.adicionar_medicamento(conn, 1, "Dipirona", "16:00", "2026-10-01", "")
+        _esperar(lambda: agenda.pendentes() == 5)
+        assert agenda.erro is None
+    finally:
+        agenda.parar()
+
+def test_virada_do_dia(conn, agenda, relogio):
+    agenda.carregar(conn)
+    relogio.agora = datetime(2026, 10, 2, 0, 5)
+    # O dia carregado passou: o que sobrou dele está atrasado
+    assert len(agenda.atrasadas()) == 4
+    agenda.carregar(conn)
+    assert (agenda.dia, _nomes(agenda.atrasadas())) == ("2026-10-02", [])
+    assert agenda.pendentes() == 1
@@ -0,0 +1,82 @@
+import pytest
+
+import arquivo_doses
+import banco
+
+INICIO, FIM = "2024-12-01", "2025-05-31"
+
+@pytest.fixture
+def conn(conn):
+    # Uma dose de 2024 para o arquivamento gerar mais de um arquivo anual
+    banco.adicionar_medicamento(conn, 2, "Losartana", "08:00", "2024-12-31", "")
+    return conn
+
+def _leituras(conn, pasta):
+    """O que as consultas de período devolvem, para comparar antes e depois"""
+    saida = pasta / f"doses_{len(list(pasta.glob('doses_*')))}.csv"
+    banco.exportar_doses(conn, saida, INICIO, FIM)
+    return {
+        "doses": banco.listar_doses_por_periodo(conn, INICIO, FIM),
+        "mes": banco.listar_medicamentos_por_mes(conn, 2025, 5),
+        "resumo": banco.resumo_por_dia(conn, INICIO, FIM),
+        "adesao": banco.adesao_por_paciente(conn, INICIO, FIM),
+        "catalogo": conn.execute("""SELECT paciente_id, medicamento, observacoes, usos
+                                    FROM catalogo_medicamentos ORDER BY 1, 2, 3""").fetchall(),
+        "busca": banco.buscar_medicamentos(conn, "dipi"),
+        "exportacao": saida.read_text(encoding="utf-8"),
+    }
+
+def test_arquivar_move_as_doses_por_ano(conn, caminho_banco):
+    movidas = arquivo_doses.arquivar_doses(conn, "2025-05-11")
+    assert movidas == {2024: 1, 2025: 2}
+    assert conn.execute("SELECT COUNT(*) FROM doses").fetchone()[0] == 1
+    assert arquivo_doses.listar_arquivos(conn) == [
+        (2024, "arquivo/pacientes_2024.db", "2024-12-31", "2024-12-31", 1),
+        (2025, "arquivo/pacientes_2025.db", "2025-05-10", "2025-05-10", 2),
+    ]
+    for ano in (2024, 2025):
+        assert (caminho_banco.parent / "arquivo" / f"pacientes_{ano}.db").exists()
+
+def test_consultas_leem_as_doses_arquivadas(conn, tmp_path):
+    antes = _leituras(conn, tmp_path)
+    assert len(antes["doses"]) == 4
+    arquivo_doses.arquivar_doses(conn, "2025-05-11")
+    assert _leituras(conn, tmp_path) == antes
+    # Uma conexão nova anexa os arquivos sozinha
+    outra = banco.conectar(banco._caminho_principal(conn))
+    try:
+        assert _leituras(outra, tmp_path) == antes
+    finally:
+        outra.close()
+
+def test_consulta_so_do_banco_principal_nao_anexa_arquivos(conn):
+    arquivo_doses.arquivar_doses(conn, "2025-05-11")
+    assert [dose.medicamento for dose in banco.listar_medicamentos_por_data(conn, "2025-05-12")] == ["Rolada"]
+    assert banco._anexados(conn) == {"main", "temp"}
+
+def test_arquivar_de_novo_nao_duplica(conn, caminho_banco):
+    arquivo_doses.arquivar_doses(conn, "2025-05-11")
+    assert arquivo_doses.arquivar_doses(conn, "2025-05-11") == {}
+    # Doses antigas lançadas depois se juntam ao arquivo do ano
+    banco.adicionar_medicamento(conn, 2, "Losartana", "08:00", "2025-05-09", "")
+    assert arquivo_doses.arquivar_doses(conn, "2025-05-11") == {2025: 1}
+    assert arquivo_doses.listar_arquivos(conn)[-1][2:] == ("2025-05-09", "2025-05-10", 3)
+    assert len(banco.listar_doses_por_periodo(conn, INICIO, FIM)) == 5
+
+def test_arquivamento_interrompido_e_completado(conn, tmp_path):
+    antes = _leituras(conn, tmp_path)
+    # Simula uma execução interrompida depois de copiar 2025 para o arquivo
+    # e antes de apagar as doses do banco principal
+    pasta = banco._caminho_principal(conn).parent / "arquivo"
+    pasta.mkdir()
+    conn.execute("ATTACH DATABASE ? AS arquivo_2025", (str(pasta / "pacientes_2025.db"),))
+    conn.execute(arquivo_doses._ESQUEMA_ARQUIVO.format(esquema="arquivo_2025"))
+    conn.execute("""INSERT INTO arquivo_2025.doses
+                    SELECT id, paciente_id, medicamento, dia, minuto, tomou, observacoes, prescricao_id
+                    FROM main.doses WHERE dia = ?""", (banco.dia_da_data("2025-05-10"),))
+    conn.commit()
+    conn.execute("DETACH DATABASE arquivo_2025")
+
+    assert arquivo_doses.arquivar_doses(conn, "2025-05-11") == {2024: 1, 2025: 2}
+    assert arquivo_doses.listar_arquivos(conn)[-1][-1] == 2
+    assert _leituras(conn, tmp_path) == antes
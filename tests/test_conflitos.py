@@ -0,0 +1,71 @@
+import pytest
+
+import arquivo_doses
+import banco
+
+def test_conflito_com_dose_arquivada(conn):
+    # Dipiroca às 14:00 de 2025-05-10 (paciente 1) vai para o arquivo de 2025
+    arquivo_doses.arquivar_doses(conn, "2025-05-11")
+    assert conn.execute("SELECT COUNT(*) FROM doses WHERE dia < ?",
+                        (banco.dia_da_data("2025-05-11"),)).fetchone()[0] == 0
+
+    conflitos = banco.buscar_conflitos(conn, 1, "dipiroca", "14:30", "2025-05-10")
+    assert [(c.data, c.horario) for c in conflitos] == [("2025-05-10", "14:00")]
+    with pytest.raises(banco.ErroConflito):
+        banco.adicionar_medicamento(conn, 1, "Dipiroca", "13:30", "2025-05-10", "")
+    with pytest.raises(banco.ErroConflito):
+        banco.adicionar_prescricao(conn, 1, "Dipiroca", "14:15", "2025-05-01", "2025-05-31")
+    assert banco.buscar_conflitos(conn, 1, "Dipiroca", "15:00", "2025-05-10") == []
+
+def _horarios(conflitos):
+    return [(c.data, c.horario) for c in conflitos]
+
+def test_janela_de_conflito(conn):
+    banco.adicionar_medicamento(conn, 2, "Sinvastatina", "08:00", "2026-10-05", "")
+    # A janela é aberta: exatamente 60 minutos depois já não conflita
+    assert banco.buscar_conflitos(conn, 2, "Sinvastatina", "09:00", "2026-10-05") == []
+    assert banco.buscar_conflitos(conn, 2, "Sinvastatina", "07:00", "2026-10-05") == []
+    for horario in ("07:01", "08:00", "08:59"):
+        assert _horarios(banco.buscar_conflitos(conn, 2, "SINVASTATINA", horario,
+                                                "2026-10-05")) == [("2026-10-05", "08:00")]
+    assert banco.buscar_conflitos(conn, 2, "Sinvastatina", "08:30", "2026-10-05",
+                                  janela_min=20) == []
+    assert banco.buscar_conflitos(conn, 2, "Sinvastatina", "08:00", "2026-10-05",
+                                  janela_min=0) == []
+    assert banco.buscar_conflitos(conn, 1, "Sinvastatina", "08:00", "2026-10-05") == []
+
+    with pytest.raises(banco.ErroConflito) as erro:
+        banco.adicionar_medicamento(conn, 2, "sinvastatina", "08:30", "2026-10-05", "")
+    assert _horarios(erro.value.conflitos) == [("2026-10-05", "08:00")]
+    banco.adicionar_medicamento(conn, 2, "sinvastatina", "08:30", "2026-10-05", "",
+                                permitir_conflito=True)
+    assert len(banco.buscar_conflitos(conn, 2, "Sinvastatina", "08:15", "2026-10-05")) == 2
+
+def test_janela_atravessa_a_meia_noite(conn):
+    banco.adicionar_medicamento(conn, 2, "Zolpidem", "23:30", "2026-10-05", "")
+    assert _horarios(banco.buscar_conflitos(conn, 2, "Zolpidem", "00:20", "2026-10-06")) == \
+        [("2026-10-05", "23:30")]
+    assert banco.buscar_conflitos(conn, 2, "Zolpidem", "00:30", "2026-10-06") == []
+
+    # Doses previstas (dias 10, 12, 14...) também contam, dos dois lados
+    banco.adicionar_prescricao(conn, 2, "Melatonina", "23:45", "2026-10-10", intervalo_dias=2)
+    assert _horarios(banco.buscar_conflitos(conn, 2, "melatonina", "00:15", "2026-10-13")) == \
+        [("2026-10-12", "23:45")]
+    assert banco.buscar_conflitos(conn, 2, "Melatonina", "00:15", "2026-10-12") == []
+    assert _horarios(banco.buscar_conflitos(conn, 2, "Melatonina", "23:00", "2026-10-14")) == \
+        [("2026-10-14", "23:45")]
+
+def test_conflito_entre_prescricoes(conn):
+    # Toda segunda às 08:00; a nova, a cada 3 dias desde uma quinta, cai
+    # numa segunda pela primeira vez em 2026-10-19
+    banco.adicionar_prescricao(conn, 2, "Omeprazol", "08:00", "2026-10-01", dias_semana=[0])
+    with pytest.raises(banco.ErroConflito) as erro:
+        banco.adicionar_prescricao(conn, 2, "omeprazol", "08:30", "2026-10-01",
+                                   intervalo_dias=3)
+    assert ("2026-10-19", "08:00") in _horarios(erro.value.conflitos)
+
+    banco.adicionar_prescricao(conn, 2, "Omeprazol", "08:30", "2026-10-01", "2026-10-18",
+                               intervalo_dias=3)
+    banco.adicionar_prescricao(conn, 2, "Omeprazol", "08:30", "2026-10-19", intervalo_dias=3,
+                               permitir_conflito=True)
+    assert len(banco.listar_prescricoes(conn, 2)) == 3
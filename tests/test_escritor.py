@@ -0,0 +1,86 @@
+import pytest
+
+import banco
+from escritor import Escritor
+
+@pytest.fixture
+def escritor(caminho_banco):
+    banco.conectar(caminho_banco).close()
+    # A janela longa junta no mesmo grupo as alterações enviadas em sequência
+    escritor = Escritor(caminho_banco, janela_ms=500)
+    yield escritor
+    escritor.fechar()
+
+def _nomes(caminho_banco):
+    conn = banco.conectar(caminho_banco)
+    try:
+        return {paciente.nome for paciente in banco.listar_pacientes(conn)}
+    finally:
+        conn.close()
+
+def _adicionar_e_falhar(conn, nome):
+    banco.adicionar_paciente(conn, nome, 70, "")
+    raise RuntimeError("falhou depois de gravar")
+
+def _adicionar_desfazer_e_adicionar(conn, descartado, mantido):
+    banco.adicionar_paciente(conn, descartado, 70, "")
+    conn.rollback()
+    return banco.adicionar_paciente(conn, mantido, 70, "")
+
+def test_erro_desfaz_so_a_propria_alteracao(escritor, caminho_banco):
+    futuros = [
+        escritor.enviar(banco.adicionar_paciente, "Ana", 80, ""),
+        escritor.enviar(_adicionar_e_falhar, "Bruno"),
+        escritor.enviar(banco.adicionar_medicamento, 999, "Losartana", "08:00", "2025-05-10", ""),
+        escritor.enviar(banco.adicionar_paciente, "Carla", 81, ""),
+    ]
+    assert futuros[0].result() > 2
+    with pytest.raises(RuntimeError):
+        futuros[1].result()
+    # Paciente inexistente: a chave estrangeira falha dentro da função
+    with pytest.raises(banco.ErroBanco):
+        futuros[2].result()
+    assert futuros[3].result() > futuros[0].result()
+    assert escritor.grupos == 1
+    assert escritor.alteracoes == 4
+    assert _nomes(caminho_banco) == {"Gabriel Dino", "Reginaldo Pereira", "Ana", "Carla"}
+
+def test_rollback_dentro_do_grupo_volta_ao_inicio_da_alteracao(escritor, caminho_banco):
+    futuros = [
+        escritor.enviar(banco.adicionar_paciente, "Ana", 80, ""),
+        escritor.enviar(_adicionar_desfazer_e_adicionar, "Bruno", "Carla"),
+    ]
+    for futuro in futuros:
+        futuro.result()
+    assert escritor.grupos == 1
+    assert _nomes(caminho_banco) >= {"Ana", "Carla"}
+    assert "Bruno" not in _nomes(caminho_banco)
+
+def test_grupos_respeitam_o_maximo(caminho_banco):
+    banco.conectar(caminho_banco).close()
+    escritor = Escritor(caminho_banco, janela_ms=500, maximo_por_grupo=2)
+    try:
+        futuros = [escritor.enviar(banco.adicionar_paciente, f"Paciente {n}", 70, "")
+                   for n in range(5)]
+        assert len({futuro.result() for futuro in futuros}) == 5
+        assert escritor.grupos == 3
+    finally:
+        escritor.fechar()
+
+def test_erro_do_banco_no_grupo_falha_todas_as_alteracoes(escritor, caminho_banco):
+    # Um erro fora do SAVEPOINT da alteração (aqui, no commit) desfaz o grupo
+    bloqueio = banco.abrir_conexao(caminho_banco)
+    bloqueio.execute("PRAGMA busy_timeout = 0")
+    escritor.conn.execute("PRAGMA busy_timeout = 0")
+    bloqueio.execute("BEGIN EXCLUSIVE")
+    try:
+        futuros = [escritor.enviar(banco.adicionar_paciente, "Ana", 80, ""),
+                   escritor.enviar(_adicionar_e_falhar, "Bruno")]
+        with pytest.raises(banco.ErroBanco):
+            futuros[0].result()
+        with pytest.raises(banco.ErroBanco):
+            futuros[1].result()
+    finally:
+        bloqueio.rollback()
+        bloqueio.close()
+    assert "Ana" not in _nomes(caminho_banco)
@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+
+import banco
+
+def test_importar_pacientes_em_lotes(conn, tmp_path):
+    arquivo = tmp_path / "pacientes.csv"
+    arquivo.write_text("﻿Nome;Idade;Condicao\n"
+                       "Ana;80;Hipertensão\n"
+                       ";70;sem nome\n"
+                       "Bruno;oitenta;\n"
+                       "Carla;75,0;\n"
+                       "Davi;90;Diabetes\n", encoding="utf-8")
+    parciais = []
+    resultado = banco.importar_pacientes(conn, arquivo, tamanho_lote=2,
+                                         progresso=lambda r: parciais.append(r.importadas))
+    assert (resultado.lidas, resultado.importadas) == (5, 3)
+    assert [numero for numero, _ in resultado.erros] == [3, 4]
+    assert parciais == [2, 3]  # um lote a cada duas linhas válidas
+    assert [p.nome for p in banco.buscar_pacientes(conn, "ana")] == ["Ana"]
+    assert banco.contar_pacientes(conn) == 5
+
+def test_importar_doses_valida_cada_linha(conn):
+    linhas = [
+        {"paciente": "gabriel dino", "medicamento": "Losartana", "horario": "08:00",
+         "data": "01/10/2026"},
+        {"paciente_id": 2, "medicamento": "Losartana", "horario": "8:00", "data": "2026-10-01"},
+        {"paciente": "Ninguém", "medicamento": "Losartana", "horario": "08:00",
+         "data": "2026-10-01"},
+        {"paciente_id": 1, "medicamento": "losartana", "horario": "08:30", "data": "2026-10-01"},
+        {"paciente_id": 1, "medicamento": "Losartana", "horario": "25:00", "data": "2026-10-01"},
+    ]
+    arquivo = io.StringIO("\n".join(json.dumps(linha) for linha in linhas) + "\nnão é json\n")
+    resultado = banco.importar_medicamentos(conn, arquivo, formato="jsonl")
+    assert (resultado.lidas, resultado.importadas) == (6, 2)
+    # Paciente inexistente, conflito com a linha 1, horário e JSON inválidos
+    assert [numero for numero, _ in resultado.erros] == [3, 4, 5, 6]
+    doses = banco.listar_medicamentos_por_data(conn, "2026-10-01")
+    assert [(dose.nome_paciente, dose.horario) for dose in doses] == \
+        [("Gabriel Dino", "08:00"), ("Reginaldo Pereira", "08:00")]
+
+def test_importar_prescricoes(conn, tmp_path):
+    arquivo = tmp_path / "prescricoes.csv"
+    arquivo.write_text("paciente_id,medicamento,horarios,data_inicio,data_fim,intervalo_dias,"
+                       "dias_semana\n"
+                       '1,Losartana,"08:00, 20:00",2026-10-01,,1,\n'
+                       "2,Vitamina D,09:00,01/10/2026,31/10/2026,,\"seg, qua\"\n"
+                       "2,Vitamina D,09:30,2026-10-01,,,\n"
+                       "2,Insulina,07:00,2026-10-05,2026-10-01,,\n", encoding="utf-8")
+    resultado = banco.importar_prescricoes(conn, arquivo)
+    assert resultado.importadas == 2
+    assert [numero for numero, _ in resultado.erros] == [4, 5]
+    vitamina, = banco.listar_prescricoes(conn, 2)
+    assert (vitamina.data_inicio, vitamina.data_fim, vitamina.dias_semana) == \
+        ("2026-10-01", "2026-10-31", "0,2")
+
+def test_exportar_doses(conn, tmp_path):
+    banco.adicionar_prescricao(conn, 2, "Losartana", "08:00", "2025-05-11", "2025-05-12")
+    saida = tmp_path / "doses.csv"
+    assert banco.exportar_doses(conn, saida, "2025-05-01", "2025-05-31") == 5
+    with open(saida, encoding="utf-8", newline="") as arquivo:
+        linhas = [(linha["data"], linha["horario"], linha["paciente"], linha["medicamento"],
+                   linha["tomou"]) for linha in csv.DictReader(arquivo)]
+    assert linhas == [
+        ("2025-05-10", "14:00", "Gabriel Dino", "Dipiroca", "1"),
+        ("2025-05-10", "15:15", "Gabriel Dino", "reee", "1"),
+        ("2025-05-11", "08:00", "Reginaldo Pereira", "Losartana", ""),
+        ("2025-05-12", "07:45", "Gabriel Dino", "Rolada", "0"),
+        ("2025-05-12", "08:00", "Reginaldo Pereira", "Losartana", ""),
+    ]
+
+def test_exportar_e_importar_pacientes(conn, tmp_path):
+    saida = tmp_path / "pacientes.jsonl"
+    assert banco.exportar_pacientes(conn, saida) == 2
+    outro = banco.conectar(tmp_path / "outro.db")
+    try:
+        # O banco novo já vem com os pacientes de exemplo
+        exemplo = banco.contar_pacientes(outro)
+        resultado = banco.importar_pacientes(outro, saida)
+        assert (resultado.importadas, resultado.erros) == (2, [])
+        assert banco.contar_pacientes(outro) == exemplo + 2
+        importados = {(p.nome, p.idade, p.condicao) for p in banco.iterar_pacientes(outro)}
+        assert {(p.nome, p.idade, p.condicao) for p in banco.iterar_pacientes(conn)} <= importados
+    finally:
+        outro.close()
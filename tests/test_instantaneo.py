@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+import banco
+from instantaneo import InstantaneoRelatorios
+
+@pytest.fixture
+def instantaneo(conn, caminho_banco):
+    instantaneo = InstantaneoRelatorios(caminho_banco)
+    yield instantaneo
+    instantaneo.fechar_todas()
+
+def _copias(caminho_banco):
+    return sorted(caminho.name for caminho in caminho_banco.parent.glob("*_relatorios_*"))
+
+def _em_thread(funcao):
+    resultado = {}
+    thread = threading.Thread(target=lambda: resultado.update(valor=funcao()))
+    thread.start()
+    thread.join()
+    return resultado["valor"]
+
+def test_threads_encerradas_reaproveitam_a_conexao(instantaneo):
+    conexoes = [_em_thread(instantaneo.conexao) for _ in range(3)]
+    assert conexoes[0] is conexoes[1] is conexoes[2]
+    assert banco.contar_pacientes(conexoes[0]) == 2
+
+def test_copia_mostra_os_dados_da_hora_da_copia(conn, instantaneo):
+    assert banco.contar_pacientes(instantaneo.conexao()) == 2
+    banco.adicionar_paciente(conn, "Ana", 80, "")
+    assert banco.contar_pacientes(instantaneo.conexao()) == 2
+    instantaneo.atualizar(forcar=True)
+    assert banco.contar_pacientes(instantaneo.conexao()) == 3
+
+def test_copia_antiga_e_apagada_quando_sua_ultima_conexao_fecha(instantaneo, caminho_banco):
+    lendo, continuar = threading.Event(), threading.Event()
+
+    def leitor():
+        instantaneo.conexao()
+        lendo.set()
+        continuar.wait()
+        instantaneo.conexao()
+
+    thread = threading.Thread(target=leitor)
+    thread.start()
+    lendo.wait()
+    antiga, = _copias(caminho_banco)
+    instantaneo.atualizar(forcar=True)
+    # O leitor ainda usa a cópia antiga
+    _em_thread(instantaneo.conexao)
+    assert antiga in _copias(caminho_banco)
+    assert len(_copias(caminho_banco)) == 2
+
+    continuar.set()
+    thread.join()
+    _em_thread(instantaneo.conexao)
+    assert antiga not in _copias(caminho_banco)
+    assert len(_copias(caminho_banco)) == 1
+
+    instantaneo.fechar_todas()
+    assert _copias(caminho_banco) == []
@@ -0,0 +1,99 @@
+import threading
+
+import banco
+from conftest import ler_referencia
+
+def _resumo(conn):
+    # Um dia que ficou sem doses mantém sua linha, zerada
+    return conn.execute("""SELECT date(dia * 86400, 'unixepoch'), total, tomados, de_prescricao
+                           FROM resumo_diario WHERE total > 0 ORDER BY dia""").fetchall()
+
+def _catalogo(conn):
+    return conn.execute("""SELECT paciente_id, medicamento, observacoes, usos
+                           FROM catalogo_medicamentos ORDER BY 1, 2, 3""").fetchall()
+
+def _resumo_esperado(conn):
+    """resumo_diario recalculado a partir das doses"""
+    return conn.execute("""SELECT date(dia * 86400, 'unixepoch'), COUNT(*), SUM(tomou),
+                                  COUNT(prescricao_id)
+                           FROM doses GROUP BY dia ORDER BY dia""").fetchall()
+
+def test_migracao_atualiza_a_versao(conn):
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(banco.MIGRACOES)
+
+def test_migracao_preserva_pacientes(conn):
+    assert conn.execute("SELECT * FROM pacientes ORDER BY id").fetchall() == \
+        ler_referencia("SELECT * FROM pacientes ORDER BY id")
+
+def test_migracao_preserva_doses(conn):
+    migradas = conn.execute("""SELECT id, paciente_id, medicamento, horario, data, tomou,
+                                      observacoes, prescricao_id
+                               FROM medicamentos ORDER BY id""").fetchall()
+    originais = ler_referencia("""SELECT id, paciente_id, medicamento, horario, data, tomou,
+                                         observacoes, NULL
+                                  FROM medicamentos ORDER BY id""")
+    assert migradas == originais
+
+def test_migracao_preenche_resumo_diario(conn):
+    assert _resumo(conn) == ler_referencia("""SELECT data, COUNT(*), SUM(tomou), 0
+                                              FROM medicamentos GROUP BY data ORDER BY data""")
+    resumo = {linha.data: linha for linha in banco.resumo_por_dia(conn, "2025-05-10", "2025-05-12")}
+    assert (resumo["2025-05-10"].total, resumo["2025-05-10"].tomados) == (2, 2)
+    assert (resumo["2025-05-11"].total, resumo["2025-05-11"].tomados) == (0, 0)
+    assert (resumo["2025-05-12"].total, resumo["2025-05-12"].nao_tomados) == (1, 1)
+
+def test_migracao_preenche_catalogo(conn):
+    assert _catalogo(conn) == ler_referencia(
+        """SELECT paciente_id, medicamento, COALESCE(observacoes, ''), COUNT(*)
+           FROM medicamentos GROUP BY 1, 2, 3 ORDER BY 1, 2, 3""")
+    encontrados = banco.buscar_medicamentos(conn, "dipi")
+    assert [(m.medicamento, m.usos) for m in encontrados] == [("Dipiroca", 1)]
+
+def test_migrar_de_novo_nao_altera_o_banco(caminho_banco):
+    conn = banco.conectar(caminho_banco)
+    antes = (_resumo(conn), _catalogo(conn), conn.execute("SELECT * FROM doses").fetchall())
+    conn.close()
+    conn = banco.conectar(caminho_banco)
+    try:
+        assert (_resumo(conn), _catalogo(conn), conn.execute("SELECT * FROM doses").fetchall()) == antes
+    finally:
+        conn.close()
+
+def test_migracao_simultanea(caminho_banco):
+    # Várias sessões abrindo o banco antigo ao mesmo tempo: só uma migra
+    barreira = threading.Barrier(6)
+    erros = []
+
+    def abrir():
+        barreira.wait()
+        try:
+            banco.conectar(caminho_banco).close()
+        except banco.ErroBanco as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=abrir) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert erros == []
+    conn = banco.conectar(caminho_banco)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM doses").fetchone()[0] == 3
+        assert _resumo(conn) == _resumo_esperado(conn)
+    finally:
+        conn.close()
+
+def test_resumo_e_catalogo_acompanham_as_alteracoes(conn):
+    paciente = banco.adicionar_paciente(conn, "Maria", 80, "")
+    dose = banco.adicionar_medicamento(conn, paciente, "Losartana", "08:00", "2025-05-10", "")
+    banco.adicionar_medicamento(conn, paciente, "Losartana", "20:00", "2025-05-11", "")
+    banco.atualizar_status_medicamento(conn, dose, 1)
+    banco.adicionar_prescricao(conn, paciente, "Metformina", "12:00", "2025-05-10", "2025-05-11")
+    prevista = next(dose for dose in banco.listar_medicamentos_por_data(conn, "2025-05-10")
+                    if dose.prescricao_id is not None)
+    banco.atualizar_status_dose(conn, prevista, 1)
+    banco.remover_paciente(conn, 1)
+    assert _resumo(conn) == _resumo_esperado(conn)
+    assert _resumo(conn)[0][1:] == (2, 2, 1)
+    assert ("Losartana", 2) in [(linha[1], linha[3]) for linha in _catalogo(conn)]
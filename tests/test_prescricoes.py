@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+
+import pytest
+
+import banco
+
+@pytest.fixture
+def prescricao(conn):
+    """Losartana todo dia às 08:00 para o paciente 2, a partir de 2026-10-01"""
+    return banco.adicionar_prescricao(conn, 2, "Losartana", "08:00", "2026-10-01")
+
+def _registrar(conn, data, status=1):
+    dose = next(dose for dose in banco.listar_medicamentos_por_data(conn, data)
+                if dose.prescricao_id is not None)
+    banco.atualizar_status_dose(conn, dose, status)
+
+def test_encerrar_antes_de_dose_registrada(conn, prescricao):
+    _registrar(conn, "2026-10-15")
+    assert banco.ultima_dose_registrada(conn, prescricao) == "2026-10-15"
+    with pytest.raises(banco.ErroValidacao):
+        banco.encerrar_prescricao(conn, prescricao, "2026-10-10")
+    assert banco.listar_prescricoes(conn, 2)[0].data_fim is None
+
+    banco.encerrar_prescricao(conn, prescricao, "2026-10-15")
+    dia = banco.resumo_por_dia(conn, "2026-10-15", "2026-10-15")[0]
+    assert (dia.total, dia.tomados, dia.nao_tomados) == (1, 1, 0)
+    adesao = banco.adesao_por_paciente(conn, "2026-10-01", "2026-10-31")
+    assert [(linha.total, linha.tomados) for linha in adesao if linha.total] == [(15, 1)]
+    assert banco.listar_medicamentos_por_data(conn, "2026-10-16") == []
+
+def test_encerrar_antes_do_inicio(conn, prescricao):
+    with pytest.raises(banco.ErroValidacao):
+        banco.encerrar_prescricao(conn, prescricao, "2026-09-30")
+
+def test_remover_prescricao_mantem_doses_registradas(conn, prescricao):
+    _registrar(conn, "2026-10-02")
+    banco.remover_prescricao(conn, prescricao)
+    assert banco.listar_prescricoes(conn, 2) == []
+    doses = banco.listar_medicamentos_por_data(conn, "2026-10-02")
+    assert [(dose.medicamento, dose.prescricao_id) for dose in doses] == [("Losartana", None)]
+    assert banco.listar_medicamentos_por_data(conn, "2026-10-03") == []
+
+@pytest.mark.parametrize("inicio, fim", [("2026-13-01", None), ("2026-10-01", "31/02/2026"),
+                                         ("amanhã", None), ("2026-10-05", "2026-10-01")])
+def test_datas_invalidas(conn, inicio, fim):
+    with pytest.raises(banco.ErroValidacao):
+        banco.adicionar_prescricao(conn, 2, "Losartana", "08:00", inicio, fim)
+    assert banco.listar_prescricoes(conn, 2) == []
+
+def test_datas_no_formato_brasileiro(conn):
+    banco.adicionar_prescricao(conn, 2, "Losartana", "08:00", "01/10/2026", "05/10/2026")
+    prescricao, = banco.listar_prescricoes(conn, 2)
+    assert (prescricao.data_inicio, prescricao.data_fim) == ("2026-10-01", "2026-10-05")
+
+def _esperadas(inicio, fim, horarios, intervalo=1, semana=None):
+    """Expansão ingênua da regra, dia a dia"""
+    datas = []
+    dia = date.fromisoformat(inicio)
+    while dia <= date.fromisoformat(fim):
+        if (dia - date.fromisoformat(inicio)).days % intervalo == 0 and (
+                semana is None or dia.weekday() in semana):
+            datas += [(dia.isoformat(), horario) for horario in horarios]
+        dia += timedelta(days=1)
+    return datas
+
+def test_doses_previstas_seguem_a_regra(conn):
+    banco.adicionar_prescricao(conn, 2, "Losartana", "20:00, 08:00", "2026-10-01", "2026-10-05")
+    banco.adicionar_prescricao(conn, 2, "Sinvastatina", "22:00", "2026-10-02", intervalo_dias=3)
+    banco.adicionar_prescricao(conn, 2, "Vitamina D", "09:00", "2026-10-01", "2026-11-15",
+                               dias_semana=[0, 2, 4])
+    banco.adicionar_prescricao(conn, 2, "Insulina", "07:00", "2026-10-01", intervalo_dias=2,
+                               dias_semana=[5, 6])
+    por_medicamento = {}
+    for doses in banco.listar_medicamentos_por_mes(conn, 2026, 10).values():
+        for dose in doses:
+            por_medicamento.setdefault(dose.medicamento, []).append((dose.data, dose.horario))
+
+    assert por_medicamento["Losartana"] == _esperadas("2026-10-01", "2026-10-05", ["08:00", "20:00"])
+    assert por_medicamento["Sinvastatina"] == _esperadas("2026-10-02", "2026-10-31", ["22:00"], 3)
+    assert por_medicamento["Vitamina D"] == _esperadas("2026-10-01", "2026-10-31", ["09:00"],
+                                                       semana={0, 2, 4})
+    assert por_medicamento["Insulina"] == _esperadas("2026-10-01", "2026-10-31", ["07:00"], 2,
+                                                     semana={5, 6})
+    assert banco.listar_medicamentos_por_data(conn, "2026-09-30") == []
+
+def test_dose_registrada_substitui_a_prevista(conn, prescricao):
+    _registrar(conn, "2026-10-03", 1)
+    _registrar(conn, "2026-10-03", 0)
+    doses = banco.listar_medicamentos_por_data(conn, "2026-10-03")
+    assert [(dose.horario, dose.tomou, dose.id is not None) for dose in doses] == [("08:00", 0, True)]
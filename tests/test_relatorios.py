@@ -0,0 +1,94 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+
+import banco
+
+INICIO, FIM = "2026-09-20", "2026-11-10"
+
+def _prescricoes_aleatorias(quantidade, semente=7):
+    sorteio = random.Random(semente)
+    prescricoes = []
+    for numero in range(quantidade):
+        inicio = date(2026, 9, 1) + timedelta(days=sorteio.randrange(90))
+        fim = inicio + timedelta(days=sorteio.randrange(60)) if sorteio.random() < 0.6 else None
+        semana = (",".join(map(str, sorted(sorteio.sample(range(7), sorteio.randint(1, 6)))))
+                  if sorteio.random() < 0.3 else None)
+        horarios = ",".join(sorted(sorteio.sample(["08:00", "12:00", "18:00", "22:00"],
+                                                  sorteio.randint(1, 3))))
+        prescricoes.append(banco.Prescricao(
+            numero, "", f"Remédio {numero}", horarios, inicio.isoformat(),
+            fim.isoformat() if fim else None, sorteio.choice([1, 1, 2, 3, 7]), semana, "",
+            sorteio.randint(1, 5)))
+    return prescricoes
+
+def _previstas_dia_a_dia(prescricoes, inicio, fim):
+    """Contagem ingênua: {(paciente_id, data): doses previstas}"""
+    contagem = Counter()
+    for prescricao in prescricoes:
+        primeiro = date.fromisoformat(prescricao.data_inicio)
+        ultimo = date.fromisoformat(prescricao.data_fim) if prescricao.data_fim else date.max
+        semana = ({int(dia) for dia in prescricao.dias_semana.split(",")}
+                  if prescricao.dias_semana else None)
+        dia = date.fromisoformat(inicio)
+        while dia <= date.fromisoformat(fim):
+            if (primeiro <= dia <= ultimo
+                    and (dia - primeiro).days % prescricao.intervalo_dias == 0
+                    and (semana is None or dia.weekday() in semana)):
+                contagem[prescricao.paciente_id, dia.isoformat()] += \
+                    len(prescricao.horarios.split(","))
+            dia += timedelta(days=1)
+    return contagem
+
+def test_contagem_de_previstas_por_dia_e_por_paciente():
+    prescricoes = _prescricoes_aleatorias(200)
+    esperado = _previstas_dia_a_dia(prescricoes, INICIO, FIM)
+
+    por_dia = banco.contar_previstas_por_dia(prescricoes, INICIO, FIM)
+    dias = [(date.fromisoformat(INICIO) + timedelta(days=n)).isoformat()
+            for n in range(len(por_dia))]
+    assert dias[-1] == FIM
+    assert por_dia == [sum(quantidade for (_, data), quantidade in esperado.items() if data == dia)
+                       for dia in dias]
+
+    por_paciente = Counter()
+    for (paciente_id, _), quantidade in esperado.items():
+        por_paciente[paciente_id] += quantidade
+    assert banco.contar_previstas_por_paciente(prescricoes, INICIO, FIM) == dict(por_paciente)
+
+def test_resumo_e_adesao_batem_com_as_doses_listadas(conn):
+    banco.adicionar_prescricao(conn, 1, "Losartana", "08:00,20:00", "2026-10-01")
+    banco.adicionar_prescricao(conn, 2, "Sinvastatina", "22:00", "2026-09-25", "2026-10-20",
+                               intervalo_dias=2)
+    banco.adicionar_prescricao(conn, 2, "Vitamina D", "09:00", "2026-10-01", dias_semana=[0, 3])
+    banco.adicionar_medicamento(conn, 1, "Dipirona", "14:00", "2026-10-05", "")
+    banco.adicionar_medicamento(conn, 2, "Dipirona", "15:00", "2026-10-31", "")
+    # Registra o status de parte das doses, tomadas e não tomadas
+    sorteio = random.Random(3)
+    for doses in banco.listar_medicamentos_por_mes(conn, 2026, 10).values():
+        for dose in doses:
+            if sorteio.random() < 0.6:
+                banco.atualizar_status_dose(conn, dose, int(sorteio.random() < 0.8))
+
+    total, tomados = Counter(), Counter()
+    for dose in banco.listar_doses_por_periodo(conn, INICIO, FIM):
+        total[dose.data] += 1
+        tomados[dose.data] += dose.tomou
+    pacientes, tomados_paciente = Counter(), Counter()
+    for paciente_id in (1, 2):
+        for dose in banco.iterar_doses_por_periodo(conn, INICIO, FIM, paciente_id=paciente_id):
+            pacientes[paciente_id] += 1
+            tomados_paciente[paciente_id] += dose.tomou
+    assert sum(pacientes.values()) == sum(total.values())
+
+    resumo = banco.resumo_por_dia(conn, INICIO, FIM)
+    assert len(resumo) == (date.fromisoformat(FIM) - date.fromisoformat(INICIO)).days + 1
+    for dia in resumo:
+        assert (dia.total, dia.tomados, dia.nao_tomados) == \
+            (total[dia.data], tomados[dia.data], total[dia.data] - tomados[dia.data])
+    assert banco.contar_doses_por_dia(conn, INICIO, FIM) == dict(total)
+
+    adesao = {linha.paciente_id: linha for linha in banco.adesao_por_paciente(conn, INICIO, FIM)}
+    for paciente_id in (1, 2):
+        assert (adesao[paciente_id].total, adesao[paciente_id].tomados) == \
+            (pacientes[paciente_id], tomados_paciente[paciente_id])